@@ -0,0 +1,232 @@
+"""
+Asyncio interface to the Conduce API.
+
+Mirrors the public functions of :py:mod:`conduce.api` as coroutines so that many dataset operations can be
+driven from a single event loop::
+
+    from conduce import aio
+
+    async def main():
+        datasets = await aio.find_dataset(name='my-dataset')
+        response = await aio.process_transactions(datasets[0]['id'], backend_id)
+        await aio.wait_for_job(response.headers['location'])
+
+HTTP requests are issued through the pooled, keep-alive sessions of :py:mod:`conduce.connection` on a bounded
+executor, so the number of requests in flight (and open connections) never exceeds the configured concurrency no
+matter how many coroutines are awaiting.  Job polling runs natively on the event loop and does not hold a thread
+while it waits.
+
+Requires Python 3.6 or later.
+"""
+import asyncio
+import functools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import api
+from . import connection
+
+# Maximum number of HTTP requests in flight at once.
+DEFAULT_CONCURRENCY = 32
+
+_executor = None
+_concurrency = DEFAULT_CONCURRENCY
+_executor_lock = threading.Lock()
+
+
+def set_concurrency(concurrency):
+    """
+    Set the maximum number of HTTP requests in flight at once.
+
+    Takes effect for requests made after the call; requests already running are not interrupted.
+
+    Parameters
+    ----------
+    concurrency : integer
+        The maximum number of concurrent requests (default: :py:data:`DEFAULT_CONCURRENCY`).
+    """
+    global _executor, _concurrency
+    with _executor_lock:
+        _concurrency = concurrency
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_concurrency)
+        return _executor
+
+
+async def run(func, *args, **kwargs):
+    """
+    Run a blocking :py:mod:`conduce.api` function without blocking the event loop.
+
+    Unless ``pool_size`` is passed, the connection pool of a newly created client is sized to the configured
+    concurrency so that every concurrent request can reuse a keep-alive connection.
+
+    Parameters
+    ----------
+    func : function
+        The function to run.
+    *args, **kwargs:
+        Passed to ``func``.
+
+    Returns
+    -------
+    object
+        The return value of ``func``.
+    """
+    kwargs.setdefault('pool_size', max(_concurrency, connection.DEFAULT_POOL_SIZE))
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _coroutine(name):
+    func = getattr(api, name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Look the function up on every call so that it can be patched on conduce.api.
+        return await run(getattr(api, name), *args, **kwargs)
+
+    return wrapper
+
+
+make_get_request = _coroutine('make_get_request')
+make_post_request = _coroutine('make_post_request')
+make_put_request = _coroutine('make_put_request')
+make_patch_request = _coroutine('make_patch_request')
+make_delete_request = _coroutine('make_delete_request')
+
+list_datasets = _coroutine('list_datasets')
+list_substrates = _coroutine('list_substrates')
+list_templates = _coroutine('list_templates')
+list_resources = _coroutine('list_resources')
+find_resource = _coroutine('find_resource')
+find_dataset = _coroutine('find_dataset')
+find_substrate = _coroutine('find_substrate')
+find_template = _coroutine('find_template')
+find_asset = _coroutine('find_asset')
+find_orchestration = _coroutine('find_orchestration')
+get_resource = _coroutine('get_resource')
+patch_resource = _coroutine('patch_resource')
+edit_tags = _coroutine('edit_tags')
+remove_resource = _coroutine('remove_resource')
+remove_dataset = _coroutine('remove_dataset')
+remove_resources = _coroutine('remove_resources')
+
+create_dataset = _coroutine('create_dataset')
+get_dataset_metadata = _coroutine('get_dataset_metadata')
+get_entity = _coroutine('get_entity')
+modify_entities = _coroutine('modify_entities')
+ingest_entities = _coroutine('ingest_entities')
+ingest_samples = _coroutine('ingest_samples')
+insert_transaction = _coroutine('insert_transaction')
+append_transaction = _coroutine('append_transaction')
+post_transaction = _coroutine('post_transaction')
+post_chunked_transaction = _coroutine('post_chunked_transaction')
+get_transactions = _coroutine('get_transactions')
+save_transactions = _coroutine('save_transactions')
+delete_transactions = _coroutine('delete_transactions')
+clear_datasets = _coroutine('clear_datasets')
+
+list_dataset_backends = _coroutine('list_dataset_backends')
+get_dataset_backend_metadata = _coroutine('get_dataset_backend_metadata')
+search_dataset_backend = _coroutine('search_dataset_backend')
+remove_dataset_backend = _coroutine('remove_dataset_backend')
+set_default_backend = _coroutine('set_default_backend')
+process_transactions = _coroutine('process_transactions')
+enable_auto_processing = _coroutine('enable_auto_processing')
+disable_auto_processing = _coroutine('disable_auto_processing')
+add_simple_store = _coroutine('add_simple_store')
+add_tile_store = _coroutine('add_tile_store')
+add_capped_tile_store = _coroutine('add_capped_tile_store')
+add_elasticsearch_store = _coroutine('add_elasticsearch_store')
+add_histogram_store = _coroutine('add_histogram_store')
+
+
+class _PollBudget(object):
+    """
+    Spaces job status requests so that at most ``rate`` are made per second.
+    """
+
+    def __init__(self, rate):
+        self.spacing = 1.0 / rate
+        self.next_slot = 0
+
+    async def acquire(self):
+        now = time.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.spacing
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _wait(job, budget, progress_callback, start_time, **kwargs):
+    while True:
+        await budget.acquire()
+        now = time.time()
+
+        result, status, retry_after = await run(job.poll, **kwargs)
+        if result is not None:
+            return result
+
+        if status is not None and progress_callback is not None:
+            progress_callback(job.job_id, status, now - start_time)
+
+        remaining = job.deadline - now
+        if remaining <= 0:
+            return api.TimeoutError('Timed out waiting for job to complete. {}'.format(job.job_id))
+
+        await asyncio.sleep(min(api._job_poll_delay(job.attempt, retry_after), remaining))
+        job.attempt += 1
+
+
+async def wait_for_jobs(job_ids, **kwargs):
+    """
+    Wait for many jobs to complete.
+
+    An asynchronous generator that yields ``(job_id, result)`` for each job as it completes.  See
+    :py:func:`conduce.api.wait_for_jobs` for the parameters and results.
+    """
+    progress_callback = kwargs.pop('progress_callback', None)
+    budget = _PollBudget(kwargs.pop('max_polls_per_second', None) or api.JOB_POLL_MAX_RATE)
+
+    timeout = kwargs.get('timeout')
+    if timeout is None:
+        timeout = 300
+
+    start_time = time.time()
+
+    async def wait(job_id):
+        job = api._JobStatus(job_id, start_time + timeout)
+        return job_id, await _wait(job, budget, progress_callback, start_time, **kwargs)
+
+    for completed in asyncio.as_completed([wait(job_id) for job_id in job_ids]):
+        yield await completed
+
+
+async def wait_for_job(job_id, **kwargs):
+    """
+    Wait for a job to complete.
+
+    See :py:func:`conduce.api.wait_for_job`.
+    """
+    async for _, result in wait_for_jobs([job_id], **kwargs):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+async def close():
+    """
+    Close the executor and all pooled connections.
+    """
+    set_concurrency(_concurrency)
+    connection.close_clients()
@@ -6,10 +6,18 @@ import requests
 import json
 import time
 import re
+import heapq
+import collections
+import random
 import base64
+import threading
 import warnings
+import zlib
 
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from future.moves.queue import Full
+from future.moves.queue import Queue
 from retrying import retry
 
 from requests.exceptions import ConnectionError
@@ -19,6 +27,7 @@ from requests.exceptions import Timeout
 from . import util
 from . import session
 from . import config
+from . import connection
 
 standard_library.install_aliases()
 
@@ -30,12 +39,78 @@ NUM_RETRIES = 5
 
 WAIT_EXPONENTIAL_MULTIPLIER = 1000
 
+# Job status polling interval bounds (seconds) and the factor by which the interval grows after each poll.
+JOB_POLL_INITIAL_INTERVAL = 0.25
+JOB_POLL_MAX_INTERVAL = 10.0
+JOB_POLL_BACKOFF = 1.5
+
+# Maximum number of job status requests per second made by a job waiter.
+JOB_POLL_MAX_RATE = 10.0
+
+# Number of concurrent requests used when posting a transaction in chunks.
+DEFAULT_INGEST_WORKERS = 4
+
+# Number of times to retry a failed transaction chunk.
+NUM_CHUNK_RETRIES = 3
+
+# Number of transaction range jobs kept in flight per backend.
+DEFAULT_PIPELINE_DEPTH = 2
+
+# Number of transactions requested per page of the transaction log.
+TRANSACTION_PAGE_ROWS = 1000
+
+# Number of transaction log pages fetched ahead of the caller.
+DEFAULT_PREFETCH_PAGES = 2
+
+# Request bodies smaller than this many bytes are sent uncompressed even when compression is requested.
+GZIP_MIN_BYTES = 16 * 2**10
+
+# zlib compression level used for gzip request bodies.
+GZIP_LEVEL = 6
+
+# Lists in request payloads are JSON encoded this many items at a time.
+ENCODE_SLICE_ITEMS = 1000
+
+# Encoded request bodies are passed to the compressor in blocks of at least this many bytes.
+GZIP_BLOCK_BYTES = 2**20
+
+# Number of concurrent requests used by bulk resource removal and dataset clearing.
+DEFAULT_BULK_WORKERS = 8
+
+# Maximum number of requests per second started by bulk resource removal and dataset clearing.
+BULK_MAX_RATE = 20.0
+
 
 class TimeoutError(Exception):
     def __init__(self, message):
         super(TimeoutError, self).__init__(message)
 
 
+class JSONBody(object):
+    """
+    A request payload that is already JSON encoded.
+
+    Pass an instance as the payload of :py:func:`make_post_request` (or any other request function) to send
+    ``data`` as the request body as is, instead of serializing the payload again.
+
+    Parameters
+    ----------
+    data : bytes or list
+        The UTF-8 encoded JSON body, or a list of byte strings that concatenate to it.  A list is never joined
+        when the body is compressed.
+    """
+
+    def __init__(self, data):
+        self._chunks = [data] if isinstance(data, bytes) else data
+
+    @property
+    def data(self):
+        return b''.join(self._chunks)
+
+    def chunks(self):
+        return iter(self._chunks)
+
+
 class DatasetBackends:
     """
     An interface for accessing dataset backend type names.
@@ -93,13 +168,110 @@ class DatasetBackends:
         return DatasetBackends.BACKEND_TYPES.values()
 
 
-def _retry_on_retryable_error(exception):
+def is_retryable_error(exception):
+    """
+    Whether a failed request may succeed if it is retried.
+
+    Client errors (HTTP status below 500) are not retryable; server errors and the connection errors in
+    ``RETRYABLE_ERRORS`` are.
+
+    Parameters
+    ----------
+    exception : Exception
+        The exception raised by the request.
+
+    Returns
+    -------
+    bool
+        ``True`` if the request should be retried.
+    """
     if isinstance(exception, HTTPError) and exception.response.status_code < 500:
         return False
 
     return isinstance(exception, RETRYABLE_ERRORS)
 
 
+def imap_bounded(func, iterable, workers, ordered=True):
+    """
+    Apply ``func`` to each item of ``iterable`` on a pool of ``workers`` threads.
+
+    Results are yielded as they are produced.  At most ``2 * workers`` items are taken from ``iterable``
+    before their results are consumed, so large generators are never fully materialized.
+
+    Parameters
+    ----------
+    func : function
+        Called with each item of ``iterable``.
+    iterable : iterable
+        The items to apply ``func`` to.
+    workers : int
+        The number of threads to apply ``func`` on.
+    ordered : bool, optional
+        If ``True`` (the default), results are yielded in the order of ``iterable``; otherwise as soon as they
+        are produced.
+
+    Returns
+    -------
+    generator
+        The results of ``func``.
+    """
+    pending = threading.Semaphore(2 * workers)
+    closed = []
+
+    def feed():
+        for item in iterable:
+            pending.acquire()
+            if closed:
+                return
+            yield item
+
+    pool = ThreadPool(workers)
+    try:
+        results = pool.imap(func, feed()) if ordered else pool.imap_unordered(func, feed())
+        for result in results:
+            pending.release()
+            yield result
+    finally:
+        closed.append(True)
+        pending.release()
+        pool.terminate()
+
+
+class _RateLimiter(object):
+    """
+    Spaces calls to :py:meth:`wait` from any number of threads at least ``1 / max_rate`` seconds apart.
+    """
+
+    def __init__(self, max_rate):
+        self.spacing = 1.0 / max_rate
+        self.next_slot = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.spacing
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _bulk_apply(func, items, **kwargs):
+    # Calls func(item, **kwargs) concurrently and returns (item, result or exception) in the order of items.
+    workers = kwargs.pop('workers', None) or DEFAULT_BULK_WORKERS
+    limiter = _RateLimiter(kwargs.pop('max_requests_per_second', None) or BULK_MAX_RATE)
+    kwargs.setdefault('pool_size', max(workers, connection.DEFAULT_POOL_SIZE))
+
+    def apply(item):
+        limiter.wait()
+        try:
+            return item, func(item, **kwargs)
+        except Exception as e:
+            return item, e
+
+    return list(imap_bounded(apply, items, workers))
+
+
 def _deprecated(func):
     def new_func(*args, **kwargs):
         warnings.warn("Call to deprecated function {}.".format(func.__name__),
@@ -219,17 +391,164 @@ def list_templates(**kwargs):
     return list_resources('LENS_TEMPLATE', **kwargs)
 
 
+def _retry_after(response):
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _job_poll_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return retry_after
+
+    interval = JOB_POLL_INITIAL_INTERVAL
+    while attempt > 0 and interval < JOB_POLL_MAX_INTERVAL:
+        interval *= JOB_POLL_BACKOFF
+        attempt -= 1
+
+    interval = min(interval, JOB_POLL_MAX_INTERVAL)
+    return random.uniform(interval / 2, interval)
+
+
+class _JobStatus(object):
+    """
+    Polling state of a single asynchronous job.
+    """
+
+    def __init__(self, job_id, deadline):
+        self.job_id = job_id
+        self.deadline = deadline
+        self.initial_status_countdown = 9
+        self.server_error_count = 0
+        self.attempt = 0
+
+    def poll(self, **kwargs):
+        """
+        Check the job status once.
+
+        Returns a ``(result, status, retry_after)`` tuple.  ``result`` is the final response when the job is done,
+        an exception when the job status cannot be retrieved and ``None`` while the job is still running.
+        """
+        try:
+            response = make_get_request(self.job_id, **kwargs)
+
+            status = None
+            if response.ok:
+                self.initial_status_countdown = 0
+                self.server_error_count = 0
+                status = response.json()
+                if 'response' in status:
+                    return response, status, None
+
+            return None, status, _retry_after(response)
+        except requests.exceptions.HTTPError as e:
+            if self.initial_status_countdown and e.response.status_code == 404:
+                if kwargs.get('cli'):
+                    print("Job not ready... {}".format(self.initial_status_countdown))
+                self.initial_status_countdown -= 1
+                return None, None, None
+            elif e.response.status_code < 500:
+                return e, None, None
+            elif self.server_error_count < 119:
+                self.server_error_count += 1
+                if kwargs.get('cli'):
+                    print("Job status check failed for {}:".format(self.job_id), e.response.reason)
+                    print("Will retry after sleep period.")
+                return None, None, _retry_after(e.response)
+            else:
+                return e, None, None
+
+
+def wait_for_jobs(job_ids, **kwargs):
+    """
+    Wait for many jobs to complete.
+
+    A generator that polls all of the given jobs from a single scheduler and yields each job as it completes,
+    in completion order.  Each job is polled on its own jittered exponential backoff schedule (see
+    :py:func:`wait_for_job`), and polls for all jobs share a budget of at most ``max_polls_per_second`` requests.
+
+    Parameters
+    ----------
+    job_ids : list
+        The UUIDs that identify the jobs to query.
+    **kwargs:
+        **timeout**
+            The number of seconds to wait for each job to complete (default: 300).
+        **max_polls_per_second**
+            The maximum rate of job status requests across all jobs (default: :py:data:`JOB_POLL_MAX_RATE`).
+        **progress_callback**
+            A function called with ``(job_id, status, elapsed_seconds)`` each time a job is found to still be
+            running.  ``status`` is the decoded job status message.
+
+        See :py:func:`make_get_request`
+
+    Yields
+    ------
+    tuple
+        ``(job_id, result)`` for each job.  ``result`` is the final :py:class:`requests.Response` of a completed job,
+        or the exception (:py:class:`requests.HTTPError` or :py:class:`TimeoutError`) that ended the wait for a job.
+        Exceptions are yielded rather than raised so that one failed job does not abandon the others.
+    """
+    progress_callback = kwargs.pop('progress_callback', None)
+    min_poll_spacing = 1.0 / (kwargs.pop('max_polls_per_second', None) or JOB_POLL_MAX_RATE)
+
+    timeout = kwargs.get('timeout')
+    if timeout is None:
+        timeout = 300
+
+    start_time = time.time()
+    schedule = [(start_time, idx, _JobStatus(job_id, start_time + timeout)) for idx, job_id in enumerate(job_ids)]
+    heapq.heapify(schedule)
+
+    next_poll_slot = start_time
+    while schedule:
+        poll_time, idx, job = heapq.heappop(schedule)
+
+        wait = max(poll_time, next_poll_slot) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        now = time.time()
+        next_poll_slot = now + min_poll_spacing
+
+        result, status, retry_after = job.poll(**kwargs)
+        if result is not None:
+            yield job.job_id, result
+            continue
+
+        if status is not None and progress_callback is not None:
+            progress_callback(job.job_id, status, now - start_time)
+
+        remaining = job.deadline - now
+        if remaining <= 0:
+            yield job.job_id, TimeoutError('Timed out waiting for job to complete. {}'.format(job.job_id))
+            continue
+
+        heapq.heappush(schedule, (now + min(_job_poll_delay(job.attempt, retry_after), remaining), idx, job))
+        job.attempt += 1
+
+
 def wait_for_job(job_id, **kwargs):
     """
     Wait for a job to complete.
 
-    Block execution until the completion of an asynchronous job.
+    Block execution until the completion of an asynchronous job.  The job status is polled with an exponentially
+    increasing, jittered interval (from :py:data:`JOB_POLL_INITIAL_INTERVAL` up to :py:data:`JOB_POLL_MAX_INTERVAL`
+    seconds) so short jobs return quickly and long jobs are not polled aggressively.  A ``Retry-After`` header
+    returned by the server overrides the interval.
 
     Parameters
     ----------
     job_id : string
         The UUID that identifies the job to query.  The job ID is returned in the response header of the request that starts the job.
     **kwargs:
+        **timeout**
+            The number of seconds to wait for the job to complete (default: 300).
+        **progress_callback**
+            A function called with ``(job_id, status, elapsed_seconds)`` each time the job is found to still be
+            running.  ``status`` is the decoded job status message.
+
         See :py:func:`make_get_request`
 
     Returns
@@ -242,48 +561,13 @@ def wait_for_job(job_id, **kwargs):
     requests.HTTPError
         Requests that result in an error raise an exception with information about the failure.
         See :py:meth:`requests.Response.raise_for_status` for more information.
+    TimeoutError
+        The job did not complete before the timeout elapsed.
     """
-    initial_status_countdown = 9
-    server_error_count = 0
-
-    timeout = kwargs.get('timeout')
-    if timeout is None:
-        timeout = 300
-    timeout *= 2
-
-    while timeout > 0:
-        try:
-            response = make_get_request(job_id, **kwargs)
-
-            if response.ok:
-                initial_status_countdown = 0
-                server_error_count = 0
-                msg = response.json()
-                if 'response' in msg:
-                    return response
-
-            time.sleep(0.5)
-        except requests.exceptions.HTTPError as e:
-            if initial_status_countdown and e.response.status_code == 404:
-                if kwargs.get('cli'):
-                    print("Job not ready... {}".format(initial_status_countdown))
-                initial_status_countdown -= 1
-                time.sleep(1)
-            elif e.response.status_code < 500:
-                raise e
-            elif server_error_count < 119:
-                server_error_count += 1
-                if kwargs.get('cli'):
-                    print("Job status check failed for {}:".format(job_id), e.response.reason)
-                    print("Will retry after sleep period.")
-                time.sleep(0.5)
-            else:
-                raise e
-
-        timeout -= 1
-
-    if timeout <= 0:
-        raise TimeoutError('Timed out waiting for job to complete. {}'.format(job_id))
+    for _, result in wait_for_jobs([job_id], **kwargs):
+        if isinstance(result, Exception):
+            raise result
+        return result
 
 
 def compose_uri(fragment):
@@ -718,7 +1002,28 @@ def append_transaction(dataset_id, entity_set, **kwargs):
     are newer than the newest record in the transaction log.
 
     Append may fail to add valid records that occur between the end of an entity stream and the end of a dataset.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset to modify.
+    entity_set : dictionary
+        A dictionary of raw Conduce entities.
+    **kwargs : key-value
+        **spool**
+            A :py:class:`conduce.spool.Spool` or the directory of one (see :py:func:`conduce.spool.get_spool`).
+            The entities are written to the local spool and posted by its drainer thread, and the number of
+            spooled entities is returned without waiting for the server.
+
+        See :py:func:`post_transaction` for more kwargs.
     """
+    if kwargs.get('spool'):
+        from . import spool
+        target = kwargs.pop('spool')
+        if not isinstance(target, spool.Spool):
+            target = spool.get_spool(target, dataset_id, **kwargs)
+        return target.append(entity_set)
+
     return post_transaction(dataset_id, entity_set, operation='APPEND', **kwargs)
 
 
@@ -738,6 +1043,10 @@ def post_transaction(dataset_id, entity_set, **kwargs):
         :py:meth:`util.entities_to_entity_set` to construct an entity set dictionary.
         See :doc:`data-ingest` for documentation on how to ingest data.
     **kwargs : key-value
+        **serialize**
+            The entities are pre-serialized JSON bytes (see :py:func:`util.serialize_entities`).  The request body is
+            assembled from them without encoding the entity set again.  Entities that are still dictionaries are
+            serialized as the body is assembled.
         **operation**
             The dataset operation to perform on the posted entity set.  Supports all
             operations listed in the REST API.  However, only `INSERT` and `APPEND` are officially supported.
@@ -748,6 +1057,19 @@ def post_transaction(dataset_id, entity_set, **kwargs):
             Post each entity in the entity set as an individual transaction.
             This enables a user to find bad entities in an entity set but dramatically slows data processing.
             Forces `process=True` to ensure entities are ingested one at a time.
+        **chunk_size**
+            Split the entity set into transactions of at most this many entities.
+        **chunk_bytes**
+            Split the entity set into transactions whose JSON encoded entities total at most this many bytes.
+        **workers**
+            The number of chunks posted concurrently (default: :py:data:`DEFAULT_INGEST_WORKERS`).
+            `APPEND` transactions are always posted one chunk at a time, in order.
+        **chunk_retries**
+            The number of times a chunk that failed with a retryable error is posted again
+            (default: :py:data:`NUM_CHUNK_RETRIES`).
+        **compress**
+            Post each transaction gzip compressed.  Pre-serialized entities are compressed as they are
+            assembled into the request body.
 
         See :py:func:`make_post_request` for more kwargs.
 
@@ -755,10 +1077,16 @@ def post_transaction(dataset_id, entity_set, **kwargs):
     -------
     requests.Response
         Returns an error or the final response message when the job is no longer running.
+
+        When ``chunk_size`` or ``chunk_bytes`` is set a dictionary summarizing the chunked transaction is
+        returned instead.  See :py:func:`post_chunked_transaction`.
     """
     if 'entities' not in entity_set:
         raise ValueError("Parameter entity_set is not an 'entities' dict.")
 
+    if kwargs.get('chunk_size') or kwargs.get('chunk_bytes'):
+        return post_chunked_transaction(dataset_id, entity_set, **kwargs)
+
     if kwargs.get('debug'):
         kwargs.pop('debug')
         kwargs['process'] = True
@@ -772,10 +1100,13 @@ def post_transaction(dataset_id, entity_set, **kwargs):
         return responses
 
     process = bool(kwargs.pop('process', False))
-    payload = {
-        'data': entity_set,
-        'op': kwargs.get('operation', 'INSERT'),
-    }
+    if kwargs.get('serialize'):
+        payload = _transaction_body(entity_set['entities'], kwargs.get('operation', 'INSERT'))
+    else:
+        payload = {
+            'data': entity_set,
+            'op': kwargs.get('operation', 'INSERT'),
+        }
     response = make_post_request(
         payload, '/api/v2/data/{}/transactions?process={}'.format(dataset_id, process), **kwargs)
     response.raise_for_status()
@@ -789,6 +1120,108 @@ def post_transaction(dataset_id, entity_set, **kwargs):
     return response
 
 
+def _transaction_body(serialized_entities, operation):
+    # The JSON encoding of {'data': {'entities': [...]}, 'op': operation} built from pre-serialized entities.
+    # Entities that are not serialized yet (e.g. read from a --raw entities file) are encoded here.
+    chunks = [b'{"data":{"entities":[']
+    for idx, entity in enumerate(serialized_entities):
+        if idx:
+            chunks.append(b',')
+        chunks.append(entity if isinstance(entity, bytes) else util.dumps_bytes(entity))
+    chunks.extend([b']},"op":', util.dumps_bytes(operation), b'}'])
+    return JSONBody(chunks)
+
+
+def post_chunked_transaction(dataset_id, entity_set, **kwargs):
+    """
+    Add a dataset transaction in chunks.
+
+    Splits ``entity_set['entities']`` by entity count and/or encoded size and posts each chunk as its own
+    transaction.  Chunks are posted concurrently unless the operation is `APPEND`, in which case they are posted
+    sequentially in order and posting stops at the first chunk that fails, so that no later records are appended
+    ahead of the failed ones.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset to modify.
+    entity_set : dictionary
+        A dictionary of raw Conduce entities.  ``entity_set['entities']`` may be any iterable, including a generator.
+    **kwargs : key-value
+        **completed_chunks**
+            Indices of chunks that were posted before and are skipped, for example when resuming an interrupted
+            transaction (see :py:func:`conduce.ingest.ingest_file`).
+        **chunk_callback**
+            A function called as ``chunk_callback(index, first, count, response)`` for every chunk that is posted
+            successfully, where ``first`` is the index of the chunk's first entity in the entity set.
+
+        See :py:func:`post_transaction` for ``chunk_size``, ``chunk_bytes``, ``workers`` and ``chunk_retries``.
+
+    Returns
+    -------
+    dictionary
+        A summary of the transaction::
+
+            {
+                'chunks': <number of chunks posted>,
+                'entities': <number of entities posted>,
+                'skipped': <number of completed chunks skipped>,
+                'failures': [{'chunk': <index>, 'entities': <count>, 'attempts': <count>, 'error': <exception>}]
+            }
+
+        Responses are not kept; pass ``chunk_callback`` to inspect them.  Check ``failures``: chunks that still
+        fail after ``chunk_retries`` are reported there rather than raised.
+    """
+    chunk_size = kwargs.pop('chunk_size', None)
+    chunk_bytes = kwargs.pop('chunk_bytes', None)
+    workers = kwargs.pop('workers', None) or DEFAULT_INGEST_WORKERS
+    chunk_retries = kwargs.pop('chunk_retries', NUM_CHUNK_RETRIES)
+    completed_chunks = kwargs.pop('completed_chunks', None) or ()
+    chunk_callback = kwargs.pop('chunk_callback', None)
+    kwargs.pop('debug', None)
+
+    kwargs.setdefault('pool_size', max(workers, connection.DEFAULT_POOL_SIZE))
+
+    def post_chunk(indexed_chunk):
+        idx, first, chunk = indexed_chunk
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return idx, first, len(chunk), attempts, post_transaction(dataset_id, {'entities': chunk}, **kwargs), None
+            except Exception as e:
+                if attempts > chunk_retries or not is_retryable_error(e):
+                    return idx, first, len(chunk), attempts, None, e
+
+    result = {'chunks': 0, 'entities': 0, 'skipped': 0, 'failures': []}
+
+    def pending_chunks():
+        first = 0
+        for idx, chunk in enumerate(util.chunk_entities(entity_set['entities'], chunk_size, chunk_bytes)):
+            if idx in completed_chunks:
+                result['skipped'] += 1
+            else:
+                yield idx, first, chunk
+            first += len(chunk)
+
+    if kwargs.get('operation') == 'APPEND':
+        posted = (post_chunk(chunk) for chunk in pending_chunks())
+    else:
+        posted = imap_bounded(post_chunk, pending_chunks(), workers)
+
+    for idx, first, count, attempts, response, error in posted:
+        result['chunks'] += 1
+        result['entities'] += count
+        if error is not None:
+            result['failures'].append({'chunk': idx, 'entities': count, 'attempts': attempts, 'error': error})
+            if kwargs.get('operation') == 'APPEND':
+                break
+        elif chunk_callback is not None:
+            chunk_callback(idx, first, count, response)
+
+    return result
+
+
 def get_transactions(dataset_id, **kwargs):
     """
     Read sequence of dataset transactions from transaction log.  If no query parameters are provided,
@@ -839,6 +1272,149 @@ def get_transactions(dataset_id, **kwargs):
     return json.loads(make_get_request(fragment, parameters=parameters, **kwargs).content)
 
 
+def transaction_page(page):
+    """
+    Split a page of the transaction log into its transactions and the page state from which to continue.
+
+    Parameters
+    ----------
+    page : list or dict
+        A page returned by :py:func:`get_transactions`: either a plain list of transactions or a dictionary with
+        ``transactions`` and a page state.
+
+    Returns
+    -------
+    tuple
+        The list of transactions and the page state, which is ``None`` for a plain list or the last page.
+    """
+    if isinstance(page, list):
+        return page, None
+    return page.get('transactions') or [], page.get('page_state') or page.get('pageState')
+
+
+def _put_unless_stopped(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return
+        except Full:
+            pass
+
+
+def iter_transactions(dataset_id, **kwargs):
+    """
+    Iterate over the transaction log of a dataset one page at a time.
+
+    Pages are requested with :py:func:`get_transactions`, following the page state of each page to the next (or, for
+    pages returned as a plain list, advancing ``min`` past the last transaction until a page is short), on a
+    background thread that keeps up to ``prefetch`` pages ahead of the caller.  Requests therefore overlap with the
+    processing of the transactions already returned, while at most ``prefetch + 1`` pages are held in memory.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs : key-value
+        **min**
+            The index of the oldest transaction.
+        **max**
+            The index of the newest transaction.
+        **rows**
+            The number of transactions per page (default: :py:data:`TRANSACTION_PAGE_ROWS`).
+        **page_state**
+            The page state from which to continue.
+        **prefetch**
+            The number of pages fetched ahead of the caller (default: :py:data:`DEFAULT_PREFETCH_PAGES`).
+
+        See :py:func:`make_get_request` for more kwargs.
+
+    Returns
+    -------
+    generator
+        The transactions, oldest first.
+    """
+    if kwargs.pop('value', None) is not None:
+        raise ValueError('A single transaction (value) cannot be iterated over, use get_transactions')
+    rows = int(kwargs.pop('rows', None) or TRANSACTION_PAGE_ROWS)
+    prefetch = kwargs.pop('prefetch', None) or DEFAULT_PREFETCH_PAGES
+    start = kwargs.pop('page_state', None) or ''
+    kwargs.pop('count', None)
+    for key in ('min', 'max'):
+        if kwargs.get(key) is not None:
+            kwargs[key] = int(kwargs[key])
+
+    pages = Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def fetch_pages():
+        query = dict(kwargs)
+        page_state = start
+        try:
+            while not stop.is_set():
+                page = get_transactions(dataset_id, rows=rows, page_state=page_state, **query)
+                transactions, next_page_state = transaction_page(page)
+                _put_unless_stopped(pages, (transactions, None), stop)
+                if not transactions:
+                    break
+                if isinstance(page, list):
+                    # A page without a page state continues from the index after its last transaction.  A negative
+                    # min reads from the start of the log.
+                    query['min'] = max(query.get('min') or 0, 0) + len(transactions)
+                    if len(transactions) < rows or (query.get('max') is not None and query['min'] > query['max']):
+                        break
+                    continue
+                if not next_page_state or next_page_state == page_state:
+                    break
+                page_state = next_page_state
+        except Exception as e:
+            _put_unless_stopped(pages, (None, e), stop)
+        _put_unless_stopped(pages, None, stop)
+
+    fetcher = threading.Thread(target=fetch_pages, name='conduce-transaction-pages')
+    fetcher.daemon = True
+    fetcher.start()
+
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            transactions, error = page
+            if error is not None:
+                raise error
+            for transaction in transactions:
+                yield transaction
+    finally:
+        stop.set()
+
+
+def save_transactions(dataset_id, path, **kwargs):
+    """
+    Write the transaction log of a dataset to a newline delimited JSON file as it is read.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    path : string
+        Path of the output file.
+    **kwargs : key-value
+        See :py:func:`iter_transactions`.
+
+    Returns
+    -------
+    integer
+        The number of transactions written.
+    """
+    count = 0
+    with open(path, 'w') as outfile:
+        for transaction in iter_transactions(dataset_id, **kwargs):
+            outfile.write(json.dumps(transaction))
+            outfile.write('\n')
+            count += 1
+    return count
+
+
 def delete_transactions(dataset_id, **kwargs):
     """
     Clear all dataset transactions from Conduce.
@@ -1004,6 +1580,67 @@ def process_transactions(dataset_id, backend_id, **kwargs):
     return make_patch_request({}, fragment, parameters=parameters, **kwargs)
 
 
+def process_transaction_range(dataset_id, backend_id, first, last, window, **kwargs):
+    """
+    Process a range of transactions on a dataset backend in windows.
+
+    Instead of processing one transaction per job, ``first`` through ``last`` (inclusive) are submitted as
+    ``min``/``max`` ranges of at most ``window`` transactions.  Up to ``pipeline_depth`` windows are kept in
+    flight, so the next window is submitted while the previous job runs.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset to which the backend belongs.
+    backend_id : string
+        The UUID that identifies the dataset backend to update.
+    first : integer
+        The oldest transaction to process.
+    last : integer
+        The newest transaction to process.
+    window : integer
+        The maximum number of transactions processed by a single job.
+    **kwargs : key-value
+        **pipeline_depth**
+            The maximum number of window jobs in flight (default: :py:data:`DEFAULT_PIPELINE_DEPTH`).
+        **progress_callback**
+            A function called with ``(backend_id, min, max)`` as each window is submitted.
+        **timeout**
+            The number of seconds to wait for each window job to complete.
+        See :py:func:`make_patch_request` for more kwargs.
+
+    Returns
+    -------
+    list
+        The ``(min, max)`` transaction range of each window processed.
+
+    Raises
+    ------
+    requests.HTTPError, TimeoutError
+        If a window job fails.  Windows after the failed window are not submitted.
+    """
+    pipeline_depth = max(kwargs.pop('pipeline_depth', None) or DEFAULT_PIPELINE_DEPTH, 1)
+    progress_callback = kwargs.pop('progress_callback', None)
+
+    windows = []
+    pending = collections.deque()
+    for start in range(first, last + 1, window):
+        end = min(start + window - 1, last)
+        while len(pending) >= pipeline_depth:
+            wait_for_job(pending.popleft(), **kwargs)
+
+        if progress_callback is not None:
+            progress_callback(backend_id, start, end)
+        response = process_transactions(dataset_id, backend_id, min=start, max=end, **kwargs)
+        pending.append(response.headers['location'])
+        windows.append((start, end))
+
+    while pending:
+        wait_for_job(pending.popleft(), **kwargs)
+
+    return windows
+
+
 def enable_auto_processing(dataset_id, backend_id, enable=True, **kwargs):
     """
     Configure a dataset backend to automatically process new transactions
@@ -1185,6 +1822,45 @@ def _clear_dataset(dataset_id, **kwargs):
     return delete_transactions(dataset_id, **kwargs)
 
 
+def clear_datasets(dataset_ids, **kwargs):
+    """
+    Clear many datasets concurrently.
+
+    The transaction logs of the datasets are deleted concurrently and the resulting jobs are then waited for
+    together (see :py:func:`wait_for_jobs`).
+
+    Parameters
+    ----------
+    dataset_ids : list
+        The UUIDs that identify the datasets to clear.
+    **kwargs:
+        **workers**
+            The number of concurrent requests (default: :py:data:`DEFAULT_BULK_WORKERS`).
+        **max_requests_per_second**
+            The maximum rate at which requests are started (default: :py:data:`BULK_MAX_RATE`).
+
+        See :py:func:`wait_for_jobs` for more kwargs.
+
+    Returns
+    -------
+    list
+        ``(dataset_id, result)`` for each dataset, in order.  ``result`` is the final :py:class:`requests.Response`
+        of the clear, or the exception that ended it.
+    """
+    bulk_kwargs = {key: kwargs.pop(key) for key in ('workers', 'max_requests_per_second') if key in kwargs}
+    outcomes = _bulk_apply(_clear_dataset, dataset_ids, **dict(kwargs, **bulk_kwargs))
+
+    jobs = {}
+    for dataset_id, result in outcomes:
+        if not isinstance(result, Exception) and 'location' in result.headers:
+            jobs[result.headers['location']] = dataset_id
+    results = dict(outcomes)
+    for job_id, result in wait_for_jobs(list(jobs), **kwargs):
+        results[jobs[job_id]] = result
+
+    return [(dataset_id, results[dataset_id]) for dataset_id, _ in outcomes]
+
+
 def clear_dataset(**kwargs):
     return_message = None
 
@@ -1198,17 +1874,13 @@ def clear_dataset(**kwargs):
         responses.append(_clear_dataset(kwargs['id'], **kwargs))
         return_message = 'cleared 1 dataset'
     elif kwargs['name'] or kwargs['regex'] or kwargs['name'] == "":
-        datasets = list_datasets(**kwargs)
-        to_clear = []
-        for dataset in datasets:
-            if dataset.get('name') is not None and (dataset['name'] == kwargs['name'] or (kwargs['regex'] and re.match(kwargs['regex'], dataset['name']))):
-                to_clear.append(dataset)
+        to_clear = [dataset for dataset in filter_resources(list_datasets(**kwargs), name=kwargs['name'], regex=kwargs['regex'])
+                    if dataset.get('name') is not None]
         if len(to_clear) == 1:
             responses.append(_clear_dataset(to_clear[0]['id'], **kwargs))
             return_message = 'cleared 1 dataset'
         elif kwargs['all']:
-            for dataset in to_clear:
-                responses.append(_clear_dataset(dataset['id'], **kwargs))
+            _raise_first_error(clear_datasets([dataset['id'] for dataset in to_clear], **kwargs))
             return_message = "cleared {:d} datasets".format(len(to_clear))
         elif len(to_clear) > 1:
             return_message = "Matching datasets:\n"
@@ -1217,10 +1889,10 @@ def clear_dataset(**kwargs):
         else:
             return_message = "No matching datasets found."
 
-    for response in responses:
-        if 'location' in response.headers:
-            job_id = response.headers['location']
-            response = wait_for_job(job_id, **kwargs)
+    job_ids = [response.headers['location'] for response in responses if 'location' in response.headers]
+    errors = [result for _, result in wait_for_jobs(job_ids, **kwargs) if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
 
     return return_message
 
@@ -1246,37 +1918,96 @@ def _modify_data(dataset_id, entity_set, **kwargs):
     return response
 
 
-"""
-TODO: Use this to clean up the long if statements, but needs to be tested against original logic
-def _found_id(resource_obj, kwargs):
-    return (resource_obj.get('id') is not None and (resource_obj['id'] == kwargs['id']))
+def resource_query(**kwargs):
+    """
+    Compile resource search parameters into a predicate.
 
+    The query is compiled once (the regular expression is compiled and the tags are collected in a set) so that
+    the predicate can be applied to tens of thousands of resources cheaply.
 
-def _found_name(resource_obj, kwargs):
-    return ((resource_obj.get('name') is not None) and
-            (resource_obj['name'] == kwargs['name']))
+    Parameters
+    ----------
+    **kwargs : key-value
+        type : string
+            Only match resources of this type.
+        mime : string
+            Only match resources of this mime type.
+        tags : list
+            Only match resources that have all of these tags.
+        id : string
+            Match the resource with this ID.
+        name : string
+            Match resources with this name.
+        regex : string
+            Match resources whose names match this regular expression (see :py:func:`re.match`).
+        no_name : boolean
+            Match resources without a name.
 
+        A resource must match ``type``, ``mime`` and ``tags`` and, if any of ``id``, ``name``, ``regex`` or
+        ``no_name`` is passed, at least one of them.  Other kwargs are ignored.
 
-def _found_no_name(resource_obj, kwargs):
-    return ((resource_obj.get('name') is None) and kwargs.get('no_name', False) is True)
+    Returns
+    -------
+    function
+        A function of a resource dictionary that returns True if the resource matches the query, or None if the
+        query matches every resource.
+    """
+    checks = []
 
+    resource_type = kwargs.get('type')
+    if resource_type is not None:
+        checks.append(lambda resource: resource.get('type') == resource_type)
+    mime = kwargs.get('mime')
+    if mime is not None:
+        checks.append(lambda resource: resource.get('mime') == mime)
+    if kwargs.get('tags') is not None:
+        tags = frozenset(kwargs['tags'])
+        checks.append(lambda resource: tags.issubset(resource.get('tags') or ()))
 
-def _regex_matches_name(resource_obj, kwargs):
-    return (resource_obj.get('name') is not None and kwargs['regex'] and re.match(kwargs['regex'], resource_obj['name']))
+    resource_id = kwargs.get('id')
+    name = kwargs.get('name')
+    regex = kwargs.get('regex')
+    no_name = kwargs.get('no_name', False)
+    if resource_id is not None or name is not None or regex is not None or no_name is not False:
+        ids = frozenset([resource_id]) if resource_id is not None else frozenset()
+        match_regex = re.compile(regex).match if regex else None
 
+        def selected(resource):
+            resource_name = resource.get('name')
+            if resource_name is None:
+                return no_name is True or resource.get('id') in ids
+            return (resource_name == name or resource.get('id') in ids or
+                    (match_regex is not None and match_regex(resource_name) is not None))
 
-def _complicated_condition_part_1(resource_obj, kwargs):
-    return (_found_id(resource_obj, kwargs) or _found_no_name(resource_obj, kwargs))
+        checks.append(selected)
 
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda resource: all(check(resource) for check in checks)
 
-def _complicated_condition_part_2(resource_obj, kwargs):
-    return (_found_name(resource_obj, kwargs) or
-            _regex_matches_name(resource_obj, kwargs))
 
+def filter_resources(resources, **kwargs):
+    """
+    Get the resources that match a query.
 
-def _complicated_condition(resource_obj, kwargs):
-    return _complicated_condition_part_1(resource_obj, kwargs) or _complicated_condition_part_2(resource_obj, kwargs)
-"""
+    Parameters
+    ----------
+    resources : iterable
+        Resource dictionaries, as returned by :py:func:`find_resource`.
+    **kwargs : key-value
+        The query.  See :py:func:`resource_query`.
+
+    Returns
+    -------
+    list
+        The matching resources, in order.
+    """
+    matches = resource_query(**kwargs)
+    if matches is None:
+        return list(resources)
+    return [resource for resource in resources if matches(resource)]
 
 
 def find_resource(**kwargs):
@@ -1311,6 +2042,10 @@ def find_resource(**kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce config or, if not
             found, authenticate via password.  Ignored if `api_key` is provided.
+        catalog : boolean
+            Answer the query from the in-process catalog of the host and user, which lists each resource type at
+            most once per :py:data:`conduce.catalog.CATALOG_TTL` seconds.  Ignored if `content` is "full".
+            See :py:mod:`conduce.catalog`.
 
     Returns
     -------
@@ -1338,9 +2073,16 @@ def find_resource(**kwargs):
         See :py:func:`requests.Response.raise_for_status` for more information.
 
     """
+    if kwargs.get('catalog') and kwargs.get('content') in (None, 'id'):
+        from . import catalog
+        return catalog.find_resource(**kwargs)
+
     search_uri = 'conduce/api/v2/resources/searches'
 
-    if kwargs.get('content') is not None:
+    # A search for IDs only returns no names, so the ID, regex and no_name filters need the resources.
+    ids_only = kwargs.get('content') == 'id'
+    filtered = kwargs.get('id') is not None or kwargs.get('regex') is not None or kwargs.get('no_name', False) is not False
+    if kwargs.get('content') is not None and not (ids_only and filtered):
         search_uri += '?content={}'.format(kwargs.get('content'))
 
     payload = {}
@@ -1359,27 +2101,56 @@ def find_resource(**kwargs):
 
     results = json.loads(make_post_request(payload, search_uri, **kwargs).content)
 
-    if kwargs.get('content') == 'id':
+    if ids_only and not filtered:
         return results['resource_ids']
 
-    found = []
-    if 'resources' in results:
-        if kwargs['name'] is None and kwargs['regex'] is None and kwargs['id'] is None and kwargs.get('no_name', False) is False:
-            return results['resources']
-        else:
-            for resource_obj in results['resources']:
-                if ((resource_obj.get('id') is not None and resource_obj['id'] == kwargs['id']) or
-                    (resource_obj.get('name') is None and kwargs.get('no_name', False) is True) or
-                        (resource_obj.get('name') is not None and
-                            (resource_obj['name'] == kwargs['name'] or
-                                (kwargs['regex'] and re.match(kwargs['regex'], resource_obj['name']))))):
-                    found.append(resource_obj)
-
-    return found
+    # The server applies the type, name, mime and tags filters.
+    resources = filter_resources(results.get('resources', []), id=kwargs['id'], name=kwargs['name'], regex=kwargs['regex'],
+                                 no_name=kwargs.get('no_name', False))
+    if ids_only:
+        return [resource['id'] for resource in resources]
+    return resources
 
 
 def _remove_resource(resource_id, **kwargs):
-    return make_delete_request('conduce/api/v2/resources/{}?permanent={}'.format(resource_id, kwargs.get('permanent', False)), **kwargs)
+    from . import catalog
+    response = make_delete_request('conduce/api/v2/resources/{}?permanent={}'.format(resource_id, kwargs.get('permanent', False)), **kwargs)
+    catalog.resource_removed(resource_id)
+    return response
+
+
+def remove_resources(resource_ids, **kwargs):
+    """
+    Remove many resources concurrently.
+
+    Parameters
+    ----------
+    resource_ids : list
+        The UUIDs that identify the resources to remove.
+    **kwargs:
+        **permanent**
+            Permanently destroy (hard delete) the resources.
+        **workers**
+            The number of concurrent requests (default: :py:data:`DEFAULT_BULK_WORKERS`).
+        **max_requests_per_second**
+            The maximum rate at which requests are started (default: :py:data:`BULK_MAX_RATE`).
+
+        See :py:func:`make_delete_request` for more kwargs.
+
+    Returns
+    -------
+    list
+        ``(resource_id, result)`` for each resource, in order.  ``result`` is the :py:class:`requests.Response` of
+        the removal, or the exception that it raised.  Exceptions are returned rather than raised so that one
+        failure does not abandon the other removals.
+    """
+    return _bulk_apply(_remove_resource, resource_ids, **kwargs)
+
+
+def _raise_first_error(outcomes):
+    errors = [result for _, result in outcomes if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
 
 
 def remove_resource(**kwargs):
@@ -1397,21 +2168,13 @@ def remove_resource(**kwargs):
     if kwargs['id']:
         return_message = _remove_resource(kwargs['id'], **kwargs)
     elif kwargs['name'] or kwargs['regex'] or kwargs['name'] == "" or kwargs.get('no_name') or kwargs.get('tags'):
-        results = find_resource(**kwargs)
-        to_remove = []
-        for resource_obj in results:
-            if (resource_obj.get('name') is not None and
-                    (resource_obj['name'] == kwargs['name']) or
-                    (resource_obj.get('name') is None and kwargs.get('no_name', False) is True) or
-                    (kwargs['regex'] and re.match(kwargs['regex'], resource_obj['name'])) or
-                    (kwargs.get('tags') is not None and set(kwargs.get('tags')) < set(resource_obj['tags']))):
-                to_remove.append(resource_obj)
+        to_remove = filter_resources(find_resource(**kwargs), name=kwargs['name'], regex=kwargs['regex'], no_name=kwargs.get('no_name', False),
+                                     tags=kwargs.get('tags'))
         if len(to_remove) == 1:
             _remove_resource(to_remove[0]['id'], **kwargs)
             return_message = 'Removed 1 {}'.format(resource_type)
         elif kwargs['all']:
-            for resource_obj in to_remove:
-                _remove_resource(resource_obj.get('id'), **kwargs)
+            _raise_first_error(remove_resources([resource_obj.get('id') for resource_obj in to_remove], **kwargs))
             return_message = "Removed {:d} {}".format(
                 len(to_remove), resource_type)
         elif len(to_remove) > 1:
@@ -1523,7 +2286,10 @@ def get_resource(resource_id, **kwargs):
 
 
 def _update_resource(resource_id, resource_def, **kwargs):
-    return json.loads(make_put_request(resource_def, 'conduce/api/v2/resources/{}'.format(resource_id), **kwargs).content)
+    from . import catalog
+    resource = json.loads(make_put_request(resource_def, 'conduce/api/v2/resources/{}'.format(resource_id), **kwargs).content)
+    catalog.resource_changed(resource, **kwargs)
+    return resource
 
 
 def get_time_fixed(time):
@@ -1595,6 +2361,8 @@ def create_resource(resource_type, resource_name, content, mime_type, **kwargs):
     kwargs : key-value
         **tags**
             A list of strings that help identify the resource.
+        **compress**
+            Send large resource content gzip compressed.
 
         See :py:func:`make_post_request` for more information
 
@@ -1627,7 +2395,10 @@ def create_resource(resource_type, resource_name, content, mime_type, **kwargs):
         'content': content
     }
 
-    return json.loads(make_post_request(resource_def, 'conduce/api/v2/resources', **kwargs).content)
+    from . import catalog
+    resource = json.loads(make_post_request(resource_def, 'conduce/api/v2/resources', **kwargs).content)
+    catalog.resource_changed(resource, **kwargs)
+    return resource
 
 
 def create_json_resource(resource_type, resource_name, content, **kwargs):
@@ -1648,6 +2419,8 @@ def create_json_resource(resource_type, resource_name, content, **kwargs):
     kwargs : key-value
         **tags**
             A list of strings that help identify the resource.
+        **compress**
+            Send large resource content gzip compressed.
 
         See :py:func:`make_post_request` for more information
 
@@ -1778,6 +2551,9 @@ def make_delete_request(fragment, **kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce configuration or,
             if not found, authenticate via password.  Ignored if `api_key` is provided.
+        pool_size : integer
+            The maximum number of keep-alive connections held open to the host.  Only applies the first
+            time a host and credential are used, see :py:func:`conduce.connection.get_client`.
 
     Returns
     -------
@@ -1817,6 +2593,15 @@ def make_get_request(fragment, **kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce config or, if not found,
             authenticate via password.  Ignored if `api_key` is provided.
+        pool_size : integer
+            The maximum number of keep-alive connections held open to the host.  Only applies the first
+            time a host and credential are used, see :py:func:`conduce.connection.get_client`.
+        stream : boolean
+            Return before the response body is read.  Read the body incrementally with
+            :py:meth:`requests.Response.iter_content` and close the response when done.
+
+        Responses are requested with ``Accept-Encoding: gzip, deflate`` (the :py:mod:`requests` default) and
+        decompressed transparently, which greatly reduces the transfer size of large reads.
 
     Returns
     -------
@@ -1859,6 +2644,14 @@ def make_post_request(payload, fragment, **kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce config or, if not found,
             authenticate via password.  Ignored if `api_key` is provided.
+        pool_size : integer
+            The maximum number of keep-alive connections held open to the host.  Only applies the first
+            time a host and credential are used, see :py:func:`conduce.connection.get_client`.
+        compress : boolean
+            Send the payload gzip compressed (``Content-Encoding: gzip``) when its JSON encoding is at least
+            ``compress_min_bytes`` long (default: :py:data:`GZIP_MIN_BYTES`).  Compression is opt-in because the
+            server must accept compressed request bodies.
+
     Returns
     -------
     requests.Response
@@ -1900,6 +2693,13 @@ def make_put_request(payload, fragment, **kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce config or, if not found,
             authenticate via password.  Ignored if `api_key` is provided.
+        pool_size : integer
+            The maximum number of keep-alive connections held open to the host.  Only applies the first
+            time a host and credential are used, see :py:func:`conduce.connection.get_client`.
+        compress : boolean
+            Send the payload gzip compressed (``Content-Encoding: gzip``) when its JSON encoding is at least
+            ``compress_min_bytes`` long (default: :py:data:`GZIP_MIN_BYTES`).  Compression is opt-in because the
+            server must accept compressed request bodies.
 
     Returns
     -------
@@ -1942,6 +2742,13 @@ def make_patch_request(payload, fragment, **kwargs):
         user : string
             The user's email address.  Used to look up an API key from the Conduce configuration or,
             if not found, authenticate via password.  Ignored if `api_key` is provided.
+        pool_size : integer
+            The maximum number of keep-alive connections held open to the host.  Only applies the first
+            time a host and credential are used, see :py:func:`conduce.connection.get_client`.
+        compress : boolean
+            Send the payload gzip compressed (``Content-Encoding: gzip``) when its JSON encoding is at least
+            ``compress_min_bytes`` long (default: :py:data:`GZIP_MIN_BYTES`).  Compression is opt-in because the
+            server must accept compressed request bodies.
 
     Returns
     -------
@@ -1958,7 +2765,7 @@ def make_patch_request(payload, fragment, **kwargs):
     return _make_request(requests.patch, payload, compose_uri(fragment), **kwargs)
 
 
-@retry(retry_on_exception=_retry_on_retryable_error, wait_exponential_multiplier=WAIT_EXPONENTIAL_MULTIPLIER, stop_max_attempt_number=NUM_RETRIES)
+@retry(retry_on_exception=is_retryable_error, wait_exponential_multiplier=WAIT_EXPONENTIAL_MULTIPLIER, stop_max_attempt_number=NUM_RETRIES)
 def _make_request(request_func, payload, uri, **kwargs):
     USER_CONFIG = {}
 
@@ -1983,14 +2790,19 @@ def _make_request(request_func, payload, uri, **kwargs):
         verify = True
 
     if 'api_key' in kwargs and kwargs['api_key']:
+        credential = kwargs['api_key']
         auth = session.api_key_header(kwargs['api_key'])
     else:
         if 'user' in kwargs and kwargs['user']:
             user = kwargs['user']
         else:
             user = cfg(USER_CONFIG, 'default-user')
+        credential = user
         auth = session.get_session(host, user, password, verify)
 
+    client = connection.get_client(host, credential, kwargs.get('pool_size'))
+    request_func = connection.pooled_request_func(request_func, client)
+
     headers = {}
     url = 'https://{}/{}'.format(host, uri)
     if 'Authorization' in auth:
@@ -2000,14 +2812,100 @@ def _make_request(request_func, payload, uri, **kwargs):
         else:
             headers = auth
 
-        response = request_func(url, json=payload, headers=headers, verify=verify, params=kwargs.get('parameters'))
+    body = {'json': payload}
+    if kwargs.get('compress') and payload is not None:
+        data, content_encoding = _encode_body(payload, kwargs.get('compress_min_bytes'))
+        body = {'data': data}
+        headers = dict(headers, **{'Content-Type': 'application/json'})
+        if content_encoding:
+            headers['Content-Encoding'] = content_encoding
+    elif isinstance(payload, JSONBody):
+        body = {'data': payload.data}
+        headers = dict(headers, **{'Content-Type': 'application/json'})
+
+    if kwargs.get('stream'):
+        body['stream'] = True
+
+    if 'Authorization' in auth:
+        response = request_func(url, headers=headers, verify=verify, params=kwargs.get('parameters'), **body)
     else:
-        response = request_func(url, json=payload, cookies=auth, headers=headers, verify=verify, params=kwargs.get('parameters'))
+        response = request_func(url, cookies=auth, headers=headers, verify=verify, params=kwargs.get('parameters'), **body)
+
+    if response.status_code == 401:
+        session.invalidate_session(host, credential)
 
     response.raise_for_status()
     return response
 
 
+def _json_chunks(payload):
+    if isinstance(payload, JSONBody):
+        return payload.chunks()
+    return _encode_slices(payload)
+
+
+def _encode_slices(value):
+    # Encode whole values at a time, except long lists, which are encoded ENCODE_SLICE_ITEMS items at a time so that
+    # the uncompressed encoding of a large payload is never held in memory as a whole.
+    if isinstance(value, dict):
+        yield b'{'
+        for idx, (key, item) in enumerate(value.items()):
+            yield (b',' if idx else b'') + util.dumps_bytes(str(key)) + b':'
+            for chunk in _encode_slices(item):
+                yield chunk
+        yield b'}'
+    elif isinstance(value, list) and len(value) > ENCODE_SLICE_ITEMS:
+        yield b'['
+        for start in range(0, len(value), ENCODE_SLICE_ITEMS):
+            yield (b',' if start else b'') + util.dumps_bytes(value[start:start + ENCODE_SLICE_ITEMS])[1:-1]
+        yield b']'
+    else:
+        yield util.dumps_bytes(value)
+
+
+def _blocks(chunks, block_bytes):
+    # Join small chunks into blocks of at least block_bytes bytes.
+    block = []
+    size = 0
+    for chunk in chunks:
+        block.append(chunk)
+        size += len(chunk)
+        if size >= block_bytes:
+            yield b''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield b''.join(block)
+
+
+def _encode_body(payload, min_bytes=None):
+    """
+    Encode a request payload as JSON, gzip compressed if it is at least ``min_bytes`` long.
+
+    The payload is encoded and compressed in blocks of about :py:data:`GZIP_BLOCK_BYTES` so the uncompressed body
+    of a large request is never held in memory as a whole.
+
+    Returns
+    -------
+    tuple
+        The request body and its content encoding (``gzip`` or None).
+    """
+    if min_bytes is None:
+        min_bytes = GZIP_MIN_BYTES
+
+    blocks = _blocks(_json_chunks(payload), max(min_bytes, GZIP_BLOCK_BYTES))
+    head = next(blocks, b'')
+    if len(head) < min_bytes:
+        return head, None
+
+    # A wbits value of 31 writes a gzip header and trailer.
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    compressed = [compressor.compress(head)]
+    compressed.extend(compressor.compress(block) for block in blocks)
+    compressed.append(compressor.flush())
+    return b''.join(compressed), 'gzip'
+
+
 def update_orchestration(resource, **kwargs):
     return update_resource(resource, **kwargs)
 
@@ -2065,22 +2963,123 @@ def _modify_resource_content(resource_id, content, mime_type, **kwargs):
     update_resource(resource, **kwargs)
 
 
+def patch_resource(resource_id, operations, **kwargs):
+    """
+    Modify resource metadata with a JSON patch.
+
+    Only the patched fields are sent, so the resource content is neither downloaded nor uploaded.
+
+    Parameters
+    ----------
+    resource_id : string
+        The UUID that identifies the resource.
+    operations : list
+        JSON patch operations, for example ``[{"op": "add", "path": "/name", "value": "New name"}]``.
+    **kwargs:
+        See :py:func:`make_patch_request`
+
+    Returns
+    -------
+    requests.Response
+        The response of the PATCH request.
+    """
+    from . import catalog
+    response = make_patch_request(operations, '/api/v2/resources/{}'.format(resource_id), **kwargs)
+    catalog.resource_expired(resource_id)
+    return response
+
+
+def _tags_patch(tags):
+    return [{'op': 'add', 'path': '/tags', 'value': tags}]
+
+
 def set_tags(resource_id, tags, **kwargs):
-    resource = get_resource(resource_id, **kwargs)
-    resource['tags'] = tags
-    update_resource(resource, **kwargs)
+    """
+    Replace the tags of a resource.
+
+    See :py:func:`patch_resource` for kwargs.
+    """
+    return patch_resource(resource_id, _tags_patch(tags), **kwargs)
 
 
 def add_tags(resource_id, tags, **kwargs):
-    resource = get_resource(resource_id, **kwargs)
-    resource['tags'] += tags
-    update_resource(resource, **kwargs)
+    """
+    Append tags to the tags of a resource.
+
+    See :py:func:`patch_resource` for kwargs.
+    """
+    return patch_resource(resource_id, [{'op': 'add', 'path': '/tags/-', 'value': tag} for tag in tags], **kwargs)
 
 
 def remove_tags(resource_id, tags, **kwargs):
-    resource = get_resource(resource_id, **kwargs)
-    resource['tags'] = [tag for tag in resource['tags'] if tag not in tags]
-    update_resource(resource, **kwargs)
+    """
+    Remove tags from the tags of a resource.
+
+    The current tags are read from ``resource``, if given, and otherwise with :py:func:`get_resource`.
+
+    Parameters
+    ----------
+    resource_id : string
+        The UUID that identifies the resource.
+    tags : list
+        The tags to remove.
+    **kwargs:
+        **resource**
+            The resource dictionary with the current tags, for example from :py:func:`find_resource`.  Saves a
+            request per resource when tags are removed from many resources (see also :py:func:`edit_tags`).
+
+        See :py:func:`patch_resource` for more kwargs.
+    """
+    resource = kwargs.pop('resource', None)
+    if resource is None:
+        resource = get_resource(resource_id, **{key: value for key, value in kwargs.items() if key != 'raw'})
+    return patch_resource(resource_id, _tags_patch([tag for tag in resource.get('tags') or [] if tag not in tags]), **kwargs)
+
+
+def edit_tags(resources, **kwargs):
+    """
+    Change the tags of many resources concurrently.
+
+    The new tags of each resource are computed from the tags in its metadata and sent in a single JSON patch
+    (see :py:func:`patch_resource`), so resource content is never transferred.
+
+    Parameters
+    ----------
+    resources : list
+        Resource dictionaries with ``id`` and ``tags`` fields, as returned by :py:func:`find_resource`.
+    **kwargs:
+        **set**
+            Replace the tags of each resource with this list.
+        **add**
+            Add these tags to each resource, unless it already has them.
+        **remove**
+            Remove these tags from each resource.
+        **workers**
+            The number of concurrent requests (default: :py:data:`DEFAULT_BULK_WORKERS`).
+        **max_requests_per_second**
+            The maximum rate at which requests are started (default: :py:data:`BULK_MAX_RATE`).
+
+        See :py:func:`make_patch_request` for more kwargs.
+
+    Returns
+    -------
+    list
+        ``(resource_id, result)`` for each resource, in order.  ``result`` is the :py:class:`requests.Response` of
+        the PATCH request, or the exception that it raised.
+    """
+    replacement = kwargs.pop('set', None)
+    added = kwargs.pop('add', None) or []
+    removed = frozenset(kwargs.pop('remove', None) or [])
+
+    def edit(resource, **request_kwargs):
+        current = replacement if replacement is not None else resource.get('tags') or []
+        tags = [tag for tag in current if tag not in removed]
+        for tag in added:
+            if tag not in tags:
+                tags.append(tag)
+        return patch_resource(resource['id'], _tags_patch(tags), **request_kwargs)
+
+    return [(resource['id'], result) for resource, result in _bulk_apply(edit, resources, **kwargs)]
 
 
 def account_exists(email, **kwargs):
@@ -0,0 +1,344 @@
+"""
+Client-side catalog of resources.
+
+A :py:class:`ResourceCatalog` keeps the results of resource searches in memory and answers repeated lookups by ID,
+name, name prefix, regular expression, tag, type or mime type from indexes instead of searching the server again::
+
+    from conduce import api
+
+    dataset = api.find_dataset(name='US Cities', catalog=True, host=host, api_key=api_key)
+
+Each resource type is listed at most once per :py:data:`CATALOG_TTL` seconds.  Resources created, updated or
+removed through :py:mod:`conduce.api` update the catalogs of this process immediately.  Changes made elsewhere
+are picked up when a listing expires.
+"""
+from __future__ import absolute_import
+import bisect
+import collections
+import copy
+import re
+import threading
+import time
+
+from . import api
+
+# Number of seconds a listing of resources is used before it is fetched again.
+CATALOG_TTL = 60.0
+
+# Search parameters, which are applied by the catalog rather than sent with the listing request.
+_QUERY_KEYS = ('id', 'type', 'name', 'regex', 'mime', 'tags', 'no_name', 'prefix', 'content', 'catalog', 'refresh')
+
+# Characters that end the literal prefix of a regular expression.
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+class _Listing(object):
+    """
+    The resources of one type (or of every type) and their indexes.
+    """
+
+    def __init__(self, resources, expires):
+        self.resources = collections.OrderedDict((resource['id'], resource) for resource in resources)
+        self.expires = expires
+        self._indexed = False
+
+    def _index(self):
+        if self._indexed:
+            return
+        self.by_name = collections.defaultdict(list)
+        self.by_tag = collections.defaultdict(set)
+        self.by_type = collections.defaultdict(set)
+        self.by_mime = collections.defaultdict(set)
+        for resource_id, resource in self.resources.items():
+            self.by_name[resource.get('name')].append(resource_id)
+            for tag in resource.get('tags') or []:
+                self.by_tag[tag].add(resource_id)
+            self.by_type[resource.get('type')].add(resource_id)
+            self.by_mime[resource.get('mime')].add(resource_id)
+        self.names = sorted(name for name in self.by_name if name is not None)
+        self._indexed = True
+
+    def put(self, resource):
+        self.resources[resource['id']] = resource
+        self._indexed = False
+
+    def discard(self, resource_id):
+        if self.resources.pop(resource_id, None) is not None:
+            self._indexed = False
+
+    def with_prefix(self, prefix):
+        """
+        Get the IDs of the resources whose names start with ``prefix``.
+        """
+        ids = set()
+        for name in self._names_with_prefix(prefix):
+            ids.update(self.by_name[name])
+        return ids
+
+    def _names_with_prefix(self, prefix):
+        self._index()
+        for position in range(bisect.bisect_left(self.names, prefix), len(self.names)):
+            if not self.names[position].startswith(prefix):
+                return
+            yield self.names[position]
+
+    def select(self, **kwargs):
+        """
+        Get the resources that match a query, in listing order.  See :py:meth:`ResourceCatalog.find`.
+
+        The indexes only narrow the candidates.  Whether a candidate matches is decided by the predicate that
+        :py:func:`conduce.api.find_resource` applies to search results, see :py:func:`conduce.api.resource_query`.
+        """
+        self._index()
+
+        # Filters applied by the server when searching.  Every one of them must match.
+        candidates = None
+        if kwargs.get('type') is not None:
+            candidates = _intersect(candidates, self.by_type.get(kwargs['type'], set()))
+        if kwargs.get('name') is not None:
+            candidates = _intersect(candidates, set(self.by_name.get(kwargs['name'], [])))
+        if kwargs.get('mime') is not None:
+            candidates = _intersect(candidates, self.by_mime.get(kwargs['mime'], set()))
+        if kwargs.get('tags') is not None:
+            for tag in kwargs['tags']:
+                candidates = _intersect(candidates, self.by_tag.get(tag, set()))
+        if kwargs.get('prefix') is not None:
+            candidates = _intersect(candidates, self.with_prefix(kwargs['prefix']))
+
+        # Filters applied by find_resource to the search results.  Any one of them may match.
+        if kwargs.get('name') is not None or kwargs.get('regex') is not None or kwargs.get('id') is not None or kwargs.get('no_name', False) is not False:
+            selected = set()
+            if kwargs.get('id') in self.resources:
+                selected.add(kwargs['id'])
+            if kwargs.get('no_name', False) is True:
+                selected.update(self.by_name.get(None, []))
+            if kwargs.get('name') is not None:
+                selected.update(self.by_name.get(kwargs['name'], []))
+            if kwargs.get('regex'):
+                selected.update(self.with_prefix(_literal_prefix(kwargs['regex'])))
+            candidates = _intersect(candidates, selected)
+
+        resources = self.resources.values() if candidates is None else [
+            resource for resource_id, resource in self.resources.items() if resource_id in candidates]
+        return api.filter_resources(resources, **kwargs)
+
+
+def _intersect(candidates, ids):
+    return set(ids) if candidates is None else candidates & ids
+
+
+def _literal_prefix(pattern):
+    # The characters every name matched by re.match(pattern) starts with.
+    if '|' in pattern:
+        return ''
+    prefix = []
+    for char in pattern:
+        if char in _REGEX_SPECIAL:
+            if char in '*?{' and prefix:
+                # The quantifier makes the previous character optional.
+                prefix.pop()
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+
+def _revision(resource):
+    # Resources carry a revision that is incremented on every update and the time of the last update.
+    return (resource.get('revision') or 0, resource.get('modify_time') or 0)
+
+
+class ResourceCatalog(object):
+    """
+    An in-memory, indexed cache of the resources visible to one user of one Conduce server.
+
+    Parameters
+    ----------
+    **kwargs:
+        **ttl**
+            The number of seconds a listing of resources is used (default: :py:data:`CATALOG_TTL`).
+
+        See :py:func:`conduce.api.find_resource` for more kwargs, which are used to list the resources.
+    """
+
+    def __init__(self, **kwargs):
+        self.ttl = kwargs.pop('ttl', None) or CATALOG_TTL
+        self.request_kwargs = {key: value for key, value in kwargs.items() if key not in _QUERY_KEYS}
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def _listing(self, resource_type, refresh=False):
+        # A listing of every type also answers queries for one type.
+        now = time.time()
+        with self._lock:
+            for key in ((None,) if resource_type is None else (resource_type, None)):
+                listing = self._listings.get(key)
+                if listing is not None and listing.expires > now and not refresh:
+                    return listing
+            previous = self._listings.get(resource_type)
+
+        resources = api.find_resource(type=resource_type, **self.request_kwargs)
+        listing = _Listing(resources, time.time() + self.ttl)
+
+        with self._lock:
+            if previous is not None:
+                # Keep the newer copy of resources that were updated through this process after the search index
+                # was read.
+                for resource in previous.resources.values():
+                    listed = listing.resources.get(resource['id'])
+                    if listed is not None and _revision(resource) > _revision(listed):
+                        listing.put(resource)
+            self._listings[resource_type] = listing
+        return listing
+
+    def find(self, **kwargs):
+        """
+        Get resources that match a query.
+
+        The query parameters match those of :py:func:`conduce.api.find_resource`, which the results also match.
+
+        Parameters
+        ----------
+        **kwargs:
+            **id**, **type**, **name**, **regex**, **mime**, **tags**, **no_name**
+                See :py:func:`conduce.api.find_resource`.
+            **prefix**
+                Only return resources whose names start with this string.
+            **content**
+                None, or "id" to return a list of resource IDs.
+            **refresh**
+                List the resources again even if the cached listing has not expired.
+
+        Returns
+        -------
+        list
+            Copies of the matching resources.
+        """
+        listing = self._listing(kwargs.get('type'), kwargs.get('refresh', False))
+        with self._lock:
+            resources = listing.select(**kwargs)
+        if kwargs.get('content') == 'id':
+            return [resource['id'] for resource in resources]
+        return copy.deepcopy(resources)
+
+    def put(self, resource, add=True):
+        """
+        Add or replace a resource in the cached listings, unless a newer revision is cached.
+
+        If ``add`` is False, only a resource that is already cached is replaced.
+        """
+        with self._lock:
+            for resource_type, listing in self._listings.items():
+                if resource_type not in (None, resource.get('type')):
+                    continue
+                cached = listing.resources.get(resource['id'])
+                if (cached is None and add) or (cached is not None and _revision(resource) >= _revision(cached)):
+                    listing.put(resource)
+
+    def discard(self, resource_id):
+        """
+        Remove a resource from the cached listings.
+        """
+        with self._lock:
+            for listing in self._listings.values():
+                listing.discard(resource_id)
+
+    def expire(self, resource_id):
+        """
+        Expire the cached listings that hold a resource, so that the next query lists the resources again.
+        """
+        with self._lock:
+            for listing in self._listings.values():
+                if resource_id in listing.resources:
+                    listing.expires = 0
+
+    def invalidate(self):
+        """
+        Drop the cached listings, so that the next query lists the resources again.
+        """
+        with self._lock:
+            self._listings.clear()
+
+
+def _catalog_key(kwargs):
+    return (kwargs.get('host'), kwargs.get('user'), kwargs.get('api_key'))
+
+
+def get_catalog(**kwargs):
+    """
+    Get the shared catalog of a host and user, creating it if it does not exist.
+
+    Parameters
+    ----------
+    **kwargs:
+        See :py:class:`ResourceCatalog`.  The ``host``, ``user`` and ``api_key`` kwargs select the catalog.
+
+    Returns
+    -------
+    ResourceCatalog
+        The catalog.
+    """
+    key = _catalog_key(kwargs)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = ResourceCatalog(**kwargs)
+            _catalogs[key] = catalog
+    return catalog
+
+
+def find_resource(**kwargs):
+    """
+    Get resources that match a query from the shared catalog of a host and user.
+
+    See :py:meth:`ResourceCatalog.find`.
+    """
+    return get_catalog(**kwargs).find(**kwargs)
+
+
+def resource_changed(resource, **kwargs):
+    """
+    Update the catalogs with a resource that was created or modified.
+
+    The resource is added to the catalog selected by ``kwargs`` (see :py:func:`get_catalog`) and replaced in the
+    other catalogs that already hold it.
+    """
+    if not isinstance(resource, dict) or 'id' not in resource:
+        return
+    # Listings do not hold resource content.
+    resource = {key: value for key, value in resource.items() if key != 'content'}
+    key = _catalog_key(kwargs)
+    with _catalogs_lock:
+        catalogs = list(_catalogs.items())
+    for catalog_key, catalog in catalogs:
+        catalog.put(resource, add=catalog_key == key)
+
+
+def resource_removed(resource_id):
+    """
+    Remove a resource from every catalog.
+    """
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    for catalog in catalogs:
+        catalog.discard(resource_id)
+
+
+def resource_expired(resource_id):
+    """
+    Expire the listings of every catalog that hold a resource that was modified in an unknown way.
+    """
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    for catalog in catalogs:
+        catalog.expire(resource_id)
+
+
+def clear_catalogs():
+    """
+    Drop every catalog.
+    """
+    with _catalogs_lock:
+        _catalogs.clear()
@@ -16,6 +16,9 @@ from . import api
 from . import util
 from . import asset
 from . import ingest
+from . import convert
+from . import export
+from . import mirror
 
 
 def isstr(arg):
@@ -42,6 +45,14 @@ def print_response(response):
             print(responseStr)
 
 
+def chunked_summary(result):
+    """
+    Make the summary of a chunked transaction (see :py:func:`conduce.api.post_chunked_transaction`) printable.
+    """
+    failures = [dict(failure, error=str(failure['error'])) for failure in result['failures']]
+    return dict(result, failures=failures)
+
+
 def list_from_args(args):
     object_to_list = args.object_to_list
     del vars(args)['object_to_list']
@@ -161,8 +172,7 @@ def rename_resource(args):
         print('Resources must be renamed one-at-a-time')
         return
 
-    api.make_patch_request([{"path": "/name", "value": args.new_name, "op": "add"}],
-                           '/api/v2/resources/{}'.format(resources[0]['id']), host=args.host, user=args.user, api_key=args.api_key)
+    api.patch_resource(resources[0]['id'], [{"path": "/name", "value": args.new_name, "op": "add"}], host=args.host, user=args.user, api_key=args.api_key)
 
     if args.verbose:
         return api.find_resource(id=resources[0]['id'], host=args.host, user=args.user, api_key=args.api_key)
@@ -275,7 +285,7 @@ def create_dataset(args):
 
     response = api.create_dataset(args.name, backend_types=backend_types, **request_kwargs(**vars(args)))
 
-    if args.json or args.csv:
+    if args.json or args.csv or getattr(args, 'ndjson', None):
         print(json.dumps(response, indent=2))
         response = ingest.ingest_file(response['id'], **vars(args))
     elif args.raw:
@@ -321,12 +331,26 @@ def insert_transaction(args):
 def get_dataset_transactions(args):
     dataset_id = args.dataset_id
     del vars(args)['dataset_id']
-    if args.value:
+    if args.value is not None:
         del vars(args)['min']
         del vars(args)['max']
+    output = vars(args).pop('output', None)
+    if vars(args).pop('all', None) or output:
+        if output:
+            count = api.save_transactions(dataset_id, output, **vars(args))
+            print('{} transactions written to {}'.format(count, output))
+            return
+        return list(api.iter_transactions(dataset_id, **vars(args)))
     return api.get_transactions(dataset_id, **vars(args))
 
 
+def mirror_transactions(args):
+    dataset_id = vars(args).pop('dataset_id')
+    with mirror.TransactionMirror(vars(args).pop('mirror_path', None)) as transactions:
+        added = transactions.sync(dataset_id, **vars(args))
+        return {'added': added, 'transactions': transactions.count(dataset_id)}
+
+
 def strip_none(original):
     return {k: v for k, v in original.items() if v is not None}
 
@@ -338,6 +362,7 @@ def request_kwargs(**kwargs):
         'api_key': kwargs.get('api_key'),
         'no_verify': kwargs.get('no_verify'),
         'password': kwargs.get('password'),
+        'compress': kwargs.get('compress'),
     })
 
 
@@ -354,6 +379,8 @@ def process_transactions(args):
         del vars(args)['max']
         del vars(args)['all']
     timeout = vars(args).pop('timeout')
+    window = vars(args).pop('window', None)
+    pipeline_depth = vars(args).pop('pipeline_depth', None)
 
     if all_backends:
         backend_ids = api.list_dataset_backends(dataset_id, **request_kwargs(**vars(args)))
@@ -364,10 +391,14 @@ def process_transactions(args):
             print('Processing... check backend {} status at {}'.format(backend_id, response.headers['location']))
     elif args.transaction:
         transaction = vars(args).pop('transaction')
+        locations = []
         for backend_id in backend_ids:
             print("Processing transaction {}...".format(transaction))
             response = api.process_transactions(dataset_id, backend_id, transaction=transaction, **request_kwargs(**vars(args)))
-            api.wait_for_job(response.headers['location'], timeout=timeout, **request_kwargs(**vars(args)))
+            locations.append(response.headers['location'])
+        errors = [result for _, result in api.wait_for_jobs(locations, timeout=timeout, **request_kwargs(**vars(args))) if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
     else:
         min_tx = args.min
         min_tx = vars(args).pop('min')
@@ -377,6 +408,20 @@ def process_transactions(args):
         transaction = vars(args).pop('transaction')
 
         max_transaction = max_tx or api.get_transactions(dataset_id, count=True, **vars(args))['count'] - 1
+        if window:
+            def print_window(backend_id, start, end):
+                print("{}: Processing transactions {}-{} of {} on {}...".format(datetime.datetime.now(), start, end, max_transaction, backend_id))
+
+            def process_backend(backend_id):
+                min_transaction = min_tx or api.get_dataset_backend_metadata(dataset_id, backend_id, **vars(args))['transactions']
+                return api.process_transaction_range(dataset_id, backend_id, min_transaction + 1, max_transaction, window,
+                                                     pipeline_depth=pipeline_depth, progress_callback=print_window, timeout=timeout,
+                                                     **request_kwargs(**vars(args)))
+
+            for _ in api.imap_bounded(process_backend, backend_ids, max(len(backend_ids), 1)):
+                pass
+            return
+
         for backend_id in backend_ids:
             min_transaction = min_tx or api.get_dataset_backend_metadata(dataset_id, backend_id, **vars(args))['transactions']
             idx = 1
@@ -515,11 +560,10 @@ def get_backend_status(args):
 
 
 def ingest_data(args):
-    if args.raw:
-        del vars(args)['dataset_id']
-        return ingest_entities(args.dataset_id, args)
     dataset_id = args.dataset_id
     del vars(args)['dataset_id']
+    if args.raw:
+        return ingest_entities(dataset_id, args)
     return ingest.ingest_file(dataset_id, **vars(args))
 
 
@@ -632,13 +676,16 @@ def tag_resource(args):
     resources = api.find_resource(**vars(args))
 
     print(resources)
-    for resource in resources:
-        if set_tags:
-            api.set_tags(resource['id'], tags, **vars(args))
-        elif remove_tags:
-            api.remove_tags(resource['id'], tags, **vars(args))
-        else:
-            api.add_tags(resource['id'], tags, **vars(args))
+    if set_tags:
+        edit = {'set': tags}
+    elif remove_tags:
+        edit = {'remove': tags}
+    else:
+        edit = {'add': tags}
+    outcomes = api.edit_tags(resources, host=args.host, user=args.user, api_key=args.api_key, workers=args.workers, **edit)
+    for resource_id, result in outcomes:
+        if isinstance(result, Exception):
+            print('Failed to tag {}: {}'.format(resource_id, result))
 
 
 def remove_dataset(args):
@@ -813,9 +860,26 @@ def get_entity(args):
 
 
 def dump_data(args):
-    uri = 'datasets/raw-lens/{}/{}/{}/{}/{}/{}/{}/{}/{}'.format(
-        args.dataset_id, args.x_min, args.x_max, args.y_min, args.y_max, args.z_min, args.z_max, args.t_min, args.t_max)
-    return api.make_get_request(uri, **vars(args))
+    output = vars(args).pop('output', None)
+    output_format = vars(args).pop('format', None)
+    if output_format is None and output is not None:
+        output_format = convert.file_format(output)
+
+    if vars(args).pop('tiled', None):
+        count = export.export_tiles(vars(args).pop('dataset_id'), output, output_format or 'ndjson', **vars(args))
+        if output is not None:
+            print('{} entities written to {}'.format(count, output))
+        return
+
+    if output_format is None:
+        uri = 'datasets/raw-lens/{}/{}/{}/{}/{}/{}/{}/{}/{}'.format(
+            args.dataset_id, args.x_min, args.x_max, args.y_min, args.y_max, args.z_min, args.z_max, args.t_min, args.t_max)
+        return api.make_get_request(uri, **vars(args))
+
+    entities = export.iter_raw_entities(vars(args).pop('dataset_id'), **vars(args))
+    count = export.export_entities(entities, output, output_format)
+    if output is not None:
+        print('{} entities written to {}'.format(count, output))
 
 
 def upload_image(args):
@@ -832,6 +896,7 @@ def main():
     class ConduceCommandLineParser(argparse.ArgumentParser):
         def error(self, message):
             self.print_help()
+            sys.stderr.write('{}: error: {}\n'.format(self.prog, message))
             sys.exit(2)
 
     if sys.argv[0] != 'conduce.py':
@@ -845,6 +910,7 @@ def main():
     api_cmd_parser.add_argument('--host', help='The server on which the command will run')
     api_cmd_parser.add_argument('--api-key', help='The API key used to authenticate')
     api_cmd_parser.add_argument('--no-verify', action='store_true', help='If passed, the SSL certificate of the host will not be verified')
+    api_cmd_parser.add_argument('--compress', action='store_true', default=None, help='If passed, large request bodies are sent gzip compressed')
 
     subparsers = arg_parser.add_subparsers(help='help for subcommands', dest='see subcommands')
     subparsers.required = True
@@ -923,16 +989,36 @@ def main():
         '--json', help='Optional: A JSON file that can parsed into Conduce entities')
     dataset_post_transaction_parser.add_argument(
         '--csv', help='Optional: A CSV file that can be parsed as Conduce data')
+    dataset_post_transaction_parser.add_argument(
+        '--ndjson', help='Optional: A newline delimited JSON file that can be parsed as Conduce data')
     dataset_post_transaction_parser.add_argument(
         '--raw', help='Optional: A well formatted Conduce entities JSON file. Ignores --kind, --generate-ids and --answer-yes')
     dataset_post_transaction_parser.add_argument(
         '--generate-ids', help='Set this flag if the data does not contain an ID field', action='store_true')
     dataset_post_transaction_parser.add_argument(
         '--kind', help='Use this value as the kind for all entities')
+    dataset_post_transaction_parser.add_argument(
+        '--timestamp-format', help='A strptime format for the timestamps of the data, inferred when not provided')
+    dataset_post_transaction_parser.add_argument(
+        '--schema-file', help='An ingest schema file.  Used instead of inferring the data format if it exists, otherwise created')
+    dataset_post_transaction_parser.add_argument(
+        '--sample-size', type=int, help='Number of rows sampled to map fields and infer attribute types (default: 100)')
     dataset_post_transaction_parser.add_argument(
         '--answer-yes', help='Set this flag to answer yes at all prompts', action='store_true')
     dataset_post_transaction_parser.add_argument(
         '--debug', help='Get better information about errors', action='store_true')
+    dataset_post_transaction_parser.add_argument(
+        '--chunk-size', type=int, help='Post entities in transactions of at most this many entities')
+    dataset_post_transaction_parser.add_argument(
+        '--chunk-bytes', type=int, help='Post entities in transactions of at most this many bytes')
+    dataset_post_transaction_parser.add_argument(
+        '--processes', type=int, help='Convert CSV or NDJSON files on this many processes (rows must not contain newlines)')
+    dataset_post_transaction_parser.add_argument(
+        '--serialize', action='store_true', help='Serialize CSV or NDJSON entities to JSON as they are converted to reduce memory use')
+    dataset_post_transaction_parser.add_argument(
+        '--workers', type=int, help='Number of chunked transactions to post concurrently')
+    dataset_post_transaction_parser.add_argument(
+        '--checkpoint', help='Record committed chunks in this file and skip them when an interrupted ingest is run again')
 
     parser_dataset_create = parser_dataset_subparsers.add_parser(
         'create', parents=[api_cmd_parser, dataset_post_transaction_parser], help='Create a new dataset with optional data')
@@ -959,14 +1045,22 @@ def main():
     parser_dataset_transactions = parser_dataset_subparsers.add_parser(
         'transactions', parents=[api_cmd_parser], help='Print a sequence of dataset transactions for debugging')
     parser_dataset_transactions.add_argument('dataset_id', help='Unique identifier of the dataset to query')
-    parser_dataset_transactions.add_argument('--min', default=-1, help='The oldest transaction in the returned sequence')
-    parser_dataset_transactions.add_argument('--max', help='The newest transaction in the returned sequence')
-    parser_dataset_transactions.add_argument('--value', help='The index of a single transaction to query')
-    parser_dataset_transactions.add_argument('--rows', help='The number of transactions to return')
+    parser_dataset_transactions.add_argument('--min', type=int, default=-1, help='The oldest transaction in the returned sequence')
+    parser_dataset_transactions.add_argument('--max', type=int, help='The newest transaction in the returned sequence')
+    parser_dataset_transactions.add_argument('--value', type=int, help='The index of a single transaction to query')
+    parser_dataset_transactions.add_argument('--rows', type=int, help='The number of transactions to return')
     parser_dataset_transactions.add_argument('--page_state', help='The page state to continue searching from')
     parser_dataset_transactions.add_argument('--count', action='store_true', help='Return only the number of transactions in the log')
+    parser_dataset_transactions.add_argument('--all', action='store_true', help='Read every page of the transaction log between --min and --max')
+    parser_dataset_transactions.add_argument('--output', help='Write every page of the transaction log to this newline delimited JSON file')
     parser_dataset_transactions.set_defaults(func=get_dataset_transactions)
 
+    parser_dataset_mirror = parser_dataset_subparsers.add_parser(
+        'mirror', parents=[api_cmd_parser], help='Copy new transactions of a dataset to the local transaction log mirror')
+    parser_dataset_mirror.add_argument('dataset_id', help='Unique identifier of the dataset to mirror')
+    parser_dataset_mirror.add_argument('--mirror-path', help='The mirror database (default: {})'.format(mirror.DEFAULT_MIRROR_PATH))
+    parser_dataset_mirror.set_defaults(func=mirror_transactions)
+
     parser_dataset_enable_auto_processing = parser_dataset_subparsers.add_parser(
         'auto-process', parents=[api_cmd_parser], help='Configure backend to enable/disable automatic transaction processing')
     parser_dataset_enable_auto_processing.add_argument('dataset_id', help='Unique identifier of the dataset to configure')
@@ -1000,6 +1094,10 @@ def main():
         '--transaction', '--value', type=int, help='The index of a single transaction to process')
     parser_dataset_process_transactions.add_argument(
         '--timeout', '-t', type=int, help='Time at which to abandon asynchronous job')
+    parser_dataset_process_transactions.add_argument(
+        '--window', type=int, help='Process outstanding transactions in ranges of this many transactions, all backends in parallel')
+    parser_dataset_process_transactions.add_argument(
+        '--pipeline-depth', type=int, help='Number of transaction ranges in flight per backend when --window is set (default: 2)')
     parser_dataset_process_transactions.set_defaults(func=process_transactions)
 
     parser_dataset_list_backends = parser_dataset_subparsers.add_parser(
@@ -1134,6 +1232,17 @@ def main():
     parser_dump_data.add_argument('--z-max', help='Optional', default=1)
     parser_dump_data.add_argument('--t-min', help='Optional', default=-281474976710655)
     parser_dump_data.add_argument('--t-max', help='Optional', default=281474976710655)
+    parser_dump_data.add_argument('--format', choices=['ndjson', 'csv'],
+                                  help='Stream the entities to the output as newline delimited JSON or CSV instead of printing the response')
+    parser_dump_data.add_argument('--output',
+                                  help='Stream the entities to this file instead of printing the response.  The format defaults to the file extension '
+                                       '(.ndjson, .jsonl or .csv)')
+    parser_dump_data.add_argument('--tiled', action='store_true', help='Fetch the data as a grid of tiles on a pool of concurrent requests')
+    parser_dump_data.add_argument('--tile-degrees', type=float, help='The approximate width and height of a tile (default: a quarter of the bounding box)')
+    parser_dump_data.add_argument('--tile-ms', type=int, help='The approximate time period of a tile (default: the whole time range)')
+    parser_dump_data.add_argument('--workers', type=int, help='The number of tiles fetched concurrently')
+    parser_dump_data.add_argument('--max-tile-entities', type=int, help='Split tiles that hold more entities than this')
+    parser_dump_data.add_argument('--checkpoint', help='Record the tiles written to --output in this file so an interrupted dump can be resumed')
     parser_dump_data.set_defaults(func=dump_data)
 
     parser_get_entity = subparsers.add_parser('get-entity', parents=[api_cmd_parser], help='Get the latest state of a Conduce entity')
@@ -1213,6 +1322,7 @@ def main():
     parser_clear_dataset.add_argument('--name', help='The name of the dataset to be cleared')
     parser_clear_dataset.add_argument('--regex', help='clear datasets that match the regular expression')
     parser_clear_dataset.add_argument('--all', help='clear all matching datasets', action='store_true')
+    parser_clear_dataset.add_argument('--workers', type=int, help='The number of datasets cleared concurrently with --all')
     parser_clear_dataset.set_defaults(func=clear_dataset)
 
     parser_remove_dataset = subparsers.add_parser('remove-dataset', parents=[api_cmd_parser], help='Remove a dataset from Conduce (soft delete)')
@@ -1221,6 +1331,7 @@ def main():
     parser_remove_dataset.add_argument('--regex', help='Remove datasets that match the regular expression')
     parser_remove_dataset.add_argument('--hard', action='store_true', help='Permanently destroy (hard delete) the dataset')
     parser_remove_dataset.add_argument('--all', help='Remove all matching datasets', action='store_true')
+    parser_remove_dataset.add_argument('--workers', type=int, help='The number of datasets removed concurrently with --all')
     parser_remove_dataset.set_defaults(func=remove_dataset)
 
     parser_remove = subparsers.add_parser('remove', parents=[api_cmd_parser], help='Remove a resource from Conduce')
@@ -1231,6 +1342,7 @@ def main():
     parser_remove.add_argument('--no-name', action='store_true', help='Match resources with no name')
     parser_remove.add_argument('--tags', nargs='+', help='Match resources with specified tag')
     parser_remove.add_argument('--all', help='Remove all matching resources', action='store_true')
+    parser_remove.add_argument('--workers', type=int, help='The number of resources removed concurrently with --all')
     parser_remove.set_defaults(func=remove_resource)
 
     parser_tag = subparsers.add_parser('tag', parents=[api_cmd_parser], help='Add tag to resources that match the given parameters')
@@ -1242,6 +1354,7 @@ def main():
     parser_tag.add_argument('--no-name', action='store_true', help='Match resources with no name')
     parser_tag.add_argument('--remove', action='store_true', help='Remove tags instead of adding')
     parser_tag.add_argument('--set', action='store_true', help='Set the list of tags to the specified')
+    parser_tag.add_argument('--workers', type=int, help='The number of resources tagged concurrently')
     parser_tag.set_defaults(func=tag_resource)
 
     parser_permissions = subparsers.add_parser('permissions', help='Conduce permissions operations')
@@ -1308,9 +1421,22 @@ def main():
     args = arg_parser.parse_args()
     args.cli = True
 
+    if getattr(args, 'func', None) is get_dataset_transactions and args.value is not None and (args.all or args.output):
+        parser_dataset_transactions.error('--value cannot be combined with --all or --output')
+
+    if getattr(args, 'func', None) is dump_data and args.output is not None and args.format is None:
+        try:
+            args.format = convert.file_format(args.output)
+        except ValueError:
+            parser_dump_data.error('cannot infer the format of {} from its extension, pass --format'.format(args.output))
+
     try:
         result = args.func(args)
-        if result:
+        if isinstance(result, dict) and 'failures' in result:
+            print_response(chunked_summary(result))
+            if result['failures']:
+                sys.exit(1)
+        elif result:
             if hasattr(result, 'headers'):
                 print(result.headers)
             if hasattr(result, 'content'):
@@ -1,10 +1,14 @@
 from __future__ import print_function
+import copy
 import yaml
 import os
 
 
 config_file_path = os.path.join(os.path.expanduser('~'), '.conduceconfig')
 
+# The parsed configuration is reused until the file is modified.
+_config_cache = {}
+
 
 def open_config():
     config = None
@@ -14,17 +18,28 @@ def open_config():
             new_config = {'default-host': 'dev-app.conduce.com'}
             yaml.dump(new_config, config_file, default_flow_style=False)
 
+    cache_key = (config_file_path, os.path.getmtime(config_file_path))
+    if _config_cache.get('key') == cache_key:
+        return copy.deepcopy(_config_cache['config'])
+
     with open(config_file_path, 'r') as config_file:
         config = yaml.load(config_file, Loader=yaml.FullLoader)
         if not config:
             config = {}
 
+    _config_cache.update({'key': cache_key, 'config': copy.deepcopy(config)})
+
     return config
 
 
+def clear_config_cache():
+    _config_cache.clear()
+
+
 def save_config(config):
     with open(config_file_path, 'w') as config_file:
         yaml.dump(config, config_file, default_flow_style=False)
+    clear_config_cache()
 
 
 def set_default_user(args):
@@ -0,0 +1,108 @@
+from __future__ import absolute_import
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+
+# Number of keep-alive connections held open per host.
+DEFAULT_POOL_SIZE = 10
+
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class Client(object):
+    """
+    A persistent HTTP client for a single Conduce host and credential.
+
+    Wraps a :py:class:`requests.Session` so that connections (and their TLS handshakes) are reused
+    between requests instead of being opened and torn down for every call.
+
+    Parameters
+    ----------
+    host : string
+        The Conduce server's hostname (ex. app.conduce.com)
+    credential : string
+        The API key or user email that authenticates requests made with this client.
+    pool_size : integer
+        The maximum number of keep-alive connections held open to the host.  Concurrent callers beyond
+        this number are not blocked, but their connections are discarded after use.
+    """
+
+    def __init__(self, host, credential=None, pool_size=DEFAULT_POOL_SIZE):
+        self.host = host
+        self.credential = credential
+        self.pool_size = pool_size
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def method(self, name):
+        """
+        Get the session bound request function for an HTTP method (get, post, put, patch or delete).
+        """
+        return getattr(self.session, name)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def get_client(host, credential=None, pool_size=None):
+    """
+    Get the shared client for a host and credential, creating it if it does not exist.
+
+    Parameters
+    ----------
+    host : string
+        The Conduce server's hostname (ex. app.conduce.com)
+    credential : string
+        The API key or user email that authenticates requests made with this client.
+    pool_size : integer
+        The maximum number of keep-alive connections.  Only used when the client is created,
+        defaults to :py:data:`DEFAULT_POOL_SIZE`.
+
+    Returns
+    -------
+    Client
+        The client registered for ``(host, credential)``.
+    """
+    key = (host, credential)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = Client(host, credential, pool_size or DEFAULT_POOL_SIZE)
+            _clients[key] = client
+
+    return client
+
+
+def pooled_request_func(request_func, client):
+    """
+    Substitute the client's session method for a module level ``requests`` function.
+
+    ``requests.get``, ``requests.post``, etc. open a new connection for every call.  When ``request_func`` is
+    one of those functions the equivalent method of the pooled session is returned.  Any other callable is
+    returned unchanged.
+    """
+    for name in HTTP_METHODS:
+        if request_func is getattr(requests, name):
+            return client.method(name)
+
+    return request_func
+
+
+def close_clients():
+    """
+    Close all shared clients and release their connections.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,234 @@
+from __future__ import print_function
+from __future__ import absolute_import
+import collections
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+
+from . import util
+
+# Approximate number of bytes of a file converted by one task.
+DEFAULT_SHARD_BYTES = 8 * 2**20
+
+# Number of converted shards that may be queued or held in memory per worker process.
+SHARDS_PER_PROCESS = 2
+
+_CSV_FORMAT_PARAMETERS = ('delimiter', 'quotechar', 'doublequote', 'escapechar', 'skipinitialspace', 'quoting')
+
+
+def shard_file(path, shard_bytes=DEFAULT_SHARD_BYTES, start=0):
+    """
+    Split a line oriented file into byte ranges of roughly equal size.
+
+    Every range starts at the beginning of a line and ends after a newline (or at the end of the file), so each
+    range can be parsed independently.  Records must not contain embedded newlines.
+
+    Parameters
+    ----------
+    path : string
+        Path to the file.
+    shard_bytes : integer
+        The approximate size of each range.
+    start : integer
+        Offset of the first byte of the first range, for example the end of a header line.
+
+    Returns
+    -------
+    list
+        A list of ``(start, end)`` byte offsets.
+    """
+    size = os.path.getsize(path)
+    shards = []
+    with open(path, 'rb') as infile:
+        while start < size:
+            end = start + shard_bytes
+            if end >= size:
+                end = size
+            else:
+                infile.seek(end)
+                infile.readline()
+                end = infile.tell()
+            shards.append((start, end))
+            start = end
+
+    return shards
+
+
+def _read_shard(path, start, end):
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        return infile.read(end - start)
+
+
+def _text_stream(data, encoding):
+    if sys.version_info[0] < 3:
+        return io.BytesIO(data)
+    return io.StringIO(data.decode(encoding))
+
+
+def _csv_format(header_line, delimiter):
+    # The same dialect detection as util.get_csv_reader, reduced to picklable format parameters.
+    if len(delimiter) > 1:
+        try:
+            dialect = csv.Sniffer().sniff(header_line, delimiters=delimiter)
+        except Exception as e:
+            print('{} (using default)'.format(str(e)))
+            dialect = csv.excel
+    else:
+        return {'delimiter': delimiter}
+
+    return {parameter: getattr(dialect, parameter) for parameter in _CSV_FORMAT_PARAMETERS}
+
+
+def _convert_csv_shard(task):
+    path, start, end, encoding, fieldnames, csv_format, schema, serialize, converter_kwargs = task
+    convert = util.row_converter(schema, **converter_kwargs)
+    reader = csv.DictReader(_text_stream(_read_shard(path, start, end), encoding), fieldnames=fieldnames, **csv_format)
+    return _converted(convert, reader, serialize)
+
+
+def _convert_ndjson_shard(task):
+    path, start, end, encoding, schema, serialize, converter_kwargs = task
+    convert = util.row_converter(schema, **converter_kwargs)
+    lines = _read_shard(path, start, end).decode(encoding).splitlines()
+    return _converted(convert, (json.loads(line) for line in lines if line.strip()), serialize)
+
+
+def _converted(convert, raw_entities, serialize):
+    if serialize:
+        return [util.dumps_bytes(convert(raw_entity)) for raw_entity in raw_entities]
+    return [convert(raw_entity) for raw_entity in raw_entities]
+
+
+def _task_options(**kwargs):
+    shard_bytes = kwargs.get('shard_bytes') or DEFAULT_SHARD_BYTES
+    encoding = kwargs.get('encoding') or 'utf-8'
+    converter_kwargs = {'infinite': kwargs.get('infinite', False)}
+    return shard_bytes, encoding, bool(kwargs.get('serialize')), converter_kwargs
+
+
+def _csv_tasks(path, schema, **kwargs):
+    shard_bytes, encoding, serialize, converter_kwargs = _task_options(**kwargs)
+    with open(path, 'rb') as infile:
+        header_line = infile.readline()
+        data_start = infile.tell()
+
+    header = header_line.decode(encoding)
+    csv_format = _csv_format(header, kwargs.get('delimiter', ';,'))
+    fieldnames = next(csv.reader([header], **csv_format))
+
+    for start, end in shard_file(path, shard_bytes, data_start):
+        yield path, start, end, encoding, fieldnames, csv_format, schema, serialize, converter_kwargs
+
+
+def _ndjson_tasks(path, schema, **kwargs):
+    shard_bytes, encoding, serialize, converter_kwargs = _task_options(**kwargs)
+    for start, end in shard_file(path, shard_bytes):
+        yield path, start, end, encoding, schema, serialize, converter_kwargs
+
+
+def iter_ndjson_rows(infile, **kwargs):
+    """
+    Read a newline delimited JSON file one object at a time.
+    """
+    with open(infile) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def file_format(path, **kwargs):
+    """
+    Get the format (``csv`` or ``ndjson``) of a file from the ``file_format`` kwarg or the file extension.
+    """
+    if kwargs.get('file_format'):
+        return kwargs['file_format']
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+
+    raise ValueError('Unrecognized file format: {}'.format(path))
+
+
+def convert_file(path, **kwargs):
+    """
+    Convert a CSV or newline delimited JSON file to Conduce entities on a pool of processes.
+
+    The ingest schema is loaded or inferred (and confirmed) from a sample of the leading rows of the file in this
+    process, see :py:func:`conduce.util.sample_stream` and :py:func:`conduce.util.get_schema`.  The file is then
+    split into byte ranges (see :py:func:`shard_file`) that worker processes read and convert independently.
+    Entities are yielded in file order.
+
+    Records must not contain embedded newlines.
+
+    Parameters
+    ----------
+    path : string
+        Path to the file.
+    **kwargs:
+        **processes**
+            The number of worker processes (default: the number of CPUs).
+        **shard_bytes**
+            The approximate number of bytes converted by each task (default: :py:data:`DEFAULT_SHARD_BYTES`).
+        **serialize**
+            Yield each entity serialized as JSON bytes (see :py:func:`conduce.util.dumps_bytes`) instead of as a
+            dictionary (default: False).  Serialized entities are cheaper to pass between processes and can be
+            posted as is by :py:func:`conduce.api.post_transaction`.
+        **file_format**
+            ``csv`` or ``ndjson``.  By default the format is determined by the file extension.
+        **encoding**
+            The file encoding (default: utf-8).
+
+        See :py:func:`conduce.util.get_schema` and :py:func:`conduce.util.row_converter` for more kwargs.
+
+    Returns
+    -------
+    generator
+        The converted entities.
+    """
+    fmt = file_format(path, **kwargs)
+    if fmt == 'csv':
+        _, sample = util.sample_stream(util.iter_csv_rows(path, **kwargs), **kwargs)
+        make_tasks, convert_shard = _csv_tasks, _convert_csv_shard
+    elif fmt == 'ndjson':
+        _, sample = util.sample_stream(iter_ndjson_rows(path), **kwargs)
+        make_tasks, convert_shard = _ndjson_tasks, _convert_ndjson_shard
+    else:
+        raise ValueError('Unrecognized file format: {}'.format(fmt))
+
+    if not sample:
+        return iter([])
+
+    schema = util.get_schema(sample, **kwargs)
+    return _convert_tasks(convert_shard, make_tasks(path, schema, **kwargs), kwargs.get('processes'))
+
+
+def _convert_tasks(convert_shard, tasks, processes):
+    # Pool.imap reads every task and queues every result as fast as the workers run.  Only submit a shard when a
+    # slot in the window frees up, so that a slow consumer bounds the memory held by converted shards.
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        pending = collections.deque()
+        tasks = iter(tasks)
+        while True:
+            for task in tasks:
+                pending.append(pool.apply_async(convert_shard, (task,)))
+                if len(pending) >= processes * SHARDS_PER_PROCESS:
+                    break
+            if not pending:
+                break
+            for entity in pending.popleft().get():
+                yield entity
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
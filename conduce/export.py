@@ -0,0 +1,659 @@
+from __future__ import print_function
+from __future__ import absolute_import
+import codecs
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import sys
+
+from requests.exceptions import HTTPError
+from requests.exceptions import Timeout
+
+from . import api
+from . import util
+
+# Number of bytes read from the response at a time.
+READ_CHUNK_BYTES = 64 * 2**10
+
+# Bounds of a raw lens query that covers the whole world and all time.
+DEFAULT_BOUNDS = {
+    'x_min': -180,
+    'x_max': 180,
+    'y_min': -90,
+    'y_max': 90,
+    'z_min': -1,
+    'z_max': 1,
+    't_min': -281474976710655,
+    't_max': 281474976710655,
+}
+
+_BOUNDS_KEYS = ('x_min', 'x_max', 'y_min', 'y_max', 'z_min', 'z_max', 't_min', 't_max')
+
+# Entity fields written to the leading CSV columns.
+CSV_FIELDS = ['identity', 'kind', 'timestamp_ms', 'endtime_ms', 'x', 'y', 'z']
+
+_WHITESPACE = ' \t\n\r'
+
+# Number of tiles of a tiled export fetched concurrently.
+DEFAULT_TILE_WORKERS = 8
+
+# A tile that holds more entities than this is subdivided and fetched again.
+TILE_MAX_ENTITIES = 50000
+
+# Maximum number of tiles along one axis of a tile grid.
+MAX_TILES = 10000
+
+# Tiles are not subdivided spatially below this width (degrees) or temporally below this period (ms).
+MIN_TILE_DEGREES = 360.0 / 2**24
+MIN_TILE_MS = 1000
+
+# Length (ms) of a temporal zoom level 0 tile, see util.time_period_to_zoom_level.
+_TEMPORAL_ZOOM_LEVEL_0_MS = 365 * 24 * 3600 * 1000
+
+
+class _TextBuffer(object):
+    """
+    The unread text of a JSON document that arrives in chunks.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = u''
+        self.pos = 0
+        self.exhausted = False
+
+    def read_more(self):
+        for chunk in self.chunks:
+            if chunk:
+                # Drop the consumed text so the buffer never holds more than the current value.
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read_more():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expected {!r} at offset {} of the JSON document'.format(char, self.pos))
+        self.pos += 1
+
+    def decode(self, decoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                # A number at the end of the buffer may continue in the next chunk.
+                if end < len(self.text) or self.exhausted:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.exhausted:
+                    raise
+            self.read_more()
+
+
+def _decoded_chunks(chunks, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        yield chunk
+    yield decoder.decode(b'', final=True)
+
+
+def iter_json_array(chunks, key='entities', encoding='utf-8'):
+    """
+    Parse the items of a JSON array incrementally.
+
+    Only one item is held in memory at a time, so arrays far larger than the available memory can be processed.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Consecutive pieces (bytes or text) of a JSON document.  The document is either an array, or an object with
+        an array valued ``key`` member.
+    key : string
+        The member of a top level object that holds the array.
+    encoding : string
+        The encoding of byte chunks (default: utf-8).
+
+    Returns
+    -------
+    generator
+        The items of the array.
+    """
+    decoder = json.JSONDecoder()
+    buf = _TextBuffer(_decoded_chunks(chunks, encoding))
+
+    first = buf.peek()
+    if first == '{':
+        buf.expect('{')
+        while True:
+            if buf.peek() == '}':
+                return
+            member = buf.decode(decoder)
+            buf.expect(':')
+            if member == key:
+                break
+            buf.decode(decoder)
+            if buf.peek() == ',':
+                buf.expect(',')
+    elif first is None:
+        return
+
+    buf.expect('[')
+    if buf.peek() == ']':
+        return
+    while True:
+        yield buf.decode(decoder)
+        if buf.peek() == ']':
+            return
+        buf.expect(',')
+
+
+def _bounds(**kwargs):
+    bounds = dict(DEFAULT_BOUNDS)
+    bounds.update({key: kwargs[key] for key in _BOUNDS_KEYS if kwargs.get(key) is not None})
+    return bounds
+
+
+def raw_lens_uri(dataset_id, **kwargs):
+    """
+    Get the URI fragment of a raw lens query.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs:
+        **x_min**, **x_max**, **y_min**, **y_max**, **z_min**, **z_max**, **t_min**, **t_max**
+            The bounds of the query.  Missing bounds default to :py:data:`DEFAULT_BOUNDS`.
+
+    Returns
+    -------
+    string
+        The URI fragment.
+    """
+    bounds = _bounds(**kwargs)
+    return 'datasets/raw-lens/{}/{}'.format(dataset_id, '/'.join(str(bounds[key]) for key in _BOUNDS_KEYS))
+
+
+def iter_raw_entities(dataset_id, **kwargs):
+    """
+    Stream the entities of a dataset that fall within a bounding box and time range.
+
+    The response body is read and parsed incrementally, so memory use does not grow with the number of entities.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs:
+        **x_min**, **x_max**, **y_min**, **y_max**, **z_min**, **z_max**, **t_min**, **t_max**
+            The bounds of the query.  Missing bounds default to :py:data:`DEFAULT_BOUNDS`.
+
+        See :py:func:`conduce.api.make_get_request` for more kwargs.
+
+    Returns
+    -------
+    generator
+        The entities.
+    """
+    response = api.make_get_request(raw_lens_uri(dataset_id, **kwargs), stream=True, **_request_kwargs(**kwargs))
+    try:
+        for entity in iter_json_array(response.iter_content(READ_CHUNK_BYTES), encoding=response.encoding or 'utf-8'):
+            yield entity
+    finally:
+        response.close()
+
+
+def _request_kwargs(**kwargs):
+    return {key: value for key, value in kwargs.items() if key not in _BOUNDS_KEYS and key != 'stream'}
+
+
+def _grid(low, high, origin, size):
+    # The cells of a grid aligned to origin that cover [low, high].
+    if (high - low) / size > MAX_TILES:
+        raise ValueError('The tiles are too small for the query bounds')
+    edges = [low]
+    k = int(math.floor((low - origin) / size)) + 1
+    while origin + k * size < high:
+        edges.append(origin + k * size)
+        k += 1
+    edges.append(high)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _numeric_bounds(bounds):
+    numeric = {key: float(value) for key, value in bounds.items()}
+    numeric['t_min'] = int(numeric['t_min'])
+    numeric['t_max'] = int(numeric['t_max'])
+    return numeric
+
+
+def tile_bounds(bounds, tile_degrees=None, tile_ms=None):
+    """
+    Split a query into a grid of tiles.
+
+    Tile sizes are rounded up to the size of a spatial or temporal zoom level (see :py:func:`conduce.util.distance_to_zoom_level`
+    and :py:func:`conduce.util.time_period_to_zoom_level`) and tiles are aligned to the zoom level grid.
+
+    Parameters
+    ----------
+    bounds : dict
+        The query bounds, see :py:data:`DEFAULT_BOUNDS`.
+    tile_degrees : float
+        The approximate width and height of a tile.  By default the larger side of the bounds is split in four.
+    tile_ms : integer
+        The approximate time period of a tile.  By default the time range is not split.
+
+    Returns
+    -------
+    list
+        The bounds of each tile.
+    """
+    bounds = _numeric_bounds(bounds)
+    if tile_degrees is None:
+        tile_degrees = max(bounds['x_max'] - bounds['x_min'], bounds['y_max'] - bounds['y_min']) / 4.0
+    size = 360.0 / 2**max(util.distance_to_zoom_level(float(tile_degrees)), 0)
+    x_ranges = _grid(bounds['x_min'], bounds['x_max'], -180.0, size)
+    y_ranges = _grid(bounds['y_min'], bounds['y_max'], -90.0, size)
+
+    t_ranges = [(bounds['t_min'], bounds['t_max'])]
+    if tile_ms is not None:
+        period = max(int(_TEMPORAL_ZOOM_LEVEL_0_MS / 2**util.time_period_to_zoom_level(float(tile_ms))), 1)
+        t_ranges = _grid(bounds['t_min'], bounds['t_max'], 0, period)
+
+    return [dict(bounds, x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max, t_min=t_min, t_max=t_max)
+            for t_min, t_max in t_ranges for x_min, x_max in x_ranges for y_min, y_max in y_ranges]
+
+
+def split_tile(tile):
+    """
+    Split a tile into four spatial quadrants or, once it is :py:data:`MIN_TILE_DEGREES` wide, two halves of its
+    time range.
+
+    Returns
+    -------
+    list
+        The bounds of each part, or an empty list if the tile cannot be split.
+    """
+    if tile['x_max'] - tile['x_min'] > MIN_TILE_DEGREES or tile['y_max'] - tile['y_min'] > MIN_TILE_DEGREES:
+        x_mid = (tile['x_min'] + tile['x_max']) / 2.0
+        y_mid = (tile['y_min'] + tile['y_max']) / 2.0
+        return [dict(tile, x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+                for x_min, x_max in ((tile['x_min'], x_mid), (x_mid, tile['x_max']))
+                for y_min, y_max in ((tile['y_min'], y_mid), (y_mid, tile['y_max']))]
+    if tile['t_max'] - tile['t_min'] > MIN_TILE_MS:
+        t_mid = (tile['t_min'] + tile['t_max']) // 2
+        return [dict(tile, t_max=t_mid), dict(tile, t_min=t_mid)]
+    return []
+
+
+def tile_key(tile):
+    """
+    Get a string that identifies a tile.
+    """
+    return '/'.join(str(tile[key]) for key in _BOUNDS_KEYS)
+
+
+def _fetch_tile(dataset_id, tile, max_entities, **kwargs):
+    splittable = bool(split_tile(tile))
+    entities = []
+    try:
+        for entity in iter_raw_entities(dataset_id, **dict(kwargs, **tile)):
+            entities.append(entity)
+            if splittable and len(entities) > max_entities:
+                return None
+    except Timeout:
+        if splittable:
+            return None
+        raise
+    except HTTPError as e:
+        if splittable and e.response is not None and e.response.status_code == 504:
+            return None
+        raise
+    return entities
+
+
+def _in_range(value, low, high, closed):
+    return low <= value < high or (closed and value == high)
+
+
+def _anchor(entity, bounds):
+    # The point and time in the query bounds that decide which tile returns an entity.
+    try:
+        timestamp = min(max(entity['timestamp_ms'], bounds['t_min']), bounds['t_max'])
+        for point in entity['path']:
+            if bounds['x_min'] <= point['x'] <= bounds['x_max'] and bounds['y_min'] <= point['y'] <= bounds['y_max']:
+                return point['x'], point['y'], timestamp
+    except (KeyError, TypeError):
+        pass
+    return None
+
+
+def _owns(tile, bounds, anchor):
+    x, y, t = anchor
+    return (_in_range(x, tile['x_min'], tile['x_max'], tile['x_max'] == bounds['x_max']) and
+            _in_range(y, tile['y_min'], tile['y_max'], tile['y_max'] == bounds['y_max']) and
+            _in_range(t, tile['t_min'], tile['t_max'], tile['t_max'] == bounds['t_max']))
+
+
+class _TileLog(object):
+    """
+    The tiles of an export that were written or split, appended to a newline delimited JSON file.
+
+    Written tiles are recorded with the size of the output file after they were written, so that output written
+    after the last recorded tile can be discarded when the export is resumed, and with the keys of the entities
+    without a point in the query bounds that they returned, so that a resumed export does not write those entities
+    again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.status = {}
+        self.offset = 0
+        self.unanchored = set()
+        self._claimed = {}
+        if path is not None:
+            try:
+                with open(path) as infile:
+                    for line in infile:
+                        if line.strip():
+                            record = json.loads(line)
+                            self.status[record['tile']] = record['status']
+                            self.offset = record.get('offset', self.offset)
+                            self.unanchored.update(tuple(key) for key in record.get('unanchored', []))
+            except IOError:
+                pass
+
+    def claim(self, tile, key):
+        """
+        Claim an entity without a point in the query bounds for a tile, unless another tile already returned it.
+        """
+        if key in self.unanchored:
+            return False
+        self.unanchored.add(key)
+        self._claimed.setdefault(tile_key(tile), []).append(key)
+        return True
+
+    def mark(self, tile, status, offset=None):
+        self.status[tile_key(tile)] = status
+        record = {'tile': tile_key(tile), 'status': status}
+        if offset is not None:
+            self.offset = record['offset'] = offset
+        claimed = self._claimed.pop(tile_key(tile), None)
+        if claimed:
+            record['unanchored'] = claimed
+        if self.path is not None:
+            with open(self.path, 'a') as outfile:
+                outfile.write(json.dumps(record) + '\n')
+
+
+def iter_tiles(dataset_id, **kwargs):
+    """
+    Fetch the entities of a dataset as a grid of tiles.
+
+    The query bounds are split with :py:func:`tile_bounds` and the tiles are fetched concurrently.  A tile that
+    holds more than ``max_tile_entities`` entities, or whose request times out, is split with :py:func:`split_tile`
+    and its parts are fetched instead.  At most about ``2 * workers * max_tile_entities`` entities are held in
+    memory.
+
+    An entity that intersects several tiles is returned by only one of them: the tile that contains the first point
+    of its path that lies in the query bounds and the start of its time span (clamped to the query time range).
+    Entities with no point in the bounds are de-duplicated by identity and time span (see :py:class:`_TileLog`).
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs:
+        **x_min**, **x_max**, **y_min**, **y_max**, **z_min**, **z_max**, **t_min**, **t_max**
+            The bounds of the query.  Missing bounds default to :py:data:`DEFAULT_BOUNDS`.
+        **tile_degrees**, **tile_ms**
+            The initial tile size, see :py:func:`tile_bounds`.
+        **workers**
+            The number of tiles fetched concurrently (default: :py:data:`DEFAULT_TILE_WORKERS`).
+        **max_tile_entities**
+            Split tiles that hold more entities than this (default: :py:data:`TILE_MAX_ENTITIES`).
+        **tile_log**
+            Skip the tiles recorded as written in this :py:class:`_TileLog`, used to resume an export.
+
+        See :py:func:`conduce.api.make_get_request` for more kwargs.
+
+    Returns
+    -------
+    generator
+        ``(tile, entities)`` for each tile as it is fetched.
+    """
+    bounds = _numeric_bounds(_bounds(**kwargs))
+    workers = kwargs.pop('workers', None) or DEFAULT_TILE_WORKERS
+    max_entities = kwargs.pop('max_tile_entities', None) or TILE_MAX_ENTITIES
+    tile_log = kwargs.pop('tile_log', None) or _TileLog()
+    tiles = tile_bounds(bounds, kwargs.pop('tile_degrees', None), kwargs.pop('tile_ms', None))
+    request_kwargs = _request_kwargs(**kwargs)
+
+    def fetch(tile):
+        return tile, _fetch_tile(dataset_id, tile, max_entities, **request_kwargs)
+
+    while tiles:
+        pending = []
+        for tile in tiles:
+            status = tile_log.status.get(tile_key(tile))
+            if status == 'split':
+                tiles.extend(split_tile(tile))
+            elif status != 'done':
+                pending.append(tile)
+
+        tiles = []
+        for tile, entities in api.imap_bounded(fetch, pending, workers, ordered=False):
+            if entities is None:
+                tile_log.mark(tile, 'split')
+                tiles.extend(split_tile(tile))
+                continue
+
+            owned = []
+            for entity in entities:
+                anchor = _anchor(entity, bounds)
+                if anchor is None:
+                    if not tile_log.claim(tile, (entity.get('identity'), entity.get('timestamp_ms'), entity.get('endtime_ms'))):
+                        continue
+                elif not _owns(tile, bounds, anchor):
+                    continue
+                owned.append(entity)
+            yield tile, owned
+
+
+def export_tiles(dataset_id, output=None, output_format='ndjson', **kwargs):
+    """
+    Export the entities of a dataset as a grid of concurrently fetched tiles, see :py:func:`iter_tiles`.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    output : string
+        Path of the output file.  Entities are written to stdout by default.
+    output_format : string
+        ``ndjson`` or ``csv``.
+    **kwargs:
+        **checkpoint**
+            Path of a file that records the tiles written to ``output``.  If the export is interrupted, running it
+            again with the same arguments discards any partly written tile and appends the remaining tiles to
+            ``output``.  Requires ``ndjson`` output to a file.
+
+        See :py:func:`iter_tiles` for more kwargs.
+
+    Returns
+    -------
+    integer
+        The number of entities written.
+    """
+    checkpoint = kwargs.pop('checkpoint', None)
+    if checkpoint is None:
+        entities = (entity for _, tile_entities in iter_tiles(dataset_id, **kwargs) for entity in tile_entities)
+        return export_entities(entities, output, output_format)
+
+    if output is None or output_format != 'ndjson':
+        raise ValueError('A checkpointed export requires ndjson output to a file')
+
+    tile_log = _TileLog(checkpoint)
+    mode = 'w'
+    if tile_log.status:
+        # Drop the entities of a tile that was being written when the export was interrupted.
+        _truncate(output, tile_log.offset)
+        mode = 'a'
+    count = 0
+    with io.open(output, mode, encoding='utf-8') if sys.version_info[0] >= 3 else open(output, mode + 'b') as outfile:
+        for tile, entities in iter_tiles(dataset_id, tile_log=tile_log, **kwargs):
+            count += write_ndjson(entities, outfile)
+            outfile.flush()
+            tile_log.mark(tile, 'done', os.fstat(outfile.fileno()).st_size)
+    return count
+
+
+def _truncate(path, size):
+    try:
+        with open(path, 'r+b') as outfile:
+            outfile.truncate(size)
+    except IOError:
+        pass
+
+
+def write_ndjson(entities, outfile):
+    """
+    Write entities as newline delimited JSON.
+
+    Parameters
+    ----------
+    entities : iterable
+        The entities to write.
+    outfile : file
+        A text file open for writing.
+
+    Returns
+    -------
+    integer
+        The number of entities written.
+    """
+    count = 0
+    for entity in entities:
+        outfile.write(json.dumps(entity))
+        outfile.write('\n')
+        count += 1
+    return count
+
+
+def _attribute_value(attribute):
+    for key, value in attribute.items():
+        if key.endswith('_value'):
+            return value
+    return None
+
+
+def entity_to_row(entity):
+    """
+    Flatten an entity to a dictionary of CSV fields.
+
+    The location is taken from the first point of the entity's path and each attribute becomes a field.
+    """
+    row = {field: entity.get(field) for field in CSV_FIELDS[:4]}
+    path = entity.get('path') or [{}]
+    row.update({axis: path[0].get(axis) for axis in ('x', 'y', 'z')})
+    for attribute in entity.get('attrs') or []:
+        row[attribute['key']] = _attribute_value(attribute)
+    return row
+
+
+def write_csv(entities, outfile, sample_size=util.ATTRIBUTE_SAMPLE_SIZE):
+    """
+    Write entities as CSV.
+
+    The columns are :py:data:`CSV_FIELDS` followed by the attribute keys found in the first ``sample_size``
+    entities.  Attributes that first appear later are not written.  The location of each entity is the first point
+    of its path, see :py:func:`entity_to_row`.  Use :py:func:`write_ndjson` for a lossless export.
+
+    Parameters
+    ----------
+    entities : iterable
+        The entities to write.
+    outfile : file
+        A text file open for writing.
+    sample_size : integer
+        The number of leading entities used to determine the columns.
+
+    Returns
+    -------
+    integer
+        The number of entities written.
+    """
+    entities = iter(entities)
+    head = [entity_to_row(entity) for entity in itertools.islice(entities, sample_size)]
+
+    fieldnames = list(CSV_FIELDS)
+    for row in head:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+
+    writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(head)
+
+    count = len(head)
+    dropped = set()
+    for entity in entities:
+        row = entity_to_row(entity)
+        if len(row) > len(fieldnames):
+            new_keys = set(row) - set(fieldnames) - dropped
+            if new_keys:
+                print('Attributes not in the first {} entities are not exported: {}'.format(sample_size, sorted(new_keys)), file=sys.stderr)
+                dropped.update(new_keys)
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _open_output(output):
+    if sys.version_info[0] < 3:
+        return open(output, 'wb')
+    return io.open(output, 'w', newline='', encoding='utf-8')
+
+
+def export_entities(entities, output=None, output_format='ndjson'):
+    """
+    Write entities to a file or stdout as they arrive.
+
+    Parameters
+    ----------
+    entities : iterable
+        The entities to write, for example from :py:func:`iter_raw_entities`.
+    output : string
+        Path of the output file.  Entities are written to stdout by default.
+    output_format : string
+        ``ndjson`` or ``csv``.
+
+    Returns
+    -------
+    integer
+        The number of entities written.
+    """
+    writers = {'ndjson': write_ndjson, 'csv': write_csv}
+    if output_format not in writers:
+        raise ValueError('Unrecognized export format: {}'.format(output_format))
+
+    if output is None:
+        return writers[output_format](entities, sys.stdout)
+
+    with _open_output(output) as outfile:
+        return writers[output_format](entities, outfile)
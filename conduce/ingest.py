@@ -1,8 +1,85 @@
+from __future__ import print_function
 import json
+import os
 
 from . import api
+from . import convert
 from . import util
 
+# Number of entities per transaction of a checkpointed ingest when neither chunk_size nor chunk_bytes is given.
+CHECKPOINT_CHUNK_SIZE = 10000
+
+# Header fields that must match for a checkpoint to be resumed.
+_CHECKPOINT_FIELDS = ('dataset_id', 'source', 'source_size', 'operation', 'chunk_size', 'chunk_bytes')
+
+
+class IngestCheckpoint(object):
+    """
+    A record of the chunks of an ingest that were committed to a dataset.
+
+    The checkpoint is a newline delimited JSON file.  The first line describes the ingest and each following line
+    records a committed chunk.  Chunks are identified by their index, so an ingest can only be resumed with the same
+    input file and chunking parameters.
+
+    A chunk is recorded after its transaction is posted.  A chunk whose transaction was committed just before the
+    ingest was interrupted, and not recorded, is posted again when the ingest is resumed (at-least-once delivery, as
+    with :py:class:`conduce.spool.Spool`).  The dataset's transaction count is not used to guess which chunks were
+    committed, since other writers may add transactions to the dataset at any time.
+
+    Parameters
+    ----------
+    path : string
+        Path of the checkpoint file.  It is created if it does not exist.
+    dataset_id : string
+        The UUID that identifies the dataset.
+    source : string
+        Path of the ingested file.
+    **kwargs:
+        ``chunk_size``, ``chunk_bytes`` and ``operation`` of the ingest.
+    """
+
+    def __init__(self, path, dataset_id, source, **kwargs):
+        self.path = path
+        self.chunks = {}
+        header = {
+            'dataset_id': dataset_id,
+            'source': os.path.abspath(source) if source else None,
+            'source_size': os.path.getsize(source) if source else None,
+            'operation': kwargs.get('operation'),
+            'chunk_size': kwargs.get('chunk_size'),
+            'chunk_bytes': kwargs.get('chunk_bytes'),
+        }
+
+        if os.path.exists(path):
+            with open(path) as infile:
+                records = [json.loads(line) for line in infile if line.strip()]
+            self.header = records[0]
+            if any(self.header.get(field) != header[field] for field in _CHECKPOINT_FIELDS):
+                raise ValueError('The checkpoint {} was written for a different ingest'.format(path))
+            for record in records[1:]:
+                self.chunks[record['chunk']] = record
+        else:
+            self.header = header
+            self._append(header)
+
+    def _append(self, record):
+        with open(self.path, 'a') as outfile:
+            outfile.write(json.dumps(record) + '\n')
+
+    def record(self, idx, first, count, response=None):
+        """
+        Record that a chunk was committed.
+        """
+        record = {'chunk': idx, 'first': first, 'entities': count}
+        self.chunks[idx] = record
+        self._append(record)
+
+    def completed_chunks(self):
+        """
+        Get the indices of the committed chunks.
+        """
+        return set(self.chunks)
+
 
 def get_dataset_id(dataset_name, **kwargs):
     datasets = api.list_datasets(**kwargs)
@@ -14,17 +91,73 @@ def get_dataset_id(dataset_name, **kwargs):
 
 
 def ingest_json(dataset_id, json_file, **kwargs):
-    api._ingest_entity_set(dataset_id, util.dict_to_entities(json.load(open(json_file))), **kwargs)
+    with open(json_file) as raw_file:
+        raw_entities = json.load(raw_file)
+
+    _ingest_entities(dataset_id, util.dict_to_entities(raw_entities, **kwargs)['entities'], json_file, **kwargs)
 
 
 def ingest_csv(dataset_id, csv_file, **kwargs):
-    api._ingest_entity_set(dataset_id, util.csv_to_entities(kwargs['csv'], **kwargs), **kwargs)
+    if kwargs.get('processes'):
+        entities = convert.convert_file(csv_file, file_format='csv', **kwargs)
+    else:
+        entities = util.stream_csv_entities(csv_file, **kwargs)
+    _ingest_entities(dataset_id, entities, csv_file, **kwargs)
+
+
+def ingest_ndjson(dataset_id, ndjson_file, **kwargs):
+    if kwargs.get('processes'):
+        entities = convert.convert_file(ndjson_file, file_format='ndjson', **kwargs)
+    else:
+        entities = util.stream_entities(convert.iter_ndjson_rows(ndjson_file), **kwargs)
+    _ingest_entities(dataset_id, entities, ndjson_file, **kwargs)
+
+
+def _ingest_entities(dataset_id, entities, source=None, **kwargs):
+    if kwargs.get('serialize') and not kwargs.get('processes'):
+        entities = util.serialize_entities(entities)
+
+    checkpoint_path = kwargs.pop('checkpoint', None)
+    if checkpoint_path:
+        if not (kwargs.get('chunk_size') or kwargs.get('chunk_bytes')):
+            kwargs['chunk_size'] = CHECKPOINT_CHUNK_SIZE
+        kwargs.setdefault('operation', 'ADD')
+        checkpoint = IngestCheckpoint(checkpoint_path, dataset_id, source, **kwargs)
+        if checkpoint.chunks:
+            print('Resuming ingest: {} chunks were already committed'.format(len(checkpoint.chunks)))
+        kwargs['completed_chunks'] = checkpoint.completed_chunks()
+        kwargs['chunk_callback'] = checkpoint.record
+
+    if not (kwargs.get('chunk_size') or kwargs.get('chunk_bytes')):
+        entities = list(entities)
+
+    return api._ingest_entity_set(dataset_id, {'entities': entities}, **kwargs)
 
 
 def ingest_file(dataset_id, **kwargs):
+    """
+    Ingest a JSON, CSV or newline delimited JSON file.
+
+    Parameters
+    ----------
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs:
+        **json**, **csv**, **ndjson**
+            Path of the file to ingest.
+        **checkpoint**
+            Path of an :py:class:`IngestCheckpoint` file.  The entities are posted in chunks (of
+            :py:data:`CHECKPOINT_CHUNK_SIZE` entities unless ``chunk_size`` or ``chunk_bytes`` is given) and each
+            committed chunk is recorded.  If the ingest fails, running it again with the same file, checkpoint and
+            chunking parameters skips the chunks that were committed.
+
+        See :py:func:`conduce.api.post_transaction` and :py:func:`conduce.util.get_schema` for more kwargs.
+    """
     if 'json' in kwargs and kwargs['json']:
         return ingest_json(dataset_id, kwargs['json'], **kwargs)
     elif 'csv' in kwargs and kwargs['csv']:
         return ingest_csv(dataset_id, kwargs['csv'], **kwargs)
+    elif 'ndjson' in kwargs and kwargs['ndjson']:
+        return ingest_ndjson(dataset_id, kwargs['ndjson'], **kwargs)
     else:
         raise NotImplementedError('Unrecognized file format')
@@ -0,0 +1,174 @@
+"""
+Local mirror of dataset transaction logs.
+
+A :py:class:`TransactionMirror` keeps a copy of the transaction logs of datasets in a SQLite database.  Each sync
+only requests the transactions appended since the last one, so audits, replays and comparisons can run against
+local disk::
+
+    from conduce import mirror
+
+    with mirror.TransactionMirror() as transactions:
+        transactions.sync(dataset_id)
+        for transaction in transactions.iter_transactions(dataset_id, min=100):
+            ...
+
+Transactions are indexed by their position in the log, starting at 0.
+"""
+from __future__ import absolute_import
+import json
+import os
+import sqlite3
+
+from . import api
+
+# Default location of the mirror database.
+DEFAULT_MIRROR_PATH = os.path.join(os.path.expanduser('~'), '.conduce-transactions.sqlite')
+
+# Number of transactions written to the mirror per database transaction.
+SYNC_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    dataset_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, idx)
+)
+"""
+
+
+class TransactionMirror(object):
+    """
+    A SQLite store of dataset transaction logs, keyed by dataset and transaction index.
+
+    Parameters
+    ----------
+    path : string
+        Path of the database file (default: :py:data:`DEFAULT_MIRROR_PATH`).  It is created if it does not exist.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_MIRROR_PATH
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(_SCHEMA)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self.connection.close()
+
+    def last_index(self, dataset_id):
+        """
+        Get the index of the newest mirrored transaction of a dataset, or -1 if none are mirrored.
+        """
+        row = self.connection.execute('SELECT MAX(idx) FROM transactions WHERE dataset_id = ?', (dataset_id,)).fetchone()
+        return -1 if row[0] is None else row[0]
+
+    def count(self, dataset_id):
+        """
+        Get the number of mirrored transactions of a dataset.
+        """
+        return self.connection.execute('SELECT COUNT(*) FROM transactions WHERE dataset_id = ?', (dataset_id,)).fetchone()[0]
+
+    def sync(self, dataset_id, **kwargs):
+        """
+        Copy the transactions appended to a dataset's log since the last sync.
+
+        The size of the server's log and its copy of the newest mirrored transaction are checked first, so a mirror
+        that is up to date costs two requests.  If the server's log is shorter than the mirror, or the transaction
+        differs (for example, because the dataset was cleared and refilled) the mirror of the dataset is rebuilt.
+
+        New transactions are read with :py:func:`conduce.api.iter_transactions` and committed in batches of
+        :py:data:`SYNC_BATCH_SIZE`, so an interrupted sync resumes where it stopped.
+
+        Parameters
+        ----------
+        dataset_id : string
+            The UUID that identifies the dataset.
+        **kwargs:
+            See :py:func:`conduce.api.iter_transactions` for more kwargs.
+
+        Returns
+        -------
+        integer
+            The number of transactions added to the mirror.
+        """
+        for key in ('min', 'max', 'value', 'count', 'page_state'):
+            kwargs.pop(key, None)
+
+        first = self.last_index(dataset_id) + 1
+        count = api.get_transactions(dataset_id, count=True, **kwargs)['count']
+        if count < first or (first and not self._matches(dataset_id, first - 1, **kwargs)):
+            # The server's log was cleared or truncated (and possibly refilled) since the last sync.
+            self.remove(dataset_id)
+            first = 0
+        if count <= first:
+            return 0
+
+        added = 0
+        batch = []
+        for idx, transaction in enumerate(api.iter_transactions(dataset_id, min=first, **kwargs), start=first):
+            batch.append((dataset_id, idx, json.dumps(transaction)))
+            if len(batch) >= SYNC_BATCH_SIZE:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+
+        return added
+
+    def _matches(self, dataset_id, idx, **kwargs):
+        # Whether the server's transaction at idx is the mirrored one.
+        transactions, _ = api.transaction_page(api.get_transactions(dataset_id, min=idx, max=idx, rows=1, **kwargs))
+        return transactions[:1] == [self.get_transaction(dataset_id, idx)]
+
+    def _insert(self, rows):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO transactions (dataset_id, idx, body) VALUES (?, ?, ?)', rows)
+        return len(rows)
+
+    def iter_transactions(self, dataset_id, min=None, max=None):
+        """
+        Iterate over the mirrored transactions of a dataset, oldest first.
+
+        Parameters
+        ----------
+        dataset_id : string
+            The UUID that identifies the dataset.
+        min : integer
+            The index of the oldest transaction.
+        max : integer
+            The index of the newest transaction.
+
+        Returns
+        -------
+        generator
+            The transactions.
+        """
+        query = 'SELECT body FROM transactions WHERE dataset_id = ? AND idx >= ? AND idx <= ? ORDER BY idx'
+        bounds = (dataset_id, -1 if min is None else min, self.last_index(dataset_id) if max is None else max)
+        for row in self.connection.execute(query, bounds):
+            yield json.loads(row[0])
+
+    def get_transaction(self, dataset_id, idx):
+        """
+        Get a mirrored transaction by index, or None if it is not mirrored.
+        """
+        row = self.connection.execute('SELECT body FROM transactions WHERE dataset_id = ? AND idx = ?', (dataset_id, idx)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def remove(self, dataset_id):
+        """
+        Remove the mirrored transactions of a dataset.
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM transactions WHERE dataset_id = ?', (dataset_id,))
@@ -4,8 +4,16 @@ import requests
 import getpass
 import os
 import pickle
+import threading
+import time
 from . import config
 
+# Seconds a validated session is reused before it is checked with the server again.
+SESSION_CACHE_TTL = 600
+
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+
 
 def api_key_header(api_key):
     if not api_key:
@@ -14,7 +22,44 @@ def api_key_header(api_key):
     return {'Authorization': 'Bearer {}'.format(api_key)}
 
 
+def invalidate_session(host, email):
+    """
+    Drop the cached credentials for a host and user.
+
+    The next call to :py:func:`get_session` re-reads the configuration and validates the session with the server.
+    """
+    with _session_cache_lock:
+        _session_cache.pop((host, email), None)
+
+
+def clear_session_cache():
+    with _session_cache_lock:
+        _session_cache.clear()
+
+
 def get_session(host, email, password, verify=True):
+    """
+    Get authorization for a user on a host.
+
+    Returns an API key header if one is configured for the user, otherwise session cookies. The result is cached
+    in-process for :py:data:`SESSION_CACHE_TTL` seconds so that the configuration file, the cookie file and
+    session validation are not read and checked on every request.  Use :py:func:`invalidate_session` to discard
+    credentials the server has rejected.
+    """
+    with _session_cache_lock:
+        cached = _session_cache.get((host, email))
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
+    auth = _get_session(host, email, password, verify)
+
+    with _session_cache_lock:
+        _session_cache[(host, email)] = (auth, time.time() + SESSION_CACHE_TTL)
+
+    return auth
+
+
+def _get_session(host, email, password, verify):
     if password is None:
         api_key = config.get_api_key(email, host)
         if api_key:
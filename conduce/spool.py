@@ -0,0 +1,414 @@
+"""
+Durable local spool for appending to a dataset.
+
+A :py:class:`Spool` accepts entities immediately, writes them to append-only segment files on local disk and
+posts the segments to the dataset, in order, from a background thread.  Producers are not blocked while the
+Conduce server is slow or unavailable; the spooled entities are posted once it recovers::
+
+    from conduce import api
+
+    api.append_transaction(dataset_id, entity_set, spool='/var/spool/conduce/my-feed')
+
+Segments are removed once they are posted, and segments left behind by an interrupted process are posted when
+the spool is opened again.  Delivery is at-least-once: a segment that was posted just before the process was
+killed is posted again.
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+import glob
+import os
+import threading
+import time
+
+from requests.exceptions import HTTPError
+
+from . import api
+from . import util
+
+# Size (bytes) at which the active segment is sealed and queued for posting.
+SEGMENT_BYTES = 4 * 2**20
+
+# Age (seconds) at which a non-empty active segment is sealed, bounding the delay before entities are posted.
+SEGMENT_SECONDS = 1.0
+
+# Spooled entities are fsynced to disk at least this often (seconds) ...
+FSYNC_INTERVAL = 0.2
+
+# ... or after this many entities, whichever comes first.
+FSYNC_ENTITIES = 10000
+
+# Producers block when this many bytes are spooled and not yet posted.
+MAX_SPOOL_BYTES = 2**30
+
+# Bounds (seconds) of the delay between attempts to post a segment that failed with a retryable error.
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 60.0
+
+# HTTP statuses of a segment post that are retried, in addition to the errors retried by conduce.api: unauthorized
+# (the failed request invalidates the session, so the next attempt authenticates again), request timeout and too
+# many requests.
+RETRY_STATUSES = (401, 408, 429)
+
+# Kwargs that do not apply to posting a segment, which is always posted as one serialized APPEND transaction.
+_SEGMENT_KWARGS = ('operation', 'serialize', 'spool', 'debug', 'chunk_size', 'chunk_bytes', 'chunk_callback', 'chunk_retries', 'workers')
+
+_ACTIVE_SUFFIX = '.open'
+_SEALED_SUFFIX = '.ndjson'
+_FAILED_SUFFIX = '.failed'
+
+_spools = {}
+_spools_lock = threading.Lock()
+
+
+class SpoolFullError(Exception):
+    def __init__(self, message):
+        super(SpoolFullError, self).__init__(message)
+
+
+class SpoolClosedError(Exception):
+    def __init__(self, message):
+        super(SpoolClosedError, self).__init__(message)
+
+
+class Spool(object):
+    """
+    An on-disk write-ahead spool of entities appended to a dataset.
+
+    Each entity is written as one line of JSON to the active segment file.  Writes are fsynced in batches (see
+    :py:data:`FSYNC_INTERVAL` and :py:data:`FSYNC_ENTITIES`).  The active segment is sealed when it reaches
+    :py:data:`SEGMENT_BYTES` or :py:data:`SEGMENT_SECONDS`.  A drainer thread posts each sealed segment as one
+    `APPEND` transaction, oldest first, retrying retryable errors (see :py:data:`RETRY_STATUSES`) with exponential
+    backoff.  A segment that fails with a non-retryable error (for example, invalid entities) is renamed to
+    ``*.failed`` and skipped.
+
+    Parameters
+    ----------
+    directory : string
+        The directory that holds the segment files of this spool.  It is created if it does not exist.  Only one
+        spool may use a directory at a time.
+    dataset_id : string
+        The UUID that identifies the dataset to append to.
+    **kwargs:
+        **segment_bytes**, **segment_seconds**, **fsync_interval**, **fsync_entities**, **max_spool_bytes**
+            Override the module defaults.
+        **error_callback**
+            A function called as ``error_callback(segment_path, exception)`` when a segment fails.
+
+        See :py:func:`conduce.api.post_transaction` for more kwargs, which are used to post each segment.  The
+        kwargs that split a transaction into chunks are ignored.
+    """
+
+    def __init__(self, directory, dataset_id, **kwargs):
+        self.directory = directory
+        self.dataset_id = dataset_id
+        self.segment_bytes = kwargs.pop('segment_bytes', None) or SEGMENT_BYTES
+        self.segment_seconds = kwargs.pop('segment_seconds', None) or SEGMENT_SECONDS
+        self.fsync_interval = kwargs.pop('fsync_interval', None) or FSYNC_INTERVAL
+        self.fsync_entities = kwargs.pop('fsync_entities', None) or FSYNC_ENTITIES
+        self.max_spool_bytes = kwargs.pop('max_spool_bytes', None) or MAX_SPOOL_BYTES
+        self.error_callback = kwargs.pop('error_callback', None)
+        self.request_kwargs = {key: value for key, value in kwargs.items() if key not in _SEGMENT_KWARGS}
+        self.errors = []
+
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._active = None
+        self._active_path = None
+        self._active_bytes = 0
+        self._active_opened = None
+        self._unsynced = 0
+        self._synced_at = time.time()
+        self._posting = False
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Seal the segments left behind by an interrupted process so that they are posted first.
+        for path in self._segments(_ACTIVE_SUFFIX):
+            _truncate_torn_line(path)
+            os.rename(path, path[:-len(_ACTIVE_SUFFIX)] + _SEALED_SUFFIX)
+
+        self._next_segment = max([_segment_number(path) for path in self._segments('.*')] + [-1]) + 1
+        self._spooled_bytes = sum(os.path.getsize(path) for path in self._segments(_SEALED_SUFFIX))
+
+        self._drainer = threading.Thread(target=self._drain, name='conduce-spool-drainer')
+        self._drainer.daemon = True
+        self._drainer.start()
+
+    def _segments(self, suffix):
+        return sorted(glob.glob(os.path.join(self.directory, 'segment-*' + suffix)), key=_segment_number)
+
+    def append(self, entity_set, timeout=None):
+        """
+        Spool the entities of an entity set.
+
+        Returns as soon as the entities are written to the active segment.  Blocks while the spool holds
+        ``max_spool_bytes`` that are not yet posted.
+
+        Parameters
+        ----------
+        entity_set : dictionary
+            A dictionary of Conduce entities, see :py:func:`conduce.api.post_transaction`.  Entities may be
+            pre-serialized JSON bytes (see :py:func:`conduce.util.serialize_entities`).
+        timeout : float
+            The maximum number of seconds to wait for space in the spool.  Waits indefinitely by default.
+
+        Returns
+        -------
+        integer
+            The number of entities spooled.
+
+        Raises
+        ------
+        SpoolFullError
+            The spool remained full for ``timeout`` seconds.
+        SpoolClosedError
+            The spool was closed.
+        """
+        lines = [(entity if isinstance(entity, bytes) else util.dumps_bytes(entity)) + b'\n' for entity in entity_set['entities']]
+        size = sum(len(line) for line in lines)
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self._space:
+            while self._spooled_bytes + self._active_bytes > self.max_spool_bytes and not self._stop.is_set():
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise SpoolFullError('The spool in {} is full'.format(self.directory))
+                self._space.wait(remaining)
+            if self._stop.is_set():
+                raise SpoolClosedError('The spool in {} is closed'.format(self.directory))
+
+            if self._active is None:
+                self._open_segment()
+            self._active.writelines(lines)
+            self._active_bytes += size
+            self._unsynced += len(lines)
+
+            if self._active_bytes >= self.segment_bytes:
+                self._seal()
+            elif self._unsynced >= self.fsync_entities or time.time() - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+        return len(lines)
+
+    def _open_segment(self):
+        self._active_path = os.path.join(self.directory, 'segment-{:012d}{}'.format(self._next_segment, _ACTIVE_SUFFIX))
+        self._next_segment += 1
+        self._active = open(self._active_path, 'ab')
+        self._active_bytes = 0
+        self._active_opened = time.time()
+
+    def _sync(self):
+        if self._active is not None and self._unsynced:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    def _seal(self):
+        # Called with the lock held.
+        if self._active is None:
+            return
+        self._sync()
+        self._active.close()
+        os.rename(self._active_path, self._active_path[:-len(_ACTIVE_SUFFIX)] + _SEALED_SUFFIX)
+        self._spooled_bytes += self._active_bytes
+        self._active = None
+        self._active_bytes = 0
+        self._wake.set()
+
+    def _tick(self):
+        with self._lock:
+            now = time.time()
+            if self._active is not None and now - self._active_opened >= self.segment_seconds:
+                self._seal()
+            elif now - self._synced_at >= self.fsync_interval:
+                self._sync()
+
+    def _drain(self):
+        while not self._stop.is_set():
+            self._tick()
+            segments = self._segments(_SEALED_SUFFIX)
+            if not segments:
+                self._wake.wait(min(self.fsync_interval, self.segment_seconds))
+                self._wake.clear()
+                continue
+            self._post_segment(segments[0])
+
+    def _post_segment(self, path):
+        with open(path, 'rb') as infile:
+            entities = [line.rstrip(b'\n') for line in infile if line.strip()]
+        size = os.path.getsize(path)
+
+        attempt = 0
+        while not self._stop.is_set():
+            with self._lock:
+                self._posting = True
+            try:
+                if entities:
+                    api.append_transaction(self.dataset_id, {'entities': entities}, serialize=True, **self.request_kwargs)
+                os.remove(path)
+                break
+            except Exception as e:
+                if not _retryable(e):
+                    os.rename(path, path[:-len(_SEALED_SUFFIX)] + _FAILED_SUFFIX)
+                    self._failed(path, e)
+                    break
+                self._sleep(max(min(RETRY_INITIAL_DELAY * 2**attempt, RETRY_MAX_DELAY), _retry_after(e)))
+                attempt += 1
+            finally:
+                with self._lock:
+                    self._posting = False
+        else:
+            return
+
+        with self._space:
+            self._spooled_bytes -= size
+            self._space.notify_all()
+
+    def _sleep(self, seconds):
+        # Keep syncing and sealing the active segment while waiting to retry.
+        deadline = time.time() + seconds
+        while not self._stop.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            self._stop.wait(min(remaining, self.fsync_interval))
+            self._tick()
+
+    def _failed(self, path, exception):
+        self.errors.append((path, exception))
+        if self.error_callback is not None:
+            self.error_callback(path, exception)
+        else:
+            print('Failed to post spooled segment {}: {}'.format(path, exception))
+
+    def pending_bytes(self):
+        """
+        Get the number of spooled bytes that are not yet posted.
+        """
+        with self._lock:
+            return self._spooled_bytes + self._active_bytes
+
+    def flush(self, timeout=None):
+        """
+        Seal the active segment and wait until every spooled entity is posted (or its segment failed).
+
+        Parameters
+        ----------
+        timeout : float
+            The maximum number of seconds to wait.  Waits indefinitely by default.
+
+        Returns
+        -------
+        boolean
+            True if the spool was drained, False if it was not drained within ``timeout`` or it is closed.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._space:
+            self._seal()
+            while self._spooled_bytes > 0 or self._posting:
+                if not self._drainer.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._space.wait(remaining if remaining is not None else self.fsync_interval)
+        return True
+
+    def close(self, drain=True, timeout=None):
+        """
+        Stop the drainer thread.  Once closed, the spool no longer accepts entities and :py:func:`get_spool` opens
+        the directory again.
+
+        Parameters
+        ----------
+        drain : boolean
+            Post every spooled entity before stopping.  Entities that are not posted remain in the spool and are
+            posted when it is opened again.
+        timeout : float
+            The maximum number of seconds to wait for the spool to drain.
+        """
+        if drain:
+            self.flush(timeout)
+        with self._space:
+            self._seal()
+            self._stop.set()
+            self._space.notify_all()
+        self._wake.set()
+        self._drainer.join()
+
+        with _spools_lock:
+            key = os.path.abspath(self.directory)
+            if _spools.get(key) is self:
+                del _spools[key]
+
+
+def _segment_number(path):
+    return int(os.path.basename(path).split('-')[1].split('.')[0])
+
+
+def _retryable(exception):
+    if isinstance(exception, HTTPError) and exception.response is not None and exception.response.status_code in RETRY_STATUSES:
+        return True
+    return api.is_retryable_error(exception)
+
+
+def _retry_after(exception):
+    # The delay (seconds) requested by the Retry-After header of a 429 or 503 response, if any.
+    response = getattr(exception, 'response', None)
+    try:
+        return min(float(response.headers.get('Retry-After', 0)), RETRY_MAX_DELAY)
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def _truncate_torn_line(path):
+    # Drop a partially written last line.
+    with open(path, 'rb+') as infile:
+        data = infile.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            infile.truncate(end)
+
+
+def get_spool(directory, dataset_id, **kwargs):
+    """
+    Get the shared spool for a directory, opening it if it is not open.
+
+    Parameters
+    ----------
+    directory : string
+        The spool directory, see :py:class:`Spool`.
+    dataset_id : string
+        The UUID that identifies the dataset.
+    **kwargs:
+        See :py:class:`Spool`.  Only used when the spool is opened.
+
+    Returns
+    -------
+    Spool
+        The spool registered for ``directory``.
+    """
+    key = os.path.abspath(directory)
+    with _spools_lock:
+        spool = _spools.get(key)
+        if spool is None:
+            spool = Spool(directory, dataset_id, **kwargs)
+            _spools[key] = spool
+    if spool.dataset_id != dataset_id:
+        raise ValueError('The spool in {} appends to dataset {}'.format(directory, spool.dataset_id))
+    return spool
+
+
+def close_spools(drain=True, timeout=None):
+    """
+    Close every spool opened with :py:func:`get_spool`.
+    """
+    with _spools_lock:
+        spools = list(_spools.values())
+        _spools.clear()
+    for spool in spools:
+        spool.close(drain, timeout)
@@ -2,17 +2,66 @@ from __future__ import print_function
 from __future__ import absolute_import
 from builtins import input
 from builtins import str
+import collections
+import copy
 import csv
+import itertools
 import json
 import os
+import random
 import uuid
 import re
 from dateutil import parser
+from dateutil.tz import tzoffset
+from dateutil.tz import tzutc
 from datetime import datetime
 import pytz
 import math
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Number of rows sampled to infer the type of each attribute column.
+ATTRIBUTE_SAMPLE_SIZE = 100
+
+# Number of rows sampled to map fields to entity identity, kind, time and position.
+FIELD_SAMPLE_SIZE = 100
+
+# When streaming, the field sample is drawn from at most this many leading rows, which are held in memory.
+FIELD_SAMPLE_WINDOW = 10000
+
+# Version of the ingest schema file format.
+SCHEMA_VERSION = 1
+
+# Integers up to this magnitude are exactly representable as doubles, so parsing them with int() gives the same
+# value as build_attribute.
+_MAX_EXACT_INT64 = 2 ** 53
+
+_TEXT_TYPES = (type(u''), type(''))
+
+# Date formats tried, in order, when inferring the format of a timestamp column.
+STRPTIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y',
+    '%d-%b-%Y %H:%M:%S',
+    '%a, %d %b %Y %H:%M:%S',
+]
+
+# Maximum number of distinct date strings memoized by a timestamp parser.
+TIMESTAMP_CACHE_SIZE = 100000
+
+_ISO_8601_PATTERN = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?)?(Z|[+-]\d{2}:?\d{2})?\Z')
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=tzutc())
+
 
 def time_period_to_zoom_level(time_period):
     LOG_ONE_HALF = math.log(0.5)
@@ -58,7 +107,7 @@ def format_mac_address(mac_address):
 
 def datetime_to_timestamp_ms(dt):
     tz_naive = dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None
-    EPOCH = parser.parse("1970-01-01T00:00:00.000+0000", ignoretz=tz_naive)
+    EPOCH = _EPOCH if tz_naive else _EPOCH_UTC
     return int((dt - EPOCH).total_seconds() * 1000)
 
 
@@ -86,6 +135,202 @@ def string_to_timestamp_ms(datetime_string, ignoretz=True, tz=None):
         raise e
 
 
+def _iso_8601_to_datetime(value):
+    match = _ISO_8601_PATTERN.match(value)
+    if match is None:
+        raise ValueError('Not an ISO-8601 timestamp: {}'.format(value))
+
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    microsecond = int((fraction or '0').ljust(6, '0'))
+    dt = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0), microsecond)
+    if zone == 'Z':
+        dt = dt.replace(tzinfo=tzutc())
+    elif zone:
+        offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+        dt = dt.replace(tzinfo=tzoffset(None, -offset if zone[0] == '-' else offset))
+
+    return dt
+
+
+def _datetime_parser(to_datetime, ignoretz, tz_name):
+    # Apply the time zone handling of string_to_timestamp_ms to datetimes parsed by to_datetime.
+    if tz_name is not None:
+        timezone = pytz.timezone(tz_name)
+        return lambda value: datetime_to_timestamp_ms(to_datetime(value).replace(tzinfo=timezone))
+    if ignoretz:
+        return lambda value: datetime_to_timestamp_ms(to_datetime(value).replace(tzinfo=None))
+    return lambda value: datetime_to_timestamp_ms(to_datetime(value))
+
+
+def _timestamp_candidates(ignoretz, tz_name, timestamp_format=None):
+    if timestamp_format is not None:
+        return [('strptime', _datetime_parser(lambda value: datetime.strptime(value, timestamp_format), ignoretz, tz_name))]
+
+    candidates = [
+        ('epoch_ms', int),
+        ('epoch_s', lambda value: float(value) * 1000),
+        ('iso_8601', _datetime_parser(_iso_8601_to_datetime, ignoretz, tz_name)),
+    ]
+    for strptime_format in STRPTIME_FORMATS:
+        candidates.append((strptime_format, _datetime_parser(
+            lambda value, strptime_format=strptime_format: datetime.strptime(value, strptime_format), ignoretz, tz_name)))
+
+    return candidates
+
+
+def infer_timestamp_format(values, ignoretz=True, tz=None):
+    """
+    Infer the format of a column of timestamps from a sample of its values.
+
+    Parameters
+    ----------
+    values : list
+        Sample values of the column.
+    ignoretz : bool
+        See :py:func:`string_to_timestamp_ms`.
+    tz : string
+        See :py:func:`string_to_timestamp_ms`.
+
+    Returns
+    -------
+    string
+        ``epoch_ms``, ``epoch_s``, ``iso_8601`` or one of :py:data:`STRPTIME_FORMATS`: the first format that
+        converts every sample value to the same timestamp as :py:func:`string_to_timestamp_ms`.  ``None`` if no
+        format does.
+    """
+    expected = []
+    for value in values:
+        try:
+            expected.append((value, string_to_timestamp_ms(value, ignoretz, tz)))
+        except Exception:
+            return None
+    if not expected:
+        return None
+
+    for name, parse in _timestamp_candidates(ignoretz, tz):
+        try:
+            if all(parse(value) == timestamp_ms for value, timestamp_ms in expected):
+                return name
+        except Exception:
+            pass
+
+    return None
+
+
+def timestamp_parser(values=None, ignoretz=True, tz=None, timestamp_format=None):
+    """
+    Get a fast function that converts the timestamps of a column to milliseconds since the epoch.
+
+    The column format is inferred once from a sample of its values (see :py:func:`infer_timestamp_format`)
+    and every value is converted with a parser specialized for that format.  Values that the specialized parser
+    cannot convert fall back to :py:func:`string_to_timestamp_ms`.  Conversions of date strings are memoized,
+    so repeated timestamps are only parsed once.
+
+    Parameters
+    ----------
+    values : list
+        Sample values of the column.
+    ignoretz : bool
+        See :py:func:`string_to_timestamp_ms`.
+    tz : string
+        See :py:func:`string_to_timestamp_ms`.
+    timestamp_format : string
+        A format returned by :py:func:`infer_timestamp_format` or a :py:meth:`datetime.datetime.strptime` format for
+        the column.  Skips inference when provided.
+
+    Returns
+    -------
+    function
+        A function that takes a timestamp value and returns the timestamp in milliseconds.
+    """
+    known_formats = dict(_timestamp_candidates(ignoretz, tz))
+    if timestamp_format in known_formats:
+        name, parse = timestamp_format, known_formats[timestamp_format]
+    elif timestamp_format is not None:
+        name, parse = _timestamp_candidates(ignoretz, tz, timestamp_format)[0]
+    else:
+        name = infer_timestamp_format(values or [], ignoretz, tz)
+        parse = known_formats.get(name)
+
+    def slow_parse(value):
+        return string_to_timestamp_ms(value, ignoretz, tz)
+
+    if parse is None:
+        parse = slow_parse
+
+    def fast_parse(value):
+        try:
+            return parse(value)
+        except Exception:
+            return slow_parse(value)
+
+    if name in ('epoch_ms', 'epoch_s'):
+        return fast_parse
+
+    cache = {}
+
+    def memoized_parse(value):
+        try:
+            return cache[value]
+        except KeyError:
+            pass
+        except TypeError:
+            return fast_parse(value)
+
+        timestamp_ms = fast_parse(value)
+        if len(cache) >= TIMESTAMP_CACHE_SIZE:
+            cache.clear()
+        cache[value] = timestamp_ms
+        return timestamp_ms
+
+    return memoized_parse
+
+
+def dumps_bytes(obj):
+    """
+    Serialize an object to compact, UTF-8 encoded JSON.
+
+    Uses `orjson <https://github.com/ijl/orjson>`_ when it is installed and the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def serialize_entities(entities):
+    """
+    Lazily serialize entities to JSON bytes.
+
+    Pass the result as the ``entities`` of an entity set to :py:func:`conduce.api.post_transaction` to post a
+    transaction without holding the entity dictionaries in memory.
+    """
+    for entity in entities:
+        yield dumps_bytes(entity)
+
+
+def chunk_entities(entities, max_count=None, max_bytes=None):
+    """
+    Split an iterable of entities into lists.
+
+    Each list holds at most ``max_count`` entities and, when ``max_bytes`` is set, its JSON encoded entities total at
+    most ``max_bytes`` bytes.  A single entity larger than ``max_bytes`` is yielded on its own.  Entities may be
+    pre-serialized JSON bytes (see :py:func:`dumps_bytes`).
+    """
+    chunk = []
+    chunk_bytes = 0
+    for entity in entities:
+        entity_bytes = (len(entity) if isinstance(entity, bytes) else len(json.dumps(entity))) if max_bytes else 0
+        if chunk and ((max_count and len(chunk) >= max_count) or (max_bytes and chunk_bytes + entity_bytes > max_bytes)):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(entity)
+        chunk_bytes += entity_bytes
+
+    if chunk:
+        yield chunk
+
+
 def get_csv_reader(infile, delimiter):
     if len(delimiter) > 1:
         try:
@@ -100,21 +345,29 @@ def get_csv_reader(infile, delimiter):
         return csv.DictReader(infile, delimiter=delimiter)
 
 
-def csv_to_json(infile, outfile=None, toStdout=False, **kwargs):
-    delimiter = ';,'
-    if 'delimiter' in kwargs:
-        delimiter = kwargs['delimiter']
+def iter_csv_rows(infile, **kwargs):
+    """
+    Read a CSV file one row at a time.
+
+    ``infile`` may be a path or a file object.  Rows are yielded as dictionaries keyed by the header row, so the
+    file is never held in memory.
+    """
+    delimiter = kwargs.get('delimiter', ';,')
 
     if hasattr(infile, 'read'):
-        reader = get_csv_reader(infile, delimiter)
-        out = json.dumps([row for row in reader])
+        for row in get_csv_reader(infile, delimiter):
+            yield row
     else:
         with open(infile, "r") as f:
-            reader = get_csv_reader(f, delimiter)
-            out = json.dumps([row for row in reader])
-    if out is None:
-        raise RuntimeError("No JSON output. Try again.")
-    else:
+            for row in get_csv_reader(f, delimiter):
+                yield row
+
+
+def csv_to_json(infile, outfile=None, toStdout=False, **kwargs):
+    rows = list(iter_csv_rows(infile, **kwargs))
+
+    if toStdout is True or outfile is not None:
+        out = json.dumps(rows)
         if toStdout is True:
             print(out)
             print()
@@ -122,7 +375,7 @@ def csv_to_json(infile, outfile=None, toStdout=False, **kwargs):
             with open(outfile, "w") as output_file:
                 json.dump(out, output_file)
 
-    return json.loads(out)
+    return rows
 
 
 def get_id_score(key, value):
@@ -173,6 +426,9 @@ def get_timestamp_score(key, value):
     if key.startswith('start'):
         score += 200
 
+    if score == 0:
+        return 0
+
     try:
         string_to_timestamp_ms(value)
         return score
@@ -194,6 +450,9 @@ def get_endtime_score(key, value):
     if key.startswith('end'):
         score += 200
 
+    if score == 0:
+        return 0
+
     try:
         float(value)
         return score
@@ -211,6 +470,9 @@ def get_x_score(key, value):
     if 'longitude' in key:
         score += 500
 
+    if score == 0:
+        return 0
+
     try:
         float(value)
         return score
@@ -228,6 +490,9 @@ def get_y_score(key, value):
     if 'latitude' in key:
         score += 500
 
+    if score == 0:
+        return 0
+
     try:
         float(value)
         return score
@@ -245,6 +510,9 @@ def get_z_score(key, value):
     if key == 'alt':
         score += 100
 
+    if score == 0:
+        return 0
+
     try:
         float(value)
         return score
@@ -301,85 +569,527 @@ def build_attribute(key, value):
     return attribute
 
 
-def get_attributes(attribute_keys, raw_entity):
+def infer_attribute_type(values):
+    """
+    Infer the attribute type of a column from a sample of its values.
+
+    Parameters
+    ----------
+    values : list
+        Sample values of the column.
+
+    Returns
+    -------
+    string
+        The most common type (``INT64``, ``DOUBLE`` or ``STRING``) that :py:func:`build_attribute` assigns to the values.
+    """
+    counts = collections.Counter(build_attribute(None, value)['type'] for value in values)
+    if not counts:
+        return 'STRING'
+
+    return counts.most_common(1)[0][0]
+
+
+def infer_attribute_types(raw_entities):
+    """
+    Infer the attribute type of every key in a sample of raw dictionaries.
+
+    Returns
+    -------
+    dict
+        A dictionary of attribute types (see :py:func:`infer_attribute_type`) keyed by dictionary key.
+    """
+    columns = collections.OrderedDict()
+    for raw_entity in raw_entities:
+        for key, value in raw_entity.items():
+            columns.setdefault(key, []).append(value)
+
+    return {key: infer_attribute_type(values) for key, values in columns.items()}
+
+
+def _looks_like_string(value):
+    # float() only parses text that starts with whitespace, a sign, a decimal point, a digit or the letters of
+    # inf/nan.  build_attribute treats inf and nan as strings, so anything else is a string without trying.
+    return not value or not (value[0].isdigit() or value[0] in '+-.' or value[0].isspace())
+
+
+def attribute_builder(attribute_type):
+    """
+    Get a function that builds attributes, optimized for values of the given type.
+
+    Values of the expected type are converted without the exception handling of :py:func:`build_attribute`.
+    Any other value falls back to :py:func:`build_attribute`, so the attributes built are always the same.
+
+    Parameters
+    ----------
+    attribute_type : string
+        The expected attribute type (``INT64``, ``DOUBLE`` or ``STRING``).
+
+    Returns
+    -------
+    function
+        A function with the signature of :py:func:`build_attribute`.
+    """
+    if attribute_type == 'INT64':
+        def build_int64_attribute(key, value):
+            if isinstance(value, _TEXT_TYPES):
+                try:
+                    int_val = int(value)
+                except ValueError:
+                    return build_attribute(key, value)
+                if -_MAX_EXACT_INT64 <= int_val <= _MAX_EXACT_INT64:
+                    return {'key': key, 'type': 'INT64', 'int64_value': int_val}
+            return build_attribute(key, value)
+
+        return build_int64_attribute
+
+    if attribute_type == 'STRING':
+        def build_string_attribute(key, value):
+            if isinstance(value, _TEXT_TYPES) and _looks_like_string(value):
+                return {'key': key, 'type': 'STRING', 'str_value': str(value)}
+            return build_attribute(key, value)
+
+        return build_string_attribute
+
+    return build_attribute
+
+
+def build_attributes(key, values, attribute_type=None):
+    """
+    Build the attributes of a column of values.
+
+    Parameters
+    ----------
+    key : string
+        The attribute key.
+    values : list
+        The values of the column.
+    attribute_type : string
+        The expected attribute type.  If not provided it is inferred from the first :py:data:`ATTRIBUTE_SAMPLE_SIZE` values.
+
+    Returns
+    -------
+    list
+        An attribute for each value.
+    """
+    values = list(values)
+    if attribute_type is None:
+        attribute_type = infer_attribute_type(values[:ATTRIBUTE_SAMPLE_SIZE])
+
+    build = attribute_builder(attribute_type)
+    return [build(key, value) for value in values]
+
+
+def get_attributes(attribute_keys, raw_entity, builders=None):
+    builders = builders or {}
     attributes = []
     for key in attribute_keys:
-        attributes.append(build_attribute(key, raw_entity[key]))
+        attributes.append(builders.get(key, build_attribute)(key, raw_entity[key]))
 
     return attributes
 
 
+def reservoir_sample(iterable, size, seed=0):
+    """
+    Select a uniform random sample of an iterable of unknown length in a single pass.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The items to sample.
+    size : integer
+        The maximum number of items in the sample.
+    seed : object
+        Seed of the random number generator, so that the same input always gives the same sample.
+
+    Returns
+    -------
+    list
+        At most ``size`` items, in the order they appear in ``iterable``.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    for idx, item in enumerate(iterable):
+        if idx < size:
+            reservoir.append((idx, item))
+        else:
+            slot = rng.randint(0, idx)
+            if slot < size:
+                reservoir[slot] = (idx, item)
+
+    return [item for _, item in sorted(reservoir, key=lambda indexed: indexed[0])]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except Exception:
+        return None
+
+
+def profile_fields(raw_entities, keys):
+    """
+    Compute statistics of each field of a sample of raw dictionaries.
+
+    Parameters
+    ----------
+    raw_entities : list
+        The sample of raw dictionaries.
+    keys : list
+        The fields to profile.
+
+    Returns
+    -------
+    dict
+        A dictionary keyed by field with the ``count`` of values, the ``numeric_rate`` (fraction of values that
+        parse as numbers), the ``min`` and ``max`` of the numeric values and the ``cardinality`` (number of
+        distinct values).
+    """
+    profiles = {}
+    for key in keys:
+        values = [raw_entity[key] for raw_entity in raw_entities if key in raw_entity]
+        numbers = [number for number in (_to_float(value) for value in values) if number is not None and not math.isnan(number)]
+        profiles[key] = {
+            'count': len(values),
+            'numeric_rate': float(len(numbers)) / len(values) if values else 0.0,
+            'min': min(numbers) if numbers else None,
+            'max': max(numbers) if numbers else None,
+            'cardinality': len(set(str(value) for value in values)),
+        }
+
+    return profiles
+
+
+def _mean_score(get_score, key, values):
+    total = 0
+    for value in values:
+        try:
+            total += get_score(key, value)
+        except Exception:
+            pass
+
+    return float(total) / len(values) if values else 0
+
+
+def _in_range(profile, bound):
+    return profile['min'] is None or (-bound <= profile['min'] and profile['max'] <= bound)
+
+
 def score_fields(raw_entities, keys, **kwargs):
-    # TODO: Use up to 100 values to score fields
+    """
+    Score how well each field of the raw dictionaries matches each Conduce entity field.
+
+    Scores are averaged over a sample of up to ``sample_size`` (default :py:data:`FIELD_SAMPLE_SIZE`) rows, so fields
+    whose values only sometimes parse score lower.  Longitude and latitude scores are dropped for fields with values
+    outside of [-180, 180] and [-90, 90].  Fields named ``x`` or ``y`` are not range checked.
+    """
+    sample = reservoir_sample(raw_entities, kwargs.get('sample_size') or FIELD_SAMPLE_SIZE)
+    profiles = profile_fields(sample, keys)
+
     key_scores = {}
     for key in keys:
+        values = [raw_entity[key] for raw_entity in sample if key in raw_entity]
+        profile = profiles[key]
+
         key_scores[key] = {}
         if kwargs.get('generate_ids', False):
             key_scores[key]['identity_score'] = 0
         else:
-            key_scores[key]['identity_score'] = get_id_score(key, raw_entities[0][key])
-        key_scores[key]['kind_score'] = get_kind_score(key, raw_entities[0][key])
-        key_scores[key]['timestamp_ms_score'] = get_timestamp_score(key, raw_entities[0][key])
-        key_scores[key]['endtime_ms_score'] = get_endtime_score(key, raw_entities[0][key])
-        key_scores[key]['x_score'] = get_x_score(key, raw_entities[0][key])
-        key_scores[key]['y_score'] = get_y_score(key, raw_entities[0][key])
-        key_scores[key]['z_score'] = get_z_score(key, raw_entities[0][key])
+            key_scores[key]['identity_score'] = _mean_score(get_id_score, key, values)
+        key_scores[key]['kind_score'] = _mean_score(get_kind_score, key, values)
+        key_scores[key]['timestamp_ms_score'] = _mean_score(get_timestamp_score, key, values)
+        key_scores[key]['endtime_ms_score'] = _mean_score(get_endtime_score, key, values)
+        key_scores[key]['x_score'] = _mean_score(get_x_score, key, values)
+        key_scores[key]['y_score'] = _mean_score(get_y_score, key, values)
+        key_scores[key]['z_score'] = _mean_score(get_z_score, key, values)
+
+        if key.lower() != 'x' and not _in_range(profile, 180):
+            key_scores[key]['x_score'] = 0
+        if key.lower() != 'y' and not _in_range(profile, 90):
+            key_scores[key]['y_score'] = 0
+
     return key_scores
 
 
-def map_keys(key_scores, keys):
-    key_map = {}
-    for score in list(key_scores[keys[0]].keys()):
-        max_score = 0
-        max_key = None
-        for key in keys:
-            if key_scores[key][score] > max_score:
-                max_score = key_scores[key][score]
-                max_key = key
+def identity_tie_breakers(raw_entities, keys, **kwargs):
+    """
+    Get the fraction of distinct values of each field in a sample of the raw dictionaries.
+
+    Used by :py:func:`map_keys` to prefer the field with more distinct values when fields have the same identity
+    score.
+    """
+    profiles = profile_fields(reservoir_sample(raw_entities, kwargs.get('sample_size') or FIELD_SAMPLE_SIZE), keys)
+    return {key: float(profile['cardinality']) / profile['count'] if profile['count'] else 0 for key, profile in profiles.items()}
+
 
-        key_map[score[:-6]] = {'key': max_key, 'score': max_score}
+def map_keys(key_scores, keys, tie_breakers=None):
+    """
+    Map each Conduce entity field to the raw dictionary field with the highest score.
 
-    # TODO: Filter to single key match with highest score
+    A raw field is mapped to at most one entity field.  Entity fields are assigned in order of their best score.
+    Ties go to the raw field with the highest value in ``tie_breakers`` (a dictionary of dictionaries keyed by
+    score and raw field, see :py:func:`identity_tie_breakers`), then to the raw field that comes first in ``keys``.
+    """
+    tie_breakers = tie_breakers or {}
+    candidates = []
+    for score in list(key_scores[keys[0]].keys()):
+        for idx, key in enumerate(keys):
+            if key_scores[key][score] > 0:
+                candidates.append((-key_scores[key][score], -tie_breakers.get(score, {}).get(key, 0), idx, score, key))
+
+    key_map = {score[:-6]: {'key': None, 'score': 0} for score in list(key_scores[keys[0]].keys())}
+    mapped_keys = set()
+    for negative_score, _, _, score, key in sorted(candidates):
+        field = score[:-6]
+        if key_map[field]['key'] is None and key not in mapped_keys:
+            key_map[field] = {'key': key, 'score': -negative_score}
+            mapped_keys.add(key)
 
     return key_map
 
 
-def generate_entities(raw_entities, key_map, **kwargs):
-    critical_keys = [d['key'] for d in list(key_map.values())]
-    entities = []
-    for raw_entity in raw_entities:
-        attribute_keys = [key for key in list(raw_entity.keys()) if key not in critical_keys]
-        timestamp = string_to_timestamp_ms(get_field_value(raw_entity, key_map, 'timestamp_ms'))
-        endtime = string_to_timestamp_ms(get_field_value(raw_entity, key_map, 'endtime_ms')) if key_map['endtime_ms']['key'] is not None else timestamp
+def _field_getter(key_map, field):
+    # Precompiled equivalent of get_field_value
+    override_value = key_map[field].get('override_value')
+    if override_value is not None:
+        return lambda raw_entity: override_value
+
+    key = key_map[field].get('key')
+    if not key:
+        return lambda raw_entity: get_default(field)
+
+    return lambda raw_entity: raw_entity[key]
+
+
+def row_converter(schema, **kwargs):
+    """
+    Compile a function that converts a raw dictionary to a Conduce entity with an ingest schema.
+
+    Field lookups, attribute builders and timestamp parsers are resolved once, when the converter is compiled,
+    instead of for every row.
+
+    Parameters
+    ----------
+    schema : dict
+        An ingest schema, see :py:func:`build_schema`.
+    **kwargs:
+        **infinite**
+            Set the time span of every entity to the maximum (default: False).
+
+    Returns
+    -------
+    function
+        A function that takes a raw dictionary and returns an entity.
+    """
+    key_map = schema['key_map']
+    critical_keys = set(d['key'] for d in list(key_map.values()))
+    builders = {key: attribute_builder(attribute_type) for key, attribute_type in schema.get('attribute_types', {}).items()}
+    timestamp_formats = schema.get('timestamp_formats', {})
+
+    get_identity = _field_getter(key_map, 'identity')
+    get_kind = _field_getter(key_map, 'kind')
+    get_timestamp = _field_getter(key_map, 'timestamp_ms')
+    get_endtime = _field_getter(key_map, 'endtime_ms')
+    get_x = _field_getter(key_map, 'x')
+    get_y = _field_getter(key_map, 'y')
+    get_z = _field_getter(key_map, 'z')
+
+    parse_timestamp = timestamp_parser(timestamp_format=timestamp_formats.get('timestamp_ms'))
+    parse_endtime = timestamp_parser(timestamp_format=timestamp_formats.get('endtime_ms'))
+    has_endtime = key_map['endtime_ms']['key'] is not None
+
+    infinite = kwargs.get('infinite', False)
+    if infinite:
+        infinite_timestamp = string_to_timestamp_ms(get_default('timestamp_ms'))
+        infinite_endtime = string_to_timestamp_ms(get_default('endtime_ms'))
+
+    attribute_keys_by_keys = {}
+
+    def convert(raw_entity):
+        keys = tuple(raw_entity.keys())
+        attribute_keys = attribute_keys_by_keys.get(keys)
+        if attribute_keys is None:
+            attribute_keys = [key for key in keys if key not in critical_keys]
+            if len(attribute_keys_by_keys) >= 1000:
+                attribute_keys_by_keys.clear()
+            attribute_keys_by_keys[keys] = attribute_keys
+
+        timestamp = parse_timestamp(get_timestamp(raw_entity))
+        endtime = parse_endtime(get_endtime(raw_entity)) if has_endtime else timestamp
 
         entity = {
-            'identity': get_field_value(raw_entity, key_map, 'identity'),
-            'kind': get_field_value(raw_entity, key_map, 'kind'),
+            'identity': get_identity(raw_entity),
+            'kind': get_kind(raw_entity),
             'timestamp_ms': timestamp,
             'endtime_ms': endtime,
             'path': [{
-                'x': float(get_field_value(raw_entity, key_map, 'x')),
-                'y': float(get_field_value(raw_entity, key_map, 'y')),
-                'z': float(get_field_value(raw_entity, key_map, 'z')),
+                'x': float(get_x(raw_entity)),
+                'y': float(get_y(raw_entity)),
+                'z': float(get_z(raw_entity)),
             }],
-            'attrs': get_attributes(attribute_keys, raw_entity),
+            'attrs': get_attributes(attribute_keys, raw_entity, builders),
         }
 
-        if kwargs.get('infinite', False):
-            entity['timestamp_ms'] = string_to_timestamp_ms(get_default('timestamp_ms'))
-            entity['endtime_ms'] = string_to_timestamp_ms(get_default('endtime_ms'))
+        if infinite:
+            entity['timestamp_ms'] = infinite_timestamp
+            entity['endtime_ms'] = infinite_endtime
 
-        entities.append(entity)
+        return entity
 
-    return entities
+    return convert
 
 
-def dict_to_entities(raw_entities, **kwargs):
+def build_schema(raw_entities, key_map, **kwargs):
+    """
+    Build an ingest schema from a sample of raw dictionaries and their key map.
+
+    An ingest schema records everything inferred about a feed so that it can be converted again without
+    inference or prompts.  It is a JSON serializable dictionary with:
+
+    - **fields**: the fields of the raw dictionaries.
+    - **key_map**: the key map (see :py:func:`get_key_map`), which includes the identity, kind, time and
+      coordinate (x, y, z) fields.
+    - **attribute_types**: the attribute type of each field (see :py:func:`infer_attribute_types`).
+    - **timestamp_formats**: the format of the ``timestamp_ms`` and ``endtime_ms`` fields (see
+      :py:func:`infer_timestamp_format`).  The ``timestamp_format`` kwarg overrides inference.
+
+    Parameters
+    ----------
+    raw_entities : list
+        A sample of the raw dictionaries.
+    key_map : dict
+        The key map of the raw dictionaries.
+
+    Returns
+    -------
+    dict
+        The ingest schema.
+    """
+    timestamp_formats = {}
+    for field in ['timestamp_ms', 'endtime_ms']:
+        if kwargs.get('timestamp_format'):
+            timestamp_formats[field] = kwargs['timestamp_format']
+        else:
+            timestamp_formats[field] = infer_timestamp_format([get_field_value(raw_entity, key_map, field) for raw_entity in raw_entities])
+
+    return {
+        'version': SCHEMA_VERSION,
+        'fields': list(raw_entities[0].keys()) if raw_entities else [],
+        'key_map': key_map,
+        'attribute_types': infer_attribute_types(raw_entities),
+        'timestamp_formats': timestamp_formats,
+    }
+
+
+def save_schema(schema, schema_path):
+    """
+    Save an ingest schema to a JSON file.
+    """
+    with open(schema_path, 'w') as schema_file:
+        json.dump(schema, schema_file, indent=2, sort_keys=True)
+
+
+def load_schema(schema_path):
+    """
+    Load an ingest schema saved by :py:func:`save_schema`.
+
+    Raises
+    ------
+    ValueError
+        If the file is not an ingest schema of a supported version.
+    """
+    with open(schema_path) as schema_file:
+        schema = json.load(schema_file)
+
+    if schema.get('version') != SCHEMA_VERSION or 'key_map' not in schema:
+        raise ValueError('{} is not a version {} ingest schema'.format(schema_path, SCHEMA_VERSION))
+
+    return schema
+
+
+def get_schema(raw_entities, **kwargs):
+    """
+    Get the ingest schema of a sample of raw dictionaries.
+
+    If the ``schema_file`` kwarg names an existing schema file it is loaded and nothing is inferred.  Otherwise the
+    key map is inferred and confirmed (see :py:func:`get_key_map`), the rest of the schema is built from a sample
+    of ``raw_entities`` and, if ``schema_file`` is set, saved to that path for later runs.  The ``kind`` kwarg
+    overrides the kind of a loaded schema.
+    """
+    schema_path = kwargs.get('schema_file')
+    if schema_path and os.path.exists(schema_path):
+        schema = load_schema(schema_path)
+        if kwargs.get('kind'):
+            schema['key_map']['kind'].update({'override_value': kwargs.get('kind')})
+        return schema
+
+    key_map = get_key_map(raw_entities, **kwargs)
+    schema = build_schema(reservoir_sample(raw_entities, ATTRIBUTE_SAMPLE_SIZE), key_map, **kwargs)
+    if schema_path:
+        # The kind override belongs to this run, not to the schema.
+        saved = copy.deepcopy(schema)
+        saved['key_map']['kind'].pop('override_value', None)
+        save_schema(saved, schema_path)
+
+    return schema
+
+
+def sample_stream(raw_entities, **kwargs):
+    """
+    Draw the field sample of a stream of raw dictionaries.
+
+    Reads up to :py:data:`FIELD_SAMPLE_WINDOW` (or ``sample_size``, if larger) leading rows and samples
+    ``sample_size`` (default :py:data:`FIELD_SAMPLE_SIZE`) of them uniformly (see :py:func:`reservoir_sample`).
+
+    Returns
+    -------
+    tuple
+        ``(head, sample)``, where ``head`` is the list of rows read from ``raw_entities``.
+    """
+    sample_size = kwargs.get('sample_size') or FIELD_SAMPLE_SIZE
+    head = list(itertools.islice(raw_entities, max(FIELD_SAMPLE_WINDOW, sample_size)))
+    return head, reservoir_sample(head, sample_size)
+
+
+def stream_schema_entities(raw_entities, schema, **kwargs):
+    """
+    Lazily convert an iterable of raw dictionaries to Conduce entities with an ingest schema.
+    """
+    convert = row_converter(schema, **kwargs)
+    for raw_entity in raw_entities:
+        yield convert(raw_entity)
+
+
+def iter_entities(raw_entities, key_map, **kwargs):
+    """
+    Convert raw dictionaries to Conduce entities one at a time.
+
+    The generator counterpart of :py:func:`generate_entities`.  ``raw_entities`` may be any iterable.  Attribute
+    types and timestamp formats are inferred from the first :py:data:`ATTRIBUTE_SAMPLE_SIZE` elements.
+    """
+    raw_entities = iter(raw_entities)
+    sample = list(itertools.islice(raw_entities, ATTRIBUTE_SAMPLE_SIZE))
+    schema = build_schema(sample, key_map, **kwargs)
+
+    for entity in stream_schema_entities(itertools.chain(sample, raw_entities), schema, **kwargs):
+        yield entity
+
+
+def generate_entities(raw_entities, key_map, **kwargs):
+    return list(iter_entities(raw_entities, key_map, **kwargs))
+
+
+def get_key_map(raw_entities, **kwargs):
+    """
+    Map the keys of the raw dictionaries to Conduce entity fields.
+
+    Unless ``answer_yes`` is set, the mapping is printed and the user is prompted to confirm it.  To reuse a
+    confirmed mapping, save it in an ingest schema (see :py:func:`get_schema`).
+    """
     keys = list(raw_entities[0].keys())
-    fields = ['identity', 'kind', 'x', 'y', 'z', 'timestamp_ms', 'endtime_ms']
 
     key_scores = score_fields(raw_entities, keys, **kwargs)
-    key_map = map_keys(key_scores, keys)
+    key_map = map_keys(key_scores, keys, {'identity_score': identity_tie_breakers(raw_entities, keys, **kwargs)})
     if kwargs.get('kind'):
         key_map['kind'].update({'override_value': kwargs.get('kind')})
     if not kwargs.get('answer_yes'):
@@ -388,13 +1098,45 @@ def dict_to_entities(raw_entities, **kwargs):
         if 'y' not in answer.lower():
             sys.exit()
 
-    entities = generate_entities(raw_entities, key_map, **kwargs)
+    return key_map
+
+
+def dict_to_entities(raw_entities, **kwargs):
+    schema = get_schema(raw_entities, **kwargs)
+    entities = list(stream_schema_entities(raw_entities, schema, **kwargs))
 
     return {'entities': entities}
 
 
+def stream_entities(raw_entities, **kwargs):
+    """
+    Lazily convert an iterable of raw dictionaries to Conduce entities.
+
+    The ingest schema is loaded or computed from a sample of the leading elements (see :py:func:`sample_stream`)
+    and confirmed (see :py:func:`get_schema`) before this function returns.  The remaining elements are only read
+    and converted as the returned generator is consumed.
+    """
+    raw_entities = iter(raw_entities)
+    head, sample = sample_stream(raw_entities, **kwargs)
+    if not head:
+        return iter([])
+
+    schema = get_schema(sample, **kwargs)
+    return stream_schema_entities(itertools.chain(head, raw_entities), schema, **kwargs)
+
+
+def stream_csv_entities(infile, **kwargs):
+    """
+    Lazily convert a CSV file to Conduce entities with constant memory use.
+
+    Pass the result as the ``entities`` of an entity set to :py:func:`conduce.api.post_transaction` with
+    ``chunk_size`` or ``chunk_bytes`` set to post the file in bounded batches as it is read.
+    """
+    return stream_entities(iter_csv_rows(infile, **kwargs), **kwargs)
+
+
 def csv_to_entities(infile, **kwargs):
-    return dict_to_entities(csv_to_json(infile), **kwargs)
+    return {'entities': list(stream_csv_entities(infile, **kwargs))}
 
 
 def _convert_coordinates(point):
@@ -0,0 +1,82 @@
+import sys
+import unittest
+import mock
+
+from requests.exceptions import HTTPError
+
+if sys.version_info < (3, 6):
+    raise unittest.SkipTest('conduce.aio requires Python 3.6 or later')
+
+import asyncio
+
+from conduce import aio
+from conduce import api
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    def tearDown(self):
+        run(aio.close())
+        asyncio.get_event_loop().close()
+
+    @mock.patch('conduce.api.find_resource', return_value=[{'id': 'fake-id'}])
+    def test_find_resource(self, mock_find_resource):
+        result = run(aio.find_resource(name='fake-name', host='fake-host'))
+
+        self.assertEqual(result, [{'id': 'fake-id'}])
+        mock_find_resource.assert_called_once_with(name='fake-name', host='fake-host', pool_size=aio.DEFAULT_CONCURRENCY)
+
+    @mock.patch('conduce.api.get_transactions', return_value={'count': 4})
+    def test_get_transactions__pool_size(self, mock_get_transactions):
+        run(aio.get_transactions('fake-dataset-id', count=True, pool_size=4))
+
+        mock_get_transactions.assert_called_once_with('fake-dataset-id', count=True, pool_size=4)
+
+    def test_mirrors_docstring(self):
+        self.assertEqual(aio.post_transaction.__doc__, api.post_transaction.__doc__)
+
+    @mock.patch('conduce.api.process_transactions', side_effect=lambda dataset_id, backend_id, **kwargs: backend_id)
+    def test_gather(self, mock_process_transactions):
+        backend_ids = ['fake-backend-id-{}'.format(idx) for idx in range(100)]
+
+        self.assertEqual(run(asyncio.gather(*[aio.process_transactions('fake-dataset-id', backend_id) for backend_id in backend_ids])), backend_ids)
+        self.assertEqual(mock_process_transactions.call_count, 100)
+
+    @mock.patch('conduce.api.make_get_request', side_effect=[
+        mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={}),
+        mock.Mock(json=(lambda: {'response': 'Mock'}), ok=True, status_code=200),
+    ])
+    @mock.patch('conduce.api._job_poll_delay', return_value=0)
+    def test_wait_for_job(self, mock_job_poll_delay, mock_make_get_request):
+        response = run(aio.wait_for_job('fake-job-id', arg1='arg1'))
+
+        self.assertEqual(response.json(), {'response': 'Mock'})
+        self.assertEqual(mock_make_get_request.mock_calls, [mock.call('fake-job-id', arg1='arg1', pool_size=aio.DEFAULT_CONCURRENCY)] * 2)
+
+    @mock.patch('conduce.api.make_get_request', side_effect=HTTPError(response=mock.Mock(status_code=400)))
+    def test_wait_for_job__error(self, mock_make_get_request):
+        with self.assertRaises(HTTPError):
+            run(aio.wait_for_job('fake-job-id'))
+
+    @mock.patch('conduce.api.make_get_request', return_value=mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={}))
+    def test_wait_for_jobs__times_out(self, mock_make_get_request):
+        results = []
+        jobs = aio.wait_for_jobs(['job-1', 'job-2'], timeout=0.05)
+        while True:
+            try:
+                results.append(run(jobs.__anext__()))
+            except StopAsyncIteration:
+                break
+
+        self.assertEqual(sorted(job_id for job_id, _ in results), ['job-1', 'job-2'])
+        self.assertTrue(all(isinstance(result, api.TimeoutError) for _, result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
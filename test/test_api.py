@@ -1,7 +1,14 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
 import unittest
 import mock
 
 from conduce import api
+from conduce import util
 
 from requests.exceptions import HTTPError
 import requests
@@ -30,6 +37,22 @@ class CustomHTTPException:
     msg = "Not found"
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def patch(self):
+        return mock.patch.multiple('time', time=mock.Mock(side_effect=self.time), sleep=mock.Mock(side_effect=self.sleep))
+
+
 class Test(unittest.TestCase):
     @mock.patch('conduce.api.delete_transactions', return_value=ResultMock())
     def test__clear_dataset(self, mock_delete_transactions):
@@ -170,19 +193,96 @@ class Test(unittest.TestCase):
         self.assertEqual(mock_make_get_request.mock_calls, ([mock.call(fake_job_id, **fake_kwargs)] * 4))
 
     @mock.patch('conduce.api.make_get_request',
-                return_value=mock.Mock(json=(lambda: {}), ok=True, status_code=200))
-    @mock.patch('time.sleep')
-    def test_wait_for_job__times_out(self, mock_time_sleep, mock_make_get_request):
+                return_value=mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={}))
+    def test_wait_for_job__times_out(self, mock_make_get_request):
         fake_job_id = 'fake-job-id'
         fake_kwargs = {'arg1': 'arg1', 'arg2': 'arg2'}
 
-        with self.assertRaises(api.TimeoutError):
-            api.wait_for_job(fake_job_id, **fake_kwargs)
+        clock = FakeClock()
+        with clock.patch():
+            with self.assertRaises(api.TimeoutError):
+                api.wait_for_job(fake_job_id, **fake_kwargs)
 
-        self.assertEqual(mock_make_get_request.call_count, 600)
-        self.assertEqual(mock_make_get_request.mock_calls, ([mock.call(fake_job_id, **fake_kwargs)] * 600))
-        self.assertEqual(mock_time_sleep.call_count, 600)
-        self.assertEqual(mock_time_sleep.mock_calls, ([mock.call(0.5)] * 600))
+        self.assertEqual(clock.now, 300)
+        self.assertEqual(mock_make_get_request.mock_calls, ([mock.call(fake_job_id, **fake_kwargs)] * mock_make_get_request.call_count))
+
+    @mock.patch('conduce.api.make_get_request',
+                return_value=mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={}))
+    def test_wait_for_job__timeout_kwarg(self, mock_make_get_request):
+        clock = FakeClock()
+        with clock.patch():
+            with self.assertRaises(api.TimeoutError):
+                api.wait_for_job('fake-job-id', timeout=5)
+
+        self.assertEqual(clock.now, 5)
+
+    @mock.patch('conduce.api.make_get_request',
+                side_effect=[mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={})] * 40 +
+                [mock.Mock(json=(lambda: {'response': 'Mock'}), ok=True, status_code=200)])
+    def test_wait_for_job__backoff(self, mock_make_get_request):
+        clock = FakeClock()
+        with clock.patch():
+            api.wait_for_job('fake-job-id', timeout=3600)
+
+        self.assertEqual(len(clock.sleeps), 40)
+        self.assertTrue(api.JOB_POLL_INITIAL_INTERVAL / 2 <= clock.sleeps[0] <= api.JOB_POLL_INITIAL_INTERVAL)
+        self.assertTrue(all(delay <= api.JOB_POLL_MAX_INTERVAL for delay in clock.sleeps))
+        self.assertTrue(clock.sleeps[-1] >= api.JOB_POLL_MAX_INTERVAL / 2)
+
+    @mock.patch('conduce.api.make_get_request', side_effect=[
+        mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={'Retry-After': '7'}),
+        HTTPError(response=mock.Mock(status_code=503, headers={'Retry-After': '3'})),
+        mock.Mock(json=(lambda: {'response': 'Mock'}), ok=True, status_code=200),
+    ])
+    def test_wait_for_job__retry_after(self, mock_make_get_request):
+        clock = FakeClock()
+        with clock.patch():
+            api.wait_for_job('fake-job-id')
+
+        self.assertEqual(clock.sleeps, [7.0, 3.0])
+
+    @mock.patch('conduce.api.make_get_request', side_effect=[
+        mock.Mock(json=(lambda: {'status': 'RUNNING'}), ok=True, status_code=200, headers={}),
+        mock.Mock(json=(lambda: {'response': 'Mock'}), ok=True, status_code=200),
+    ])
+    @mock.patch('time.sleep')
+    def test_wait_for_job__progress_callback(self, mock_time_sleep, mock_make_get_request):
+        mock_progress_callback = mock.Mock()
+        api.wait_for_job('fake-job-id', arg1='arg1', progress_callback=mock_progress_callback)
+
+        mock_progress_callback.assert_called_once_with('fake-job-id', {'status': 'RUNNING'}, mock.ANY)
+        self.assertEqual(mock_make_get_request.mock_calls, [mock.call('fake-job-id', arg1='arg1')] * 2)
+
+    def test_wait_for_jobs__as_completed(self):
+        job_polls = {
+            'job-1': [mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={})] * 5 + [mock.Mock(json=(lambda: {'response': 1}), ok=True)],
+            'job-2': [mock.Mock(json=(lambda: {'response': 2}), ok=True)],
+            'job-3': [HTTPError(response=mock.Mock(status_code=400))],
+        }
+
+        def make_get_request(job_id, **kwargs):
+            result = job_polls[job_id].pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        clock = FakeClock()
+        with clock.patch(), mock.patch('conduce.api.make_get_request', side_effect=make_get_request):
+            results = list(api.wait_for_jobs(['job-1', 'job-2', 'job-3']))
+
+        self.assertEqual([job_id for job_id, _ in results], ['job-2', 'job-3', 'job-1'])
+        self.assertEqual(results[0][1].json(), {'response': 2})
+        self.assertIsInstance(results[1][1], HTTPError)
+        self.assertEqual(results[2][1].json(), {'response': 1})
+
+    @mock.patch('conduce.api.make_get_request', return_value=mock.Mock(json=(lambda: {}), ok=True, status_code=200, headers={}))
+    def test_wait_for_jobs__poll_budget(self, mock_make_get_request):
+        clock = FakeClock()
+        with clock.patch():
+            for job_id, result in api.wait_for_jobs(['job-{}'.format(idx) for idx in range(20)], timeout=10, max_polls_per_second=2):
+                self.assertIsInstance(result, api.TimeoutError)
+
+        self.assertTrue(mock_make_get_request.call_count <= 2 * clock.now + 1)
 
     @mock.patch('conduce.api.make_get_request', side_effect=[
         mock.Mock(json=(lambda: {}), ok=True, status_code=200),
@@ -386,6 +486,35 @@ class Test(unittest.TestCase):
 
         mock_make_patch_request.assert_called_once_with({}, expected_fragment, parameters=expected_parameters, **fake_kwargs)
 
+    def test_process_transaction_range(self):
+        manager = mock.Mock()
+        manager.process_transactions.side_effect = lambda dataset_id, backend_id, **kwargs: mock.Mock(
+            headers={'location': 'job-{}'.format(kwargs['min'])})
+
+        with mock.patch('conduce.api.process_transactions', manager.process_transactions), mock.patch('conduce.api.wait_for_job', manager.wait_for_job):
+            windows = api.process_transaction_range('fake-dataset-id', 'fake-backend-id', 1, 25, 10, timeout=60, arg1='arg1')
+
+        self.assertEqual(windows, [(1, 10), (11, 20), (21, 25)])
+        self.assertEqual(manager.mock_calls, [
+            mock.call.process_transactions('fake-dataset-id', 'fake-backend-id', min=1, max=10, timeout=60, arg1='arg1'),
+            mock.call.process_transactions('fake-dataset-id', 'fake-backend-id', min=11, max=20, timeout=60, arg1='arg1'),
+            mock.call.wait_for_job('job-1', timeout=60, arg1='arg1'),
+            mock.call.process_transactions('fake-dataset-id', 'fake-backend-id', min=21, max=25, timeout=60, arg1='arg1'),
+            mock.call.wait_for_job('job-11', timeout=60, arg1='arg1'),
+            mock.call.wait_for_job('job-21', timeout=60, arg1='arg1'),
+        ])
+
+    @mock.patch('conduce.api.wait_for_job')
+    @mock.patch('conduce.api.process_transactions', return_value=mock.Mock(headers={'location': 'fake-location'}))
+    def test_process_transaction_range__pipeline_depth(self, mock_process_transactions, mock_wait_for_job):
+        mock_progress_callback = mock.Mock()
+        windows = api.process_transaction_range('fake-dataset-id', 'fake-backend-id', 5, 6, 10, pipeline_depth=1, progress_callback=mock_progress_callback)
+
+        self.assertEqual(windows, [(5, 6)])
+        mock_progress_callback.assert_called_once_with('fake-backend-id', 5, 6)
+        mock_process_transactions.assert_called_once_with('fake-dataset-id', 'fake-backend-id', min=5, max=6)
+        mock_wait_for_job.assert_called_once_with('fake-location')
+
     @mock.patch('conduce.api._create_dataset_backend', return_value=ResultMock())
     def test_add_simple_store(self, mock__create_dataset_backend):
         fake_kwargs = {'arg1': 'arg1', 'arg2': 'arg2'}
@@ -638,6 +767,78 @@ class Test(unittest.TestCase):
         api.get_transactions(fake_id, **fake_kwargs)
         mock_make_get_request.assert_called_once_with(expected_uri, parameters=expected_parameters, **fake_kwargs)
 
+    @mock.patch('conduce.api.get_transactions', side_effect=[
+        {'transactions': [{'id': 0}, {'id': 1}], 'page_state': 'state-1'},
+        {'transactions': [{'id': 2}, {'id': 3}], 'page_state': 'state-2'},
+        {'transactions': [{'id': 4}]},
+    ])
+    def test_iter_transactions(self, mock_get_transactions):
+        transactions = list(api.iter_transactions('fake-id', min=0, max=4, rows=2, count=True, arg1='arg1'))
+
+        self.assertEqual(transactions, [{'id': idx} for idx in range(5)])
+        self.assertEqual(mock_get_transactions.mock_calls, [
+            mock.call('fake-id', rows=2, page_state=page_state, min=0, max=4, arg1='arg1') for page_state in ('', 'state-1', 'state-2')])
+
+    @mock.patch('conduce.api.get_transactions', side_effect=[
+        [{'id': 0}, {'id': 1}],
+        [{'id': 2}, {'id': 3}],
+        [{'id': 4}],
+    ])
+    def test_iter_transactions__list_pages(self, mock_get_transactions):
+        transactions = list(api.iter_transactions('fake-id', min=0, rows=2, arg1='arg1'))
+
+        self.assertEqual(transactions, [{'id': idx} for idx in range(5)])
+        self.assertEqual(mock_get_transactions.mock_calls, [
+            mock.call('fake-id', rows=2, page_state='', min=first, arg1='arg1') for first in (0, 2, 4)])
+
+    @mock.patch('conduce.api.get_transactions', side_effect=[
+        [{'id': 3}, {'id': 4}],
+        [{'id': 5}, {'id': 6}],
+    ])
+    def test_iter_transactions__list_pages_max(self, mock_get_transactions):
+        transactions = list(api.iter_transactions('fake-id', min='3', max='6', rows='2'))
+
+        self.assertEqual(transactions, [{'id': idx} for idx in range(3, 7)])
+        self.assertEqual(mock_get_transactions.call_count, 2)
+
+    def test_iter_transactions__value(self):
+        with self.assertRaises(ValueError):
+            next(api.iter_transactions('fake-id', value=3))
+
+    @mock.patch('conduce.api.get_transactions', side_effect=[
+        {'transactions': [{'id': 0}], 'page_state': 'state-1'},
+        HTTPError(response=mock.Mock(status_code=500)),
+    ])
+    def test_iter_transactions__error(self, mock_get_transactions):
+        transactions = api.iter_transactions('fake-id', rows=1)
+
+        self.assertEqual(next(transactions), {'id': 0})
+        with self.assertRaises(HTTPError):
+            next(transactions)
+
+    @mock.patch('conduce.api.get_transactions')
+    def test_iter_transactions__prefetch(self, mock_get_transactions):
+        pages = [{'transactions': [{'id': idx}], 'page_state': 'state-{}'.format(idx + 1)} for idx in range(100)]
+        mock_get_transactions.side_effect = pages
+        transactions = api.iter_transactions('fake-id', rows=1, prefetch=3)
+
+        self.assertEqual(next(transactions), {'id': 0})
+        time.sleep(0.1)
+        # The first page, the pages in the queue and the page waiting to be queued.
+        self.assertLessEqual(mock_get_transactions.call_count, 5)
+        transactions.close()
+
+    @mock.patch('conduce.api.get_transactions', side_effect=[[{'id': 0}, {'id': 1}]])
+    def test_save_transactions(self, mock_get_transactions):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'transactions.ndjson')
+            self.assertEqual(api.save_transactions('fake-id', path), 2)
+            with open(path) as infile:
+                self.assertEqual([json.loads(line) for line in infile], [{'id': 0}, {'id': 1}])
+        finally:
+            shutil.rmtree(directory)
+
     @mock.patch('conduce.api.post_transaction', return_value=ResultMock())
     def test_append_transaction(self, mock_post_transaction):
         fake_id = 'fake id'
@@ -807,6 +1008,153 @@ class Test(unittest.TestCase):
             id=None, tag=None, mime='application/json', content=test_content, name=None, regex=None,
             type='test_resource_type', **test_kwargs)
 
+    def test_filter_resources(self):
+        resources = [
+            {'id': 'id-1', 'name': 'cities', 'type': 'DATASET', 'mime': 'application/json', 'tags': ['a', 'b']},
+            {'id': 'id-2', 'name': 'cities-2017', 'type': 'DATASET', 'mime': 'application/json', 'tags': ['a']},
+            {'id': 'id-3', 'type': 'ASSET', 'mime': 'image/png'},
+        ]
+
+        def ids(**kwargs):
+            return [resource['id'] for resource in api.filter_resources(resources, **kwargs)]
+
+        self.assertEqual(ids(), ['id-1', 'id-2', 'id-3'])
+        self.assertEqual(ids(name='cities'), ['id-1'])
+        self.assertEqual(ids(regex='cities-'), ['id-2'])
+        self.assertEqual(ids(name='cities', regex='.*2017', id='id-3'), ['id-1', 'id-2', 'id-3'])
+        self.assertEqual(ids(no_name=True), ['id-3'])
+        self.assertEqual(ids(regex=''), [])
+        self.assertEqual(ids(tags=['a']), ['id-1', 'id-2'])
+        self.assertEqual(ids(tags=['a', 'b']), ['id-1'])
+        self.assertEqual(ids(type='DATASET', mime='application/json', regex='cit'), ['id-1', 'id-2'])
+        self.assertEqual(ids(type='ASSET', name='cities'), [])
+        self.assertIsNone(api.resource_query(host='fake-host'))
+
+    @mock.patch('conduce.api.make_delete_request')
+    @mock.patch('conduce.api.find_resource')
+    def test_remove_resource__tags(self, mock_find_resource, mock_make_delete_request):
+        mock_find_resource.return_value = [{'id': 'id-1', 'name': 'a', 'tags': ['temp']}, {'id': 'id-2', 'name': 'b', 'tags': ['temp', 'x']}]
+
+        self.assertEqual(api.remove_resource(tags=['temp'], all=True, host='fake-host'), 'Removed 2 resources')
+        self.assertEqual([call[0][0] for call in mock_make_delete_request.call_args_list],
+                         ['conduce/api/v2/resources/id-1?permanent=False', 'conduce/api/v2/resources/id-2?permanent=False'])
+
+    @mock.patch('conduce.api.wait_for_jobs', return_value=[])
+    @mock.patch('conduce.api._clear_dataset')
+    @mock.patch('conduce.api.list_datasets')
+    def test_clear_dataset__regex(self, mock_list_datasets, mock_clear_dataset, mock_wait_for_jobs):
+        mock_list_datasets.return_value = [{'id': 'id-1', 'name': 'tmp-1'}, {'id': 'id-2'}, {'id': 'id-3', 'name': 'keep'}]
+
+        self.assertEqual(api.clear_dataset(regex='tmp-|.*', all=True), 'cleared 2 datasets')
+        self.assertEqual(sorted(call[0][0] for call in mock_clear_dataset.call_args_list), ['id-1', 'id-3'])
+
+    @mock.patch('conduce.api.make_delete_request')
+    def test_remove_resources(self, mock_make_delete_request):
+        error = HTTPError(response=mock.Mock(status_code=404))
+
+        def fake_delete(fragment, **kwargs):
+            self.assertEqual(kwargs['host'], 'fake-host')
+            if 'id-2' in fragment:
+                raise error
+            return fragment
+
+        mock_make_delete_request.side_effect = fake_delete
+
+        outcomes = api.remove_resources(['id-{}'.format(idx) for idx in range(20)], workers=4, max_requests_per_second=1000, host='fake-host')
+
+        self.assertEqual([resource_id for resource_id, _ in outcomes], ['id-{}'.format(idx) for idx in range(20)])
+        self.assertIs(outcomes[2][1], error)
+        self.assertEqual(outcomes[3][1], 'conduce/api/v2/resources/id-3?permanent=False')
+
+    @mock.patch('conduce.api.make_delete_request')
+    @mock.patch('conduce.api.find_resource')
+    def test_remove_resource__all_raises_after_removing(self, mock_find_resource, mock_make_delete_request):
+        mock_find_resource.return_value = [{'id': 'id-1', 'name': 'tmp'}, {'id': 'id-2', 'name': 'tmp'}]
+        mock_make_delete_request.side_effect = [HTTPError(response=mock.Mock(status_code=500)), None]
+
+        with self.assertRaises(HTTPError):
+            api.remove_resource(name='tmp', all=True, workers=1)
+        self.assertEqual(mock_make_delete_request.call_count, 2)
+
+    @mock.patch('conduce.api.wait_for_jobs')
+    @mock.patch('conduce.api._clear_dataset')
+    def test_clear_datasets(self, mock_clear_dataset, mock_wait_for_jobs):
+        error = HTTPError(response=mock.Mock(status_code=403))
+        responses = {'id-1': mock.Mock(headers={'location': 'job-1'}), 'id-2': error, 'id-3': mock.Mock(headers={})}
+
+        def fake_clear_dataset(dataset_id, **kwargs):
+            if isinstance(responses[dataset_id], Exception):
+                raise responses[dataset_id]
+            return responses[dataset_id]
+
+        mock_clear_dataset.side_effect = fake_clear_dataset
+        mock_wait_for_jobs.return_value = [('job-1', 'job-1-result')]
+
+        outcomes = api.clear_datasets(['id-1', 'id-2', 'id-3'], workers=2, timeout=10, host='fake-host')
+
+        self.assertEqual(outcomes, [('id-1', 'job-1-result'), ('id-2', error), ('id-3', responses['id-3'])])
+        mock_wait_for_jobs.assert_called_once_with(['job-1'], timeout=10, host='fake-host')
+
+    def test_rate_limiter(self):
+        clock = FakeClock()
+        with clock.patch():
+            limiter = api._RateLimiter(4.0)
+            for _ in range(5):
+                limiter.wait()
+        self.assertAlmostEqual(clock.now, 1.0)
+
+    @mock.patch('conduce.api.make_get_request')
+    @mock.patch('conduce.api.make_patch_request')
+    def test_set_tags(self, mock_make_patch_request, mock_make_get_request):
+        api.set_tags('fake-id', ['a', 'b'], host='fake-host')
+
+        mock_make_patch_request.assert_called_once_with([{'op': 'add', 'path': '/tags', 'value': ['a', 'b']}], '/api/v2/resources/fake-id', host='fake-host')
+        mock_make_get_request.assert_not_called()
+
+    @mock.patch('conduce.api.make_patch_request')
+    def test_add_tags(self, mock_make_patch_request):
+        api.add_tags('fake-id', ['a', 'b'], host='fake-host')
+
+        mock_make_patch_request.assert_called_once_with(
+            [{'op': 'add', 'path': '/tags/-', 'value': 'a'}, {'op': 'add', 'path': '/tags/-', 'value': 'b'}], '/api/v2/resources/fake-id', host='fake-host')
+
+    @mock.patch('conduce.api.make_patch_request')
+    @mock.patch('conduce.api.find_resource')
+    @mock.patch('conduce.api.get_resource', return_value={'id': 'fake-id', 'tags': ['a', 'b', 'c'], 'content': {}})
+    def test_remove_tags(self, mock_get_resource, mock_find_resource, mock_make_patch_request):
+        api.remove_tags('fake-id', ['b'], host='fake-host')
+
+        mock_get_resource.assert_called_once_with('fake-id', host='fake-host')
+        mock_find_resource.assert_not_called()
+        mock_make_patch_request.assert_called_once_with(
+            [{'op': 'add', 'path': '/tags', 'value': ['a', 'c']}], '/api/v2/resources/fake-id', host='fake-host')
+
+    @mock.patch('conduce.api.make_patch_request')
+    @mock.patch('conduce.api.get_resource')
+    def test_remove_tags__resource(self, mock_get_resource, mock_make_patch_request):
+        api.remove_tags('fake-id', ['a'], resource={'id': 'fake-id', 'tags': ['a', 'b']}, host='fake-host')
+
+        mock_get_resource.assert_not_called()
+        mock_make_patch_request.assert_called_once_with(
+            [{'op': 'add', 'path': '/tags', 'value': ['b']}], '/api/v2/resources/fake-id', host='fake-host')
+
+    @mock.patch('conduce.api.make_patch_request')
+    def test_edit_tags(self, mock_make_patch_request):
+        error = HTTPError(response=mock.Mock(status_code=403))
+
+        def fake_patch(operations, fragment, **kwargs):
+            if fragment.endswith('id-2'):
+                raise error
+            return operations[0]['value']
+
+        mock_make_patch_request.side_effect = fake_patch
+        resources = [{'id': 'id-1', 'tags': ['a', 'old']}, {'id': 'id-2', 'tags': []}, {'id': 'id-3'}]
+
+        outcomes = api.edit_tags(resources, add=['a', 'new', 'new'], remove=['old'], workers=2, host='fake-host')
+
+        self.assertEqual(outcomes, [('id-1', ['a', 'new']), ('id-2', error), ('id-3', ['a', 'new'])])
+        self.assertEqual(api.edit_tags(resources[:1], set=['x', 'old'], remove=['old']), [('id-1', ['x'])])
+
     @mock.patch('conduce.api.make_get_request', return_value=ResultMock())
     def test_list_api_keys(self, mock_make_get_request):
         test_kwargs = {'kwarg1': "arg1_value"}
@@ -1179,6 +1527,148 @@ class Test(unittest.TestCase):
         mock_request_func.assert_called_once_with('https://fake-host/{}'.format(test_uri),
                                                   json=test_payload, cookies='fake-auth', headers={}, params=None, verify=True)
 
+    @mock.patch('conduce.connection.get_client')
+    @mock.patch('conduce.session.api_key_header', return_value={'Authorization': 'Bearer fake-api-key'})
+    def test__make_request___pooled_client(self, mock_api_key_header, mock_get_client):
+        test_uri = '/fake-uri'
+        api._make_request(requests.get, None, test_uri, api_key='fake-api-key', host='fake-host', pool_size=4)
+        mock_get_client.assert_called_once_with('fake-host', 'fake-api-key', 4)
+        mock_get_client.return_value.method.assert_called_once_with('get')
+        mock_get_client.return_value.method.return_value.assert_called_once_with(
+            'https://fake-host/{}'.format(test_uri), json=None, headers={'Authorization': 'Bearer fake-api-key'}, params=None, verify=True)
+
+    @mock.patch('conduce.session.invalidate_session')
+    @mock.patch('conduce.session.get_session', return_value='fake-auth')
+    def test__make_request___401_invalidates_session(self, mock_get_session, mock_invalidate_session):
+        mock_request_func = mock.MagicMock(return_value=mock.Mock(
+            status_code=401, raise_for_status=mock.Mock(side_effect=HTTPError(response=mock.Mock(status_code=401)))))
+        with self.assertRaises(HTTPError):
+            api._make_request(mock_request_func, None, '/fake-uri', user='fake-user', host='fake-host')
+        mock_invalidate_session.assert_called_once_with('fake-host', 'fake-user')
+
+    @mock.patch('conduce.connection.get_client')
+    @mock.patch('conduce.session.api_key_header', return_value={'Authorization': 'Bearer fake-api-key'})
+    def test__make_request___json_body(self, mock_api_key_header, mock_get_client):
+        api._make_request(requests.post, api.JSONBody(b'{"fake":1}'), '/fake-uri', api_key='fake-api-key', host='fake-host')
+        mock_get_client.return_value.method.return_value.assert_called_once_with(
+            'https://fake-host//fake-uri', data=b'{"fake":1}', headers={'Authorization': 'Bearer fake-api-key', 'Content-Type': 'application/json'},
+            params=None, verify=True)
+        self.assertEqual(mock_api_key_header.return_value, {'Authorization': 'Bearer fake-api-key'})
+
+    @mock.patch('conduce.connection.get_client')
+    @mock.patch('conduce.session.api_key_header', return_value={'Authorization': 'Bearer fake-api-key'})
+    def test__make_request___compress(self, mock_api_key_header, mock_get_client):
+        payload = {'entities': ['fake entity {}'.format(idx) for idx in range(1000)]}
+        api._make_request(requests.post, payload, '/fake-uri', api_key='fake-api-key', host='fake-host', compress=True)
+
+        _, kwargs = mock_get_client.return_value.method.return_value.call_args
+        self.assertEqual(kwargs['headers'], {
+            'Authorization': 'Bearer fake-api-key', 'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        self.assertEqual(json.loads(zlib.decompress(kwargs['data'], 31).decode('utf-8')), payload)
+        self.assertLess(len(kwargs['data']), len(json.dumps(payload)))
+        self.assertEqual(mock_api_key_header.return_value, {'Authorization': 'Bearer fake-api-key'})
+
+    @mock.patch('conduce.connection.get_client')
+    @mock.patch('conduce.session.api_key_header', return_value={'Authorization': 'Bearer fake-api-key'})
+    def test__make_request___compress_below_threshold(self, mock_api_key_header, mock_get_client):
+        api._make_request(requests.post, {'fake': 1}, '/fake-uri', api_key='fake-api-key', host='fake-host', compress=True)
+
+        mock_get_client.return_value.method.return_value.assert_called_once_with(
+            'https://fake-host//fake-uri', data=b'{"fake":1}', headers={'Authorization': 'Bearer fake-api-key', 'Content-Type': 'application/json'},
+            params=None, verify=True)
+
+    @mock.patch('conduce.connection.get_client')
+    @mock.patch('conduce.session.api_key_header', return_value={'Authorization': 'Bearer fake-api-key'})
+    def test__make_request___stream(self, mock_api_key_header, mock_get_client):
+        api._make_request(requests.get, None, '/fake-uri', api_key='fake-api-key', host='fake-host', stream=True)
+        mock_get_client.return_value.method.return_value.assert_called_once_with(
+            'https://fake-host//fake-uri', json=None, stream=True, headers={'Authorization': 'Bearer fake-api-key'}, params=None, verify=True)
+
+    @mock.patch('conduce.api.GZIP_BLOCK_BYTES', 100)
+    @mock.patch('conduce.api.ENCODE_SLICE_ITEMS', 7)
+    def test__encode_body__slices(self):
+        payload = {'data': {'entities': [{'identity': str(idx)} for idx in range(100)], 'empty': []}, 'op': 'INSERT'}
+        self.assertTrue(len(list(api._json_chunks(payload))) > 100 // 7)
+
+        blocks = list(api._blocks(api._json_chunks(payload), 100))
+        self.assertTrue(all(len(block) >= 100 for block in blocks[:-1]))
+        self.assertEqual(b''.join(blocks), util.dumps_bytes(payload))
+
+        data, content_encoding = api._encode_body(payload, min_bytes=10)
+        data = zlib.decompress(data, 31)
+        self.assertEqual(content_encoding, 'gzip')
+        self.assertEqual(json.loads(data.decode('utf-8')), payload)
+        self.assertEqual(data, util.dumps_bytes(payload))
+
+        self.assertEqual(api._encode_body(payload, min_bytes=len(data) + 1), (data, None))
+
+    def test__encode_body__json_body(self):
+        entities = list(util.serialize_entities([{'identity': str(idx)} for idx in range(100)]))
+        body = api._transaction_body(entities, 'INSERT')
+
+        data, content_encoding = api._encode_body(body, min_bytes=100)
+        self.assertEqual(content_encoding, 'gzip')
+        self.assertEqual(zlib.decompress(data, 31), body.data)
+
+        self.assertEqual(api._encode_body(body, min_bytes=len(body.data) + 1), (body.data, None))
+
+    @mock.patch('conduce.api.make_post_request', return_value=ResultMock_201())
+    def test_post_transaction__serialize(self, mock_make_post_request):
+        entities = [{'identity': 'a'}, {'identity': 'b', 'attrs': []}]
+        api.post_transaction('fake_id', {'entities': list(util.serialize_entities(entities))}, serialize=True, arg1='arg1')
+
+        payload = mock_make_post_request.call_args[0][0]
+        self.assertIsInstance(payload, api.JSONBody)
+        self.assertEqual(json.loads(payload.data.decode('utf-8')), {'data': {'entities': entities}, 'op': 'INSERT'})
+        mock_make_post_request.assert_called_once_with(payload, '/api/v2/data/fake_id/transactions?process=False', serialize=True, arg1='arg1')
+
+    @mock.patch('conduce.api.make_post_request', return_value=ResultMock_201())
+    def test_post_transaction__chunk_size(self, mock_make_post_request):
+        fake_id = 'fake_id'
+        fake_entities = ['fake entity {}'.format(idx) for idx in range(5)]
+        fake_kwargs = {'arg1': 'arg1', 'chunk_size': 2, 'workers': 2}
+        result = api.post_transaction(fake_id, {'entities': fake_entities}, **fake_kwargs)
+
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(result['entities'], 5)
+        self.assertEqual(result['failures'], [])
+        self.assertNotIn('responses', result)
+
+        expected_uri = '/api/v2/data/fake_id/transactions?process=False'
+        expected_calls = []
+        for chunk in [fake_entities[0:2], fake_entities[2:4], fake_entities[4:]]:
+            expected_payload = {
+                'data': {'entities': chunk},
+                'op': 'INSERT'
+            }
+            expected_calls.append(mock.call(expected_payload, expected_uri, arg1='arg1', pool_size=10))
+        mock_make_post_request.assert_has_calls(expected_calls, any_order=True)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=[
+        ResultMock_201(),
+        HTTPError(response=mock.Mock(status_code=500)),
+        ResultMock_201(),
+        HTTPError(response=mock.Mock(status_code=400)),
+    ])
+    def test_post_transaction__chunk_retries(self, mock_make_post_request):
+        fake_entities = ['fake entity {}'.format(idx) for idx in range(3)]
+        result = api.post_transaction('fake_id', {'entities': fake_entities}, chunk_size=1, workers=1, operation='APPEND')
+
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(len(result['failures']), 1)
+        self.assertEqual(result['failures'][0]['chunk'], 2)
+        self.assertEqual(result['failures'][0]['attempts'], 1)
+        self.assertEqual(mock_make_post_request.call_count, 4)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=HTTPError(response=mock.Mock(status_code=400)))
+    def test_post_transaction__append_stops_at_failure(self, mock_make_post_request):
+        fake_entities = ['fake entity {}'.format(idx) for idx in range(3)]
+        result = api.post_transaction('fake_id', {'entities': fake_entities}, chunk_size=1, operation='APPEND')
+
+        self.assertEqual(result['chunks'], 1)
+        self.assertEqual(len(result['failures']), 1)
+        mock_make_post_request.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
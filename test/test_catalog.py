@@ -0,0 +1,142 @@
+import json
+import unittest
+import mock
+
+from conduce import api
+from conduce import catalog
+
+RESOURCES = [
+    {'id': 'dataset-1', 'name': 'cities', 'type': 'DATASET', 'mime': 'application/json', 'tags': ['a', 'b'], 'revision': 1},
+    {'id': 'dataset-2', 'name': 'cities-2017', 'type': 'DATASET', 'mime': 'application/json', 'tags': ['a'], 'revision': 1},
+    {'id': 'dataset-3', 'type': 'DATASET', 'mime': 'application/json', 'tags': [], 'revision': 1},
+    {'id': 'asset-1', 'name': 'cities', 'type': 'ASSET', 'mime': 'image/png', 'tags': ['b'], 'revision': 1},
+]
+
+
+def search_response(resources):
+    return mock.Mock(content=json.dumps({'resources': resources}))
+
+
+def fake_search(payload, uri, **kwargs):
+    resources = [resource for resource in RESOURCES if payload.get('type') in (None, resource['type']) and payload.get('name') in (None, resource.get('name'))]
+    if uri.endswith('?content=id'):
+        return mock.Mock(content=json.dumps({'resource_ids': [resource['id'] for resource in resources]}))
+    return search_response(resources)
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        catalog.clear_catalogs()
+
+    def tearDown(self):
+        catalog.clear_catalogs()
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_find_resource(self, mock_make_post_request):
+        def ids(**kwargs):
+            return api.find_resource(catalog=True, host='fake-host', **kwargs)
+
+        self.assertEqual(ids(content='id'), ['dataset-1', 'dataset-2', 'dataset-3', 'asset-1'])
+        self.assertEqual(ids(name='cities', content='id'), ['dataset-1', 'asset-1'])
+        self.assertEqual(ids(type='DATASET', name='cities', content='id'), ['dataset-1'])
+        self.assertEqual(ids(type='DATASET', regex='cit.*-', content='id'), ['dataset-2'])
+        self.assertEqual(ids(regex='(?i)CITIES$', content='id'), ['dataset-1', 'asset-1'])
+        self.assertEqual(ids(type='DATASET', no_name=True, content='id'), ['dataset-3'])
+        self.assertEqual(ids(id='asset-1', content='id'), ['asset-1'])
+        self.assertEqual(ids(tags=['a', 'b'], content='id'), ['dataset-1'])
+        self.assertEqual(ids(mime='image/png', content='id'), ['asset-1'])
+        self.assertEqual(ids(prefix='cities-', content='id'), ['dataset-2'])
+        self.assertEqual(ids(name='missing', content='id'), [])
+        self.assertEqual(ids(type='DATASET', name='cities')[0]['tags'], ['a', 'b'])
+
+        self.assertEqual(mock_make_post_request.call_count, 1)
+        self.assertEqual(mock_make_post_request.call_args[0], ({}, 'conduce/api/v2/resources/searches'))
+        self.assertEqual(mock_make_post_request.call_args[1]['host'], 'fake-host')
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_find_resource__matches_search(self, mock_make_post_request):
+        queries = [{'name': 'cities'}, {'regex': 'c'}, {'no_name': True}, {'id': 'dataset-2'}, {'regex': 'x|cities-'}, {'name': 'cities', 'regex': 'x'}]
+        for query in queries:
+            self.assertEqual(api.find_dataset(catalog=True, **query), api.find_dataset(**query), query)
+            self.assertEqual(api.find_dataset(catalog=True, content='id', **query), api.find_dataset(content='id', **query), query)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_find_resource__ttl(self, mock_make_post_request):
+        with mock.patch('conduce.catalog.time.time', return_value=1000.0):
+            api.find_dataset(name='cities', catalog=True)
+            api.find_dataset(name='cities-2017', catalog=True)
+        self.assertEqual(mock_make_post_request.call_count, 1)
+
+        with mock.patch('conduce.catalog.time.time', return_value=1000.0 + catalog.CATALOG_TTL):
+            api.find_dataset(name='cities', catalog=True)
+        self.assertEqual(mock_make_post_request.call_count, 2)
+
+        api.find_dataset(name='cities', catalog=True, refresh=True)
+        self.assertEqual(mock_make_post_request.call_count, 3)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_find_resource__content_bypasses_catalog(self, mock_make_post_request):
+        api.find_dataset(catalog=True, content='full')
+        api.find_dataset(catalog=True, content='full')
+        self.assertEqual(mock_make_post_request.call_count, 2)
+
+    @mock.patch('conduce.api.make_delete_request')
+    @mock.patch('conduce.api.make_put_request')
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_changes_update_catalog(self, mock_make_post_request, mock_make_put_request, mock_make_delete_request):
+        api.find_dataset(catalog=True)
+
+        mock_make_put_request.return_value = search_response(None)
+        mock_make_put_request.return_value.content = json.dumps(dict(RESOURCES[0], name='towns', revision=2, content='{}'))
+        api.update_resource(dict(RESOURCES[0], name='towns'))
+        api._remove_resource('dataset-2')
+
+        mock_make_post_request.side_effect = None
+        mock_make_post_request.return_value.content = json.dumps({'id': 'dataset-4', 'name': 'new', 'type': 'DATASET', 'revision': 0})
+        api.create_json_resource('DATASET', 'new', {})
+
+        datasets = api.find_dataset(catalog=True)
+        self.assertEqual([d['id'] for d in datasets], ['dataset-1', 'dataset-3', 'dataset-4'])
+        self.assertEqual(datasets[0]['name'], 'towns')
+        self.assertNotIn('content', datasets[0])
+        self.assertEqual(api.find_dataset(catalog=True, name='cities'), [])
+        self.assertEqual(mock_make_post_request.call_count, 2)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_refresh_keeps_newer_revision(self, mock_make_post_request):
+        api.find_dataset(catalog=True)
+        catalog.resource_changed(dict(RESOURCES[0], name='towns', revision=2))
+
+        # The search index has not caught up with the update yet.
+        self.assertEqual(api.find_dataset(catalog=True, refresh=True, content='id', name='towns'), ['dataset-1'])
+
+    @mock.patch('conduce.api.make_patch_request')
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_patch_expires_listing(self, mock_make_post_request, mock_make_patch_request):
+        api.find_dataset(catalog=True)
+        api.find_dataset(catalog=True)
+        api.set_tags('dataset-1', ['c'])
+        api.find_dataset(catalog=True)
+
+        self.assertEqual(mock_make_post_request.call_count, 2)
+
+    @mock.patch('conduce.api.make_post_request', side_effect=fake_search)
+    def test_catalogs_per_user(self, mock_make_post_request):
+        api.find_dataset(catalog=True, api_key='key-1')
+        api.find_dataset(catalog=True, api_key='key-2')
+        self.assertEqual(mock_make_post_request.call_count, 2)
+
+        catalog.resource_changed({'id': 'dataset-4', 'name': 'private', 'type': 'DATASET'}, api_key='key-1')
+        self.assertEqual(len(api.find_dataset(catalog=True, api_key='key-1', name='private')), 1)
+        self.assertEqual(api.find_dataset(catalog=True, api_key='key-2', name='private'), [])
+
+    def test_literal_prefix(self):
+        self.assertEqual(catalog._literal_prefix('cities-20'), 'cities-20')
+        self.assertEqual(catalog._literal_prefix('cities.*'), 'cities')
+        self.assertEqual(catalog._literal_prefix('citiesx?'), 'cities')
+        self.assertEqual(catalog._literal_prefix('a|b'), '')
+        self.assertEqual(catalog._literal_prefix('(?i)a'), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import unittest
 import mock
 
@@ -299,7 +300,7 @@ class Test(unittest.TestCase):
         mock_api_wait_for_job.assert_has_calls(expected_waits)
         mock_api_list_dataset_backends.assert_called_once_with(fake_dataset_id, **vars(fake_passed_args))
 
-    @mock.patch('conduce.api.wait_for_job')
+    @mock.patch('conduce.api.wait_for_jobs', return_value=iter([]))
     @mock.patch('conduce.api.get_transactions', return_value={'count': 48})
     @mock.patch('conduce.api.get_dataset_backend_metadata', return_value={'transactions': 43})
     @mock.patch('conduce.api.process_transactions', return_value=MockResponse())
@@ -308,7 +309,7 @@ class Test(unittest.TestCase):
         mock_api_process_transactions,
         mock_api_get_dataset_backend_metadata,
             mock_api_get_transactions,
-            mock_api_wait_for_job,
+            mock_api_wait_for_jobs,
     ):
         fake_dataset_id = 'fake-dataset-id'
         fake_backend_ids = ['fake-backend-id-1', 'fake-backend-id-2', 'fake-backend-id-3']
@@ -328,12 +329,10 @@ class Test(unittest.TestCase):
         cli.process_transactions(fake_args)
 
         expected_calls = []
-        expected_waits = []
         for idx, id in enumerate(fake_backend_ids):
             expected_calls.append(mock.call(fake_dataset_id, fake_backend_ids[idx], transaction='fake-tx-id', **vars(fake_passed_args)))
-            expected_waits.append(mock.call('fake location', timeout=10, **vars(fake_passed_args)))
         mock_api_process_transactions.assert_has_calls(expected_calls)
-        mock_api_wait_for_job.assert_has_calls(expected_waits)
+        mock_api_wait_for_jobs.assert_called_once_with(['fake location'] * 3, timeout=10, **vars(fake_passed_args))
 
     @mock.patch('conduce.api.wait_for_job')
     @mock.patch('conduce.api.get_transactions', return_value={'count': 48})
@@ -800,6 +799,129 @@ class Test(unittest.TestCase):
             not fake_manual_processing,
             **vars(fake_passed_args))
 
+    @mock.patch('conduce.api.process_transaction_range')
+    @mock.patch('conduce.api.get_transactions', return_value={'count': 48})
+    @mock.patch('conduce.api.get_dataset_backend_metadata', return_value={'transactions': 43})
+    def test_process_transactions__window(
+            self,
+            mock_api_get_dataset_backend_metadata,
+            mock_api_get_transactions,
+            mock_api_process_transaction_range,
+    ):
+        fake_dataset_id = 'fake-dataset-id'
+        fake_backend_ids = ['fake-backend-id-1', 'fake-backend-id-2', 'fake-backend-id-3']
+        fake_passed_args = FakeArgs(host='fake-host', user='fake-user')
+        fake_args = FakeArgs(all=False, min=None, max=None, dataset_id=fake_dataset_id, backend_ids=fake_backend_ids, transaction=None,
+                             async_processing=False, all_backends=False, timeout=10, window=100, pipeline_depth=3, **vars(fake_passed_args))
+
+        cli.process_transactions(fake_args)
+
+        self.assertEqual(mock_api_process_transaction_range.call_count, 3)
+        for backend_id in fake_backend_ids:
+            mock_api_process_transaction_range.assert_any_call(fake_dataset_id, backend_id, 44, 47, 100, pipeline_depth=3,
+                                                               progress_callback=mock.ANY, timeout=10, **vars(fake_passed_args))
+
+    @mock.patch('conduce.api.make_get_request')
+    def test_dump_data(self, mock_api_make_get_request):
+        fake_args = FakeArgs(dataset_id='fake-dataset-id', x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10,
+                             format=None, output=None, host='fake-host')
+
+        self.assertEqual(cli.dump_data(fake_args), mock_api_make_get_request.return_value)
+        mock_api_make_get_request.assert_called_once_with(
+            'datasets/raw-lens/fake-dataset-id/-180/180/-90/90/-1/1/0/10', dataset_id='fake-dataset-id',
+            x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10, host='fake-host')
+
+    @mock.patch('conduce.export.export_entities', return_value=2)
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_dump_data__output(self, mock_export_iter_raw_entities, mock_export_export_entities):
+        fake_args = FakeArgs(dataset_id='fake-dataset-id', x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10,
+                             format=None, output='fake-output.csv', host='fake-host')
+
+        self.assertIsNone(cli.dump_data(fake_args))
+        mock_export_iter_raw_entities.assert_called_once_with(
+            'fake-dataset-id', x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10, host='fake-host')
+        mock_export_export_entities.assert_called_once_with(mock_export_iter_raw_entities.return_value, 'fake-output.csv', 'csv')
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    @mock.patch('conduce.export.export_entities')
+    def test_main__dump_data_unknown_extension(self, mock_export_export_entities, mock_stdout, mock_stderr):
+        with mock.patch('sys.argv', ['conduce.py', 'dump-data', 'fake-dataset-id', '--output', 'fake-output.json']):
+            with self.assertRaises(SystemExit) as raised:
+                cli.main()
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn('--format', ''.join(call[0][0] for call in mock_stderr.write.call_args_list))
+        mock_export_export_entities.assert_not_called()
+
+    @mock.patch('conduce.export.export_tiles', return_value=2)
+    def test_dump_data__tiled(self, mock_export_export_tiles):
+        fake_args = FakeArgs(dataset_id='fake-dataset-id', x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10,
+                             format=None, output=None, tiled=True, tile_degrees=10.0, workers=4, host='fake-host')
+
+        self.assertIsNone(cli.dump_data(fake_args))
+        mock_export_export_tiles.assert_called_once_with(
+            'fake-dataset-id', None, 'ndjson', x_min=-180, x_max=180, y_min=-90, y_max=90, z_min=-1, z_max=1, t_min=0, t_max=10,
+            tile_degrees=10.0, workers=4, host='fake-host')
+
+    @mock.patch('conduce.api.edit_tags', return_value=[('fake-id', None)])
+    @mock.patch('conduce.api.find_resource', return_value=[{'id': 'fake-id', 'tags': ['a']}])
+    def test_tag_resource__remove(self, mock_api_find_resource, mock_api_edit_tags):
+        fake_args = FakeArgs(tags=['a'], set=False, remove=True, type=None, name='fake-name', workers=4, host='fake-host', user=None, api_key=None)
+
+        cli.tag_resource(fake_args)
+
+        mock_api_find_resource.assert_called_once_with(type=None, name='fake-name', workers=4, host='fake-host', user=None, api_key=None)
+        mock_api_edit_tags.assert_called_once_with(mock_api_find_resource.return_value, host='fake-host', user=None, api_key=None, workers=4, remove=['a'])
+
+    @mock.patch('sys.stdout')
+    @mock.patch('conduce.cli.insert_transaction')
+    def test_main__chunk_failures_exit_nonzero(self, mock_insert_transaction, mock_stdout):
+        mock_insert_transaction.return_value = {
+            'chunks': 2, 'entities': 4, 'skipped': 0, 'failures': [{'chunk': 1, 'entities': 2, 'attempts': 4, 'error': ValueError('fake')}]}
+
+        with mock.patch('sys.argv', ['conduce.py', 'dataset', 'insert', 'fake-id', '--chunk-size', '2']):
+            with self.assertRaises(SystemExit) as raised:
+                cli.main()
+        self.assertEqual(raised.exception.code, 1)
+
+    @mock.patch('sys.stdout')
+    @mock.patch('conduce.api.make_post_request')
+    def test_main__ingest_raw_serialize(self, mock_make_post_request, mock_stdout):
+        entities = [{'identity': 'fake-id', 'kind': 'fake-kind'}]
+        mock_make_post_request.return_value = mock.Mock(status_code=200, headers={})
+
+        argv = ['conduce.py', 'ingest-data', 'fake-dataset-id', '--raw', 'fake-entities.json', '--serialize', '--host', 'fake-host', '--api-key', 'fake-key']
+        with mock.patch('sys.argv', argv):
+            with mock.patch('conduce.cli.open', mock.mock_open(read_data=json.dumps({'entities': entities})), create=True):
+                cli.main()
+
+        payload, uri = mock_make_post_request.call_args[0]
+        self.assertEqual(uri, '/api/v2/data/fake-dataset-id/transactions?process=True')
+        self.assertEqual(json.loads(payload.data.decode('utf-8')), {'data': {'entities': entities}, 'op': 'ADD'})
+
+    @mock.patch('conduce.cli.print_response')
+    @mock.patch('conduce.api.get_transactions', side_effect=[[{'id': 0}, {'id': 1}], [{'id': 2}]])
+    def test_main__dataset_transactions_all(self, mock_get_transactions, mock_print_response):
+        with mock.patch('sys.argv', ['conduce.py', 'dataset', 'transactions', 'fake-id', '--all', '--min', '0', '--rows', '2']):
+            cli.main()
+
+        mock_print_response.assert_called_once_with([{'id': 0}, {'id': 1}, {'id': 2}])
+        self.assertEqual([(call[1]['min'], call[1]['rows']) for call in mock_get_transactions.call_args_list], [(0, 2), (2, 2)])
+
+    @mock.patch('sys.stderr')
+    @mock.patch('sys.stdout')
+    @mock.patch('conduce.api.get_transactions')
+    def test_main__dataset_transactions_value_all(self, mock_get_transactions, mock_stdout, mock_stderr):
+        with mock.patch('sys.argv', ['conduce.py', 'dataset', 'transactions', 'fake-id', '--all', '--value', '3']):
+            with self.assertRaises(SystemExit) as raised:
+                cli.main()
+        self.assertEqual(raised.exception.code, 2)
+        mock_get_transactions.assert_not_called()
+
+    def test_chunked_summary(self):
+        summary = cli.chunked_summary({'chunks': 1, 'entities': 1, 'skipped': 0, 'failures': [{'chunk': 0, 'error': ValueError('fake')}]})
+        self.assertEqual(json.loads(json.dumps(summary))['failures'], [{'chunk': 0, 'error': 'fake'}])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from conduce import config
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.config_file_path = os.path.join(self.config_dir, '.conduceconfig')
+        with open(self.config_file_path, 'w') as config_file:
+            config_file.write('default-host: fake-host\n')
+        config.clear_config_cache()
+
+    def tearDown(self):
+        config.clear_config_cache()
+        shutil.rmtree(self.config_dir)
+
+    def test_open_config__cached(self):
+        with mock.patch('conduce.config.config_file_path', self.config_file_path):
+            with mock.patch('yaml.load', return_value={'default-host': 'fake-host'}) as mock_yaml_load:
+                self.assertEqual(config.open_config(), {'default-host': 'fake-host'})
+                self.assertEqual(config.open_config(), {'default-host': 'fake-host'})
+                mock_yaml_load.assert_called_once()
+
+    def test_open_config__returns_copy(self):
+        with mock.patch('conduce.config.config_file_path', self.config_file_path):
+            config.open_config()['default-host'] = 'modified-host'
+            self.assertEqual(config.open_config()['default-host'], 'fake-host')
+
+    def test_save_config__invalidates_cache(self):
+        with mock.patch('conduce.config.config_file_path', self.config_file_path):
+            config.open_config()
+            config.save_config({'default-host': 'saved-host'})
+            self.assertEqual(config.open_config()['default-host'], 'saved-host')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import mock
+import requests
+
+from conduce import connection
+
+
+class Test(unittest.TestCase):
+    def tearDown(self):
+        connection.close_clients()
+
+    def test_get_client__reused_per_host_and_credential(self):
+        client = connection.get_client('fake-host', 'fake-api-key')
+        self.assertIs(connection.get_client('fake-host', 'fake-api-key'), client)
+        self.assertIsNot(connection.get_client('fake-host', 'other-api-key'), client)
+        self.assertIsNot(connection.get_client('other-host', 'fake-api-key'), client)
+
+    def test_get_client__pool_size(self):
+        client = connection.get_client('fake-host', 'fake-api-key', pool_size=32)
+        self.assertEqual(client.pool_size, 32)
+        self.assertEqual(client.session.get_adapter('https://fake-host/').poolmanager.connection_pool_kw['maxsize'], 32)
+
+    def test_get_client__default_pool_size(self):
+        client = connection.get_client('fake-host', 'fake-api-key')
+        self.assertEqual(client.pool_size, connection.DEFAULT_POOL_SIZE)
+
+    def test_pooled_request_func(self):
+        client = connection.get_client('fake-host', 'fake-api-key')
+        for name in connection.HTTP_METHODS:
+            self.assertEqual(connection.pooled_request_func(getattr(requests, name), client), getattr(client.session, name))
+
+    def test_pooled_request_func__custom_callable(self):
+        client = connection.get_client('fake-host', 'fake-api-key')
+        fake_request_func = mock.MagicMock()
+        self.assertIs(connection.pooled_request_func(fake_request_func, client), fake_request_func)
+
+    def test_close_clients(self):
+        client = connection.get_client('fake-host', 'fake-api-key')
+        with mock.patch.object(client, 'close') as mock_close:
+            connection.close_clients()
+            mock_close.assert_called_once_with()
+        self.assertIsNot(connection.get_client('fake-host', 'fake-api-key'), client)
+
+
+if __name__ == '__main__':
+    unittest.main()
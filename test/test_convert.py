@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from conduce import convert
+from conduce import util
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with io.open(path, 'w', newline='') as outfile:
+            outfile.write(content)
+        return path
+
+    def test_shard_file(self):
+        path = self.write('rows.csv', u'header\n' + u''.join(u'row {}\n'.format(idx) for idx in range(100)))
+
+        shards = convert.shard_file(path, 50, start=7)
+
+        self.assertEqual(shards[0][0], 7)
+        self.assertEqual(shards[-1][1], os.path.getsize(path))
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        for start, end in shards:
+            self.assertEqual(data[end - 1:end], b'\n')
+        self.assertEqual([(start, end) for (_, start), (end, _) in zip(shards, shards[1:])], [(start, start) for _, start in shards[:-1]])
+
+    def test_convert_file__csv(self):
+        rows = [u'{},2019-03-04T10:11:{:02d}Z,{},{},name {},"{}"'.format(idx, idx % 60, idx % 90, idx % 45, idx, idx * 0.5) for idx in range(500)]
+        path = self.write('rows.csv', u'id,time,lon,lat,name,value\r\n' + u'\r\n'.join(rows) + u'\r\n')
+
+        entities = list(convert.convert_file(path, processes=2, shard_bytes=1000, answer_yes=True))
+
+        self.assertEqual(entities, list(util.stream_csv_entities(path, answer_yes=True)))
+        self.assertEqual(len(entities), 500)
+
+    def test_convert_file__ndjson_serialize(self):
+        rows = [{'id': str(idx), 'time': idx * 1000, 'x': idx % 90, 'y': idx % 45, 'value': 'fake'} for idx in range(200)]
+        path = self.write('rows.ndjson', u''.join(u'{}\n'.format(json.dumps(row)) for row in rows))
+
+        entities = list(convert.convert_file(path, processes=2, shard_bytes=500, serialize=True, answer_yes=True))
+
+        self.assertEqual([json.loads(entity.decode('utf-8')) for entity in entities], util.dict_to_entities(rows, answer_yes=True)['entities'])
+
+    def test_convert_file__empty(self):
+        path = self.write('rows.csv', u'id,time,x,y\n')
+        self.assertEqual(list(convert.convert_file(path, processes=1, answer_yes=True)), [])
+
+    @mock.patch('conduce.convert.multiprocessing.Pool')
+    def test_convert_tasks__bounded(self, mock_pool):
+        submitted = []
+
+        def apply_async(func, args):
+            submitted.append(args[0])
+            return mock.Mock(**{'get.return_value': func(*args)})
+
+        mock_pool.return_value.apply_async.side_effect = apply_async
+
+        entities = convert._convert_tasks(lambda task: [task] * 3, iter(range(100)), 2)
+        self.assertEqual(next(entities), 0)
+        self.assertEqual(len(submitted), 2 * convert.SHARDS_PER_PROCESS)
+        self.assertEqual(list(entities), [0, 0] + [task for task in range(1, 100) for _ in range(3)])
+        self.assertEqual(submitted, list(range(100)))
+        mock_pool.return_value.close.assert_called_once_with()
+
+    def test_file_format(self):
+        self.assertEqual(convert.file_format('rows.csv'), 'csv')
+        self.assertEqual(convert.file_format('rows.jsonl'), 'ndjson')
+        self.assertEqual(convert.file_format('rows.txt', file_format='csv'), 'csv')
+        with self.assertRaises(ValueError):
+            convert.file_format('rows.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
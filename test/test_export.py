@@ -0,0 +1,269 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from conduce import export
+
+ENTITIES = [
+    {
+        'identity': 'entity-{}'.format(idx),
+        'kind': 'fake-kind',
+        'timestamp_ms': 1000 * idx,
+        'endtime_ms': 1000 * idx,
+        'path': [{'x': idx, 'y': -idx, 'z': 0}],
+        'attrs': [{'key': 'count', 'type': 'INT64', 'int64_value': idx}, {'key': 'name', 'type': 'STRING', 'str_value': 'fake-name'}],
+    } for idx in range(10)
+]
+
+
+def split(text, size):
+    return [text[idx:idx + size] for idx in range(0, len(text), size)]
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_iter_json_array__object(self):
+        document = json.dumps({'count': 10, 'entities': ENTITIES, 'more': [1]}).encode('utf-8')
+        for size in (1, 7, 4096):
+            self.assertEqual(list(export.iter_json_array(split(document, size))), ENTITIES)
+
+    def test_iter_json_array__array(self):
+        document = u'[1, 23456, "a\u00e4", {"b": [2]}, null]'.encode('utf-8')
+        self.assertEqual(list(export.iter_json_array(split(document, 1))), [1, 23456, u'a\xe4', {'b': [2]}, None])
+
+    def test_iter_json_array__empty(self):
+        self.assertEqual(list(export.iter_json_array([b'[ ]'])), [])
+        self.assertEqual(list(export.iter_json_array([b'{"other": 1}'])), [])
+        self.assertEqual(list(export.iter_json_array([])), [])
+
+    def test_iter_json_array__lazy(self):
+        def chunks():
+            yield b'{"entities": [{"a": 1}, '
+            raise AssertionError('Read past the first entity')
+
+        self.assertEqual(next(export.iter_json_array(chunks())), {'a': 1})
+
+    def test_iter_json_array__truncated(self):
+        with self.assertRaises(ValueError):
+            list(export.iter_json_array([b'{"entities": [{"a": 1}, {"a"']))
+
+    def test_raw_lens_uri(self):
+        self.assertEqual(export.raw_lens_uri('fake-id', x_min=-10, t_max=5, host='fake-host'),
+                         'datasets/raw-lens/fake-id/-10/180/-90/90/-1/1/-281474976710655/5')
+
+    @mock.patch('conduce.api.make_get_request')
+    def test_iter_raw_entities(self, mock_make_get_request):
+        response = mock_make_get_request.return_value
+        response.encoding = None
+        response.iter_content.return_value = split(json.dumps({'entities': ENTITIES}).encode('utf-8'), 100)
+
+        self.assertEqual(list(export.iter_raw_entities('fake-id', y_max=45, host='fake-host')), ENTITIES)
+        mock_make_get_request.assert_called_once_with(
+            'datasets/raw-lens/fake-id/-180/180/-90/45/-1/1/-281474976710655/281474976710655', stream=True, host='fake-host')
+        response.close.assert_called_once_with()
+
+    def test_export_entities__ndjson(self):
+        path = os.path.join(self.directory, 'entities.ndjson')
+
+        self.assertEqual(export.export_entities(iter(ENTITIES), path, 'ndjson'), 10)
+        with io.open(path, encoding='utf-8') as infile:
+            self.assertEqual([json.loads(line) for line in infile], ENTITIES)
+
+    def test_write_csv(self):
+        path = os.path.join(self.directory, 'entities.csv')
+        entities = ENTITIES + [dict(ENTITIES[0], attrs=[{'key': 'late', 'type': 'STRING', 'str_value': 'x'}])]
+
+        with export._open_output(path) as outfile:
+            self.assertEqual(export.write_csv(iter(entities), outfile, sample_size=10), 11)
+        with io.open(path, encoding='utf-8', newline='') as infile:
+            rows = list(csv.DictReader(infile))
+
+        self.assertEqual(list(rows[0].keys()), export.CSV_FIELDS + ['count', 'name'])
+        self.assertEqual(rows[3], {
+            'identity': 'entity-3', 'kind': 'fake-kind', 'timestamp_ms': '3000', 'endtime_ms': '3000',
+            'x': '3', 'y': '-3', 'z': '0', 'count': '3', 'name': 'fake-name'})
+        self.assertEqual(len(rows), 11)
+
+    def test_export_entities__csv(self):
+        path = os.path.join(self.directory, 'entities.csv')
+
+        self.assertEqual(export.export_entities(iter(ENTITIES), path, 'csv'), 10)
+        with io.open(path, encoding='utf-8', newline='') as infile:
+            self.assertEqual(len(list(csv.DictReader(infile))), 10)
+
+    def test_export_entities__unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export_entities([], None, 'xml')
+
+    def test_tile_bounds(self):
+        tiles = export.tile_bounds(dict(export.DEFAULT_BOUNDS, x_min='-100.5', x_max=10, y_min=0, y_max=40, t_min=0, t_max=100), tile_degrees=30)
+
+        self.assertEqual([(tile['x_min'], tile['x_max']) for tile in tiles], [(-100.5, -90.0), (-90.0, -45.0), (-45.0, 0.0), (0.0, 10.0)])
+        self.assertTrue(all((tile['y_min'], tile['y_max'], tile['t_min'], tile['t_max']) == (0.0, 40.0, 0, 100) for tile in tiles))
+
+    def test_tile_bounds__time(self):
+        day = 24 * 3600 * 1000
+        tiles = export.tile_bounds(dict(export.DEFAULT_BOUNDS, t_min=0, t_max=10 * day), tile_degrees=360, tile_ms=3 * day)
+
+        self.assertEqual(tiles[0]['t_min'], 0)
+        self.assertEqual(tiles[-1]['t_max'], 10 * day)
+        self.assertTrue(all(tile['t_max'] - tile['t_min'] >= 3 * day for tile in tiles[:-1]))
+        self.assertTrue(all(a['t_max'] == b['t_min'] for a, b in zip(tiles, tiles[1:])))
+
+    def test_tile_bounds__too_small(self):
+        with self.assertRaises(ValueError):
+            export.tile_bounds(dict(export.DEFAULT_BOUNDS), tile_ms=1000)
+
+    def test_split_tile(self):
+        tile = dict(export.DEFAULT_BOUNDS, x_min=0, x_max=2, y_min=0, y_max=2, t_min=0, t_max=10000)
+        self.assertEqual(len(export.split_tile(tile)), 4)
+
+        tile = dict(tile, x_max=export.MIN_TILE_DEGREES, y_max=export.MIN_TILE_DEGREES)
+        self.assertEqual([(part['t_min'], part['t_max']) for part in export.split_tile(tile)], [(0, 5000), (5000, 10000)])
+
+        self.assertEqual(export.split_tile(dict(tile, t_max=export.MIN_TILE_MS)), [])
+
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_iter_tiles(self, mock_iter_raw_entities):
+        def entity(identity, *points):
+            return {'identity': identity, 'timestamp_ms': 0, 'endtime_ms': 0, 'path': [{'x': x, 'y': y, 'z': 0} for x, y in points]}
+
+        entities = [
+            entity('inside', (-100, -50)),
+            entity('seam', (0, 0)),
+            entity('crosses', (10, 10), (-10, 10), (-10, -10)),
+            entity('outside', (200, 10), (300, 10)),
+            entity('bounds', (180, 90)),
+        ]
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            # Every entity whose path has a point in the tile, and the entity without points in the bounds.
+            for e in entities:
+                in_tile = any(kwargs['x_min'] <= p['x'] <= kwargs['x_max'] and kwargs['y_min'] <= p['y'] <= kwargs['y_max'] for p in e['path'])
+                if in_tile or e['identity'] == 'outside':
+                    yield e
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+
+        results = list(export.iter_tiles('fake-id', tile_degrees=180, workers=2, host='fake-host'))
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sorted(e['identity'] for _, tile_entities in results for e in tile_entities), ['bounds', 'crosses', 'inside', 'outside', 'seam'])
+        for args, kwargs in mock_iter_raw_entities.call_args_list:
+            self.assertEqual(args, ('fake-id',))
+            self.assertEqual(kwargs['host'], 'fake-host')
+
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_iter_tiles__split(self, mock_iter_raw_entities):
+        entities = [{'identity': str(idx), 'timestamp_ms': 0, 'path': [{'x': idx, 'y': idx}]} for idx in range(-45, 45)]
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            for e in entities:
+                if kwargs['x_min'] <= e['path'][0]['x'] <= kwargs['x_max'] and kwargs['y_min'] <= e['path'][0]['y'] <= kwargs['y_max']:
+                    yield e
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+
+        results = list(export.iter_tiles('fake-id', tile_degrees=360, max_tile_entities=20))
+
+        self.assertTrue(all(len(tile_entities) <= 20 for _, tile_entities in results))
+        self.assertEqual(sorted(int(e['identity']) for _, tile_entities in results for e in tile_entities), list(range(-45, 45)))
+
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_export_tiles__checkpoint(self, mock_iter_raw_entities):
+        output = os.path.join(self.directory, 'entities.ndjson')
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            if kwargs['x_min'] >= 0:
+                raise RuntimeError('Interrupted')
+            yield {'identity': 'west', 'timestamp_ms': 0, 'path': [{'x': -1, 'y': 0}]}
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+        with self.assertRaises(RuntimeError):
+            export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1)
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            self.assertEqual(kwargs['x_min'], 0)
+            yield {'identity': 'east', 'timestamp_ms': 0, 'path': [{'x': 1, 'y': 0}]}
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+        self.assertEqual(export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1), 1)
+
+        with io.open(output, encoding='utf-8') as infile:
+            self.assertEqual([json.loads(line)['identity'] for line in infile], ['west', 'east'])
+
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_export_tiles__checkpoint_partial_tile(self, mock_iter_raw_entities):
+        output = os.path.join(self.directory, 'entities.ndjson')
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            side = 'east' if kwargs['x_min'] >= 0 else 'west'
+            for idx in range(3):
+                yield {'identity': '{}-{}'.format(side, idx), 'timestamp_ms': 0, 'path': [{'x': 1 if side == 'east' else -1, 'y': 0}]}
+
+        write_ndjson = export.write_ndjson
+
+        def interrupted_write_ndjson(entities, outfile):
+            if entities[0]['identity'].startswith('east'):
+                write_ndjson(entities[:2], outfile)
+                outfile.write(u'{"identity": "ea')
+                outfile.flush()
+                raise KeyboardInterrupt()
+            return write_ndjson(entities, outfile)
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+        with mock.patch('conduce.export.write_ndjson', side_effect=interrupted_write_ndjson):
+            with self.assertRaises(KeyboardInterrupt):
+                export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1)
+
+        self.assertEqual(export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1), 3)
+
+        with io.open(output, encoding='utf-8') as infile:
+            self.assertEqual([json.loads(line)['identity'] for line in infile], ['west-0', 'west-1', 'west-2', 'east-0', 'east-1', 'east-2'])
+
+    @mock.patch('conduce.export.iter_raw_entities')
+    def test_export_tiles__checkpoint_unanchored(self, mock_iter_raw_entities):
+        output = os.path.join(self.directory, 'entities.ndjson')
+        checkpoint = os.path.join(self.directory, 'checkpoint')
+
+        def fake_iter_raw_entities(dataset_id, **kwargs):
+            side = 'east' if kwargs['x_min'] >= 0 else 'west'
+            yield {'identity': side, 'timestamp_ms': 0, 'path': [{'x': 1 if side == 'east' else -1, 'y': 0}]}
+            yield {'identity': 'outside', 'timestamp_ms': 0, 'path': [{'x': 0, 'y': 50}]}
+
+        write_ndjson = export.write_ndjson
+
+        def interrupted_write_ndjson(entities, outfile):
+            if entities[0]['identity'] == 'east':
+                raise KeyboardInterrupt()
+            return write_ndjson(entities, outfile)
+
+        mock_iter_raw_entities.side_effect = fake_iter_raw_entities
+        with mock.patch('conduce.export.write_ndjson', side_effect=interrupted_write_ndjson):
+            with self.assertRaises(KeyboardInterrupt):
+                export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1)
+
+        self.assertEqual(export.export_tiles('fake-id', output, checkpoint=checkpoint, tile_degrees=180, y_min=0, y_max=10, workers=1), 1)
+
+        with io.open(output, encoding='utf-8') as infile:
+            self.assertEqual([json.loads(line)['identity'] for line in infile], ['west', 'outside', 'east'])
+
+    def test_export_tiles__checkpoint_requires_file(self):
+        with self.assertRaises(ValueError):
+            export.export_tiles('fake-id', None, checkpoint=os.path.join(self.directory, 'checkpoint'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from conduce import ingest
+
+
+class FakeResponse(object):
+    status_code = 201
+
+    def raise_for_status(self):
+        return None
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'checkpoint')
+        self.source = os.path.join(self.directory, 'rows.csv')
+        with io.open(self.source, 'w') as outfile:
+            outfile.write(u'id,kind\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_checkpoint(self):
+        with open(self.checkpoint) as infile:
+            return [json.loads(line) for line in infile]
+
+    @mock.patch('conduce.api.get_transactions')
+    def test_checkpoint__new(self, mock_get_transactions):
+        checkpoint = ingest.IngestCheckpoint(self.checkpoint, 'fake-id', self.source, chunk_size=2, host='fake-host')
+        checkpoint.record(1, 2, 2)
+
+        self.assertEqual(checkpoint.completed_chunks(), set([1]))
+        header, record = self.read_checkpoint()
+        self.assertEqual(header['chunk_size'], 2)
+        self.assertEqual(record, {'chunk': 1, 'first': 2, 'entities': 2})
+        mock_get_transactions.assert_not_called()
+
+    def test_checkpoint__mismatch(self):
+        ingest.IngestCheckpoint(self.checkpoint, 'fake-id', self.source, chunk_size=2)
+
+        with self.assertRaises(ValueError):
+            ingest.IngestCheckpoint(self.checkpoint, 'fake-id', self.source, chunk_size=3)
+
+    @mock.patch('conduce.api.get_transactions', side_effect=[{'count': 7}, {'count': 9}])
+    @mock.patch('conduce.api.make_post_request')
+    def test_ingest_entities__resume_with_other_writers(self, mock_make_post_request, mock_get_transactions):
+        entities = ['fake entity {}'.format(idx) for idx in range(6)]
+
+        def fail_chunk_1(payload, fragment, **kwargs):
+            if payload['data']['entities'][0] == 'fake entity 2':
+                raise ValueError('Fake failure')
+            return FakeResponse()
+
+        mock_make_post_request.side_effect = fail_chunk_1
+        result = ingest._ingest_entities('fake-id', iter(entities), self.source, checkpoint=self.checkpoint, chunk_size=2, operation='APPEND')
+        self.assertEqual(len(result['failures']), 1)
+
+        # Another writer appends a transaction to the dataset before the ingest is resumed, so the log holds one
+        # transaction more than the chunks recorded in the checkpoint.
+        mock_make_post_request.reset_mock()
+        mock_make_post_request.side_effect = None
+        mock_make_post_request.return_value = FakeResponse()
+        result = ingest._ingest_entities('fake-id', iter(entities), self.source, checkpoint=self.checkpoint, chunk_size=2, operation='APPEND')
+
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual([call[0][0]['data']['entities'] for call in mock_make_post_request.call_args_list], [
+            ['fake entity 2', 'fake entity 3'], ['fake entity 4', 'fake entity 5']])
+        self.assertEqual([record['chunk'] for record in self.read_checkpoint()[1:]], [0, 1, 2])
+        mock_get_transactions.assert_not_called()
+
+    @mock.patch('conduce.api.make_post_request')
+    def test_ingest_entities__resume(self, mock_make_post_request):
+        entities = ['fake entity {}'.format(idx) for idx in range(5)]
+
+        def fail_chunk_1(payload, fragment, **kwargs):
+            if payload['data']['entities'][0] == 'fake entity 2':
+                raise ValueError('Fake failure')
+            return FakeResponse()
+
+        mock_make_post_request.side_effect = fail_chunk_1
+        result = ingest._ingest_entities('fake-id', iter(entities), self.source, checkpoint=self.checkpoint, chunk_size=2, workers=1)
+        self.assertEqual(len(result['failures']), 1)
+
+        mock_make_post_request.reset_mock()
+        mock_make_post_request.side_effect = None
+        mock_make_post_request.return_value = FakeResponse()
+        result = ingest._ingest_entities('fake-id', iter(entities), self.source, checkpoint=self.checkpoint, chunk_size=2, workers=1)
+
+        self.assertEqual(result['skipped'], 2)
+        self.assertEqual(result['failures'], [])
+        self.assertEqual([call[0][0]['data']['entities'] for call in mock_make_post_request.call_args_list], [['fake entity 2', 'fake entity 3']])
+        self.assertEqual([record['chunk'] for record in self.read_checkpoint()[1:]], [0, 2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+from conduce import mirror
+
+
+def transactions(first, last):
+    return [{'op': 'INSERT', 'data': {'entities': [{'identity': str(idx)}]}} for idx in range(first, last)]
+
+
+def server_log(log):
+    # A fake get_transactions for the transaction log in the list log.
+    def get_transactions(dataset_id, **kwargs):
+        if kwargs.get('count'):
+            return {'count': len(log)}
+        return log[kwargs['min']:kwargs['max'] + 1]
+    return get_transactions
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mirror = mirror.TransactionMirror(os.path.join(self.directory, 'mirror.sqlite'))
+
+    def tearDown(self):
+        self.mirror.close()
+        shutil.rmtree(self.directory)
+
+    @mock.patch('conduce.api.iter_transactions')
+    @mock.patch('conduce.api.get_transactions')
+    def test_sync__incremental(self, mock_get_transactions, mock_iter_transactions):
+        mock_get_transactions.side_effect = server_log(transactions(0, 3))
+        mock_iter_transactions.return_value = iter(transactions(0, 3))
+        self.assertEqual(self.mirror.sync('fake-id', host='fake-host', min=5), 3)
+        mock_iter_transactions.assert_called_once_with('fake-id', min=0, host='fake-host')
+
+        mock_get_transactions.side_effect = server_log(transactions(0, 5))
+        mock_get_transactions.reset_mock()
+        mock_iter_transactions.reset_mock()
+        mock_iter_transactions.return_value = iter(transactions(3, 5))
+        self.assertEqual(self.mirror.sync('fake-id', host='fake-host'), 2)
+        mock_iter_transactions.assert_called_once_with('fake-id', min=3, host='fake-host')
+        mock_get_transactions.assert_called_with('fake-id', min=2, max=2, rows=1, host='fake-host')
+
+        self.assertEqual(self.mirror.last_index('fake-id'), 4)
+        self.assertEqual(list(self.mirror.iter_transactions('fake-id')), transactions(0, 5))
+        self.assertEqual(list(self.mirror.iter_transactions('fake-id', min=1, max=2)), transactions(1, 3))
+        self.assertEqual(self.mirror.get_transaction('fake-id', 4), transactions(4, 5)[0])
+        self.assertIsNone(self.mirror.get_transaction('fake-id', 5))
+        self.assertEqual(self.mirror.count('other-id'), 0)
+
+    @mock.patch('conduce.api.iter_transactions')
+    @mock.patch('conduce.api.get_transactions', return_value={'count': 0})
+    def test_sync__up_to_date(self, mock_get_transactions, mock_iter_transactions):
+        self.assertEqual(self.mirror.sync('fake-id'), 0)
+        mock_get_transactions.assert_called_once_with('fake-id', count=True)
+        mock_iter_transactions.assert_not_called()
+
+    @mock.patch('conduce.mirror.SYNC_BATCH_SIZE', 2)
+    @mock.patch('conduce.api.iter_transactions')
+    @mock.patch('conduce.api.get_transactions', return_value={'count': 5})
+    def test_sync__interrupted(self, mock_get_transactions, mock_iter_transactions):
+        def interrupted(dataset_id, **kwargs):
+            for transaction in transactions(0, 3):
+                yield transaction
+            raise IOError('Fake failure')
+
+        mock_iter_transactions.side_effect = interrupted
+        with self.assertRaises(IOError):
+            self.mirror.sync('fake-id')
+
+        self.assertEqual(self.mirror.last_index('fake-id'), 1)
+
+    @mock.patch('conduce.api.iter_transactions')
+    @mock.patch('conduce.api.get_transactions')
+    def test_sync__cleared(self, mock_get_transactions, mock_iter_transactions):
+        mock_get_transactions.return_value = {'count': 3}
+        mock_iter_transactions.return_value = iter(transactions(0, 3))
+        self.mirror.sync('fake-id')
+
+        mock_get_transactions.return_value = {'count': 1}
+        mock_iter_transactions.return_value = iter(transactions(10, 11))
+        self.assertEqual(self.mirror.sync('fake-id'), 1)
+
+        self.assertEqual(list(self.mirror.iter_transactions('fake-id')), transactions(10, 11))
+
+    @mock.patch('conduce.api.iter_transactions')
+    @mock.patch('conduce.api.get_transactions')
+    def test_sync__refilled(self, mock_get_transactions, mock_iter_transactions):
+        mock_get_transactions.side_effect = server_log(transactions(0, 3))
+        mock_iter_transactions.return_value = iter(transactions(0, 3))
+        self.mirror.sync('fake-id')
+
+        # The log was cleared and refilled past the mirrored transactions.
+        mock_get_transactions.side_effect = server_log(transactions(10, 14))
+        mock_iter_transactions.return_value = iter(transactions(10, 14))
+        self.assertEqual(self.mirror.sync('fake-id'), 4)
+
+        mock_iter_transactions.assert_called_with('fake-id', min=0)
+        self.assertEqual(list(self.mirror.iter_transactions('fake-id')), transactions(10, 14))
+
+
+if __name__ == '__main__':
+    unittest.main()
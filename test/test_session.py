@@ -0,0 +1,43 @@
+import unittest
+import mock
+
+from conduce import session
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        session.clear_session_cache()
+
+    def tearDown(self):
+        session.clear_session_cache()
+
+    @mock.patch('conduce.session._get_session', return_value='fake-auth')
+    def test_get_session__cached(self, mock__get_session):
+        self.assertEqual(session.get_session('fake-host', 'fake-user', None), 'fake-auth')
+        self.assertEqual(session.get_session('fake-host', 'fake-user', None), 'fake-auth')
+        mock__get_session.assert_called_once_with('fake-host', 'fake-user', None, True)
+
+    @mock.patch('conduce.session._get_session', return_value='fake-auth')
+    def test_get_session__cached_per_host_and_user(self, mock__get_session):
+        session.get_session('fake-host', 'fake-user', None)
+        session.get_session('fake-host', 'other-user', None)
+        session.get_session('other-host', 'fake-user', None)
+        self.assertEqual(mock__get_session.call_count, 3)
+
+    @mock.patch('time.time', side_effect=[0, session.SESSION_CACHE_TTL + 1, session.SESSION_CACHE_TTL + 1])
+    @mock.patch('conduce.session._get_session', return_value='fake-auth')
+    def test_get_session__expired(self, mock__get_session, mock_time):
+        session.get_session('fake-host', 'fake-user', None)
+        session.get_session('fake-host', 'fake-user', None)
+        self.assertEqual(mock__get_session.call_count, 2)
+
+    @mock.patch('conduce.session._get_session', return_value='fake-auth')
+    def test_invalidate_session(self, mock__get_session):
+        session.get_session('fake-host', 'fake-user', None)
+        session.invalidate_session('fake-host', 'fake-user')
+        session.get_session('fake-host', 'fake-user', None)
+        self.assertEqual(mock__get_session.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import mock
+
+from requests.exceptions import ConnectionError
+from requests.exceptions import HTTPError
+
+from conduce import api
+from conduce import spool
+
+
+def entities(*identities):
+    return {'entities': [{'identity': identity} for identity in identities]}
+
+
+def posted_identities(mock_append_transaction):
+    return [[json.loads(entity.decode('utf-8'))['identity'] for entity in call[0][1]['entities']] for call in mock_append_transaction.call_args_list]
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), 'spool')
+
+    def tearDown(self):
+        spool.close_spools(drain=False)
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def open_spool(self, **kwargs):
+        self.spool = spool.Spool(self.directory, 'fake-dataset-id', segment_seconds=0.01, fsync_interval=0.01, **kwargs)
+        self.addCleanup(self.spool.close, drain=False)
+        return self.spool
+
+    @mock.patch('conduce.api.append_transaction')
+    def test_append(self, mock_append_transaction):
+        s = self.open_spool(host='fake-host', operation='APPEND')
+
+        self.assertEqual(s.append(entities('a', 'b')), 2)
+        s.append(entities('c'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(sum(posted_identities(mock_append_transaction), []), ['a', 'b', 'c'])
+        for call in mock_append_transaction.call_args_list:
+            self.assertEqual(call[0][0], 'fake-dataset-id')
+            self.assertEqual(call[1], {'serialize': True, 'host': 'fake-host'})
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(s.pending_bytes(), 0)
+
+    @mock.patch('conduce.api.append_transaction')
+    def test_append__segments_in_order(self, mock_append_transaction):
+        s = self.open_spool(segment_bytes=1)
+
+        for identity in 'abcde':
+            s.append(entities(identity))
+        s.flush(timeout=5)
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['a'], ['b'], ['c'], ['d'], ['e']])
+
+    @mock.patch('conduce.spool.RETRY_INITIAL_DELAY', 0.01)
+    @mock.patch('conduce.api.append_transaction', side_effect=[ConnectionError(), HTTPError(response=mock.Mock(status_code=503)), None])
+    def test_append__retry(self, mock_append_transaction):
+        s = self.open_spool()
+
+        s.append(entities('a'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['a']] * 3)
+        self.assertEqual(s.errors, [])
+
+    @mock.patch('conduce.spool.RETRY_INITIAL_DELAY', 0.01)
+    @mock.patch('conduce.api.append_transaction', side_effect=[
+        HTTPError(response=mock.Mock(status_code=status, headers={})) for status in (401, 408, 429)] + [None])
+    def test_append__retry_statuses(self, mock_append_transaction):
+        s = self.open_spool()
+
+        s.append(entities('a'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['a']] * 4)
+        self.assertEqual(s.errors, [])
+
+    def test_retry_after(self):
+        self.assertEqual(spool._retry_after(HTTPError(response=mock.Mock(status_code=429, headers={'Retry-After': '3'}))), 3)
+        self.assertEqual(spool._retry_after(HTTPError(response=mock.Mock(status_code=429, headers={}))), 0)
+        self.assertEqual(spool._retry_after(ConnectionError()), 0)
+
+    @mock.patch('conduce.api.make_post_request')
+    def test_append__chunk_kwargs(self, mock_make_post_request):
+        mock_make_post_request.return_value.status_code = 400
+        mock_make_post_request.return_value.raise_for_status.side_effect = HTTPError(response=mock.Mock(status_code=400))
+        s = self.open_spool(host='fake-host', chunk_size=1, chunk_bytes=100, workers=2)
+
+        s.append(entities('a', 'b'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(s.request_kwargs, {'host': 'fake-host'})
+        self.assertEqual(mock_make_post_request.call_count, 1)
+        self.assertEqual(len(s.errors), 1)
+
+    @mock.patch('conduce.api.append_transaction', side_effect=[HTTPError(response=mock.Mock(status_code=400)), None])
+    def test_append__failed_segment(self, mock_append_transaction):
+        error_callback = mock.Mock()
+        s = self.open_spool(segment_bytes=1, error_callback=error_callback)
+
+        s.append(entities('bad'))
+        s.append(entities('good'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['bad'], ['good']])
+        self.assertEqual([name.split('.')[-1] for name in os.listdir(self.directory)], ['failed'])
+        self.assertEqual(error_callback.call_count, 1)
+        self.assertEqual(len(s.errors), 1)
+
+    @mock.patch('conduce.api.append_transaction')
+    def test_recover(self, mock_append_transaction):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, 'segment-000000000003.ndjson'), 'wb') as outfile:
+            outfile.write(b'{"identity": "a"}\n')
+        with open(os.path.join(self.directory, 'segment-000000000004.open'), 'wb') as outfile:
+            outfile.write(b'{"identity": "b"}\n{"identity": "c"}\n{"ident')
+
+        s = self.open_spool()
+        s.append(entities('d'))
+        self.assertTrue(s.flush(timeout=5))
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['a'], ['b', 'c'], ['d']])
+
+    def test_append__full(self):
+        posting = threading.Event()
+        release = threading.Event()
+
+        def blocked(*args, **kwargs):
+            posting.set()
+            release.wait(5)
+
+        with mock.patch('conduce.api.append_transaction', side_effect=blocked):
+            s = self.open_spool(max_spool_bytes=30)
+            s.append(entities('a'))
+            self.assertTrue(posting.wait(5))
+            s.append(entities('b'))
+
+            with self.assertRaises(spool.SpoolFullError):
+                s.append(entities('c'), timeout=0.05)
+
+            release.set()
+            s.append(entities('c'), timeout=5)
+            self.assertTrue(s.flush(timeout=5))
+
+    @mock.patch('conduce.api.append_transaction')
+    def test_closed(self, mock_append_transaction):
+        s = self.open_spool()
+        s.close()
+
+        with self.assertRaises(spool.SpoolClosedError):
+            s.append(entities('a'))
+        mock_append_transaction.assert_not_called()
+
+    def test_flush__closed(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, 'segment-000000000000.ndjson'), 'wb') as outfile:
+            outfile.write(b'{"identity": "a"}\n')
+
+        with mock.patch('conduce.api.append_transaction', side_effect=ConnectionError()):
+            s = self.open_spool()
+            s.close(drain=False)
+        self.assertFalse(s.flush())
+
+    def test_get_spool__reopen_after_close(self):
+        first = spool.get_spool(self.directory, 'fake-dataset-id', segment_seconds=0.01, fsync_interval=0.01)
+        first.close()
+
+        with mock.patch('conduce.api.append_transaction') as mock_append_transaction:
+            second = spool.get_spool(self.directory, 'fake-dataset-id', segment_seconds=0.01, fsync_interval=0.01)
+            self.assertIsNot(second, first)
+            second.append(entities('a'))
+            self.assertTrue(second.flush(timeout=5))
+
+        self.assertEqual(posted_identities(mock_append_transaction), [['a']])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @mock.patch('conduce.api.post_transaction')
+    def test_api_append_transaction__spool(self, mock_post_transaction):
+        with mock.patch('conduce.spool.Spool.append', return_value=2) as mock_append:
+            self.assertEqual(api.append_transaction('fake-dataset-id', entities('a', 'b'), spool=self.directory, host='fake-host'), 2)
+            mock_append.assert_called_once_with(entities('a', 'b'))
+
+        self.assertEqual(spool.get_spool(self.directory, 'fake-dataset-id').request_kwargs, {'host': 'fake-host'})
+        with self.assertRaises(ValueError):
+            spool.get_spool(self.directory, 'other-dataset-id')
+        mock_post_transaction.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 import mock
 
 from conduce import util
 import datetime
+import pytz
 
 # Python 2 compatibility
 try:
@@ -464,6 +469,236 @@ class Test(unittest.TestCase):
         mock_json_load.assert_called_once_with(
             "fake file stream", object_hook=mock_parse_sample)
 
+    def test_chunk_entities__max_count(self):
+        self.assertEqual(list(util.chunk_entities(range(5), max_count=2)), [[0, 1], [2, 3], [4]])
+
+    def test_chunk_entities__max_bytes(self):
+        entities = ['aaaa', 'bbbb', 'cccc']
+        self.assertEqual(list(util.chunk_entities(entities, max_bytes=12)), [['aaaa', 'bbbb'], ['cccc']])
+
+    def test_chunk_entities__oversized_entity(self):
+        entities = ['a', 'bbbbbbbbbbbbbbbb', 'c']
+        self.assertEqual(list(util.chunk_entities(entities, max_bytes=4)), [['a'], ['bbbbbbbbbbbbbbbb'], ['c']])
+
+    def test_chunk_entities__generator(self):
+        self.assertEqual(list(util.chunk_entities((x for x in range(3)), max_count=5)), [[0, 1, 2]])
+
+    def test_iter_csv_rows(self):
+        rows = util.iter_csv_rows(io.StringIO(u'id,value\na,1\nb,2\n'), delimiter=',')
+        self.assertEqual(next(rows), {'id': 'a', 'value': '1'})
+        self.assertEqual(list(rows), [{'id': 'b', 'value': '2'}])
+
+    def test_csv_to_json(self):
+        self.assertEqual(util.csv_to_json(io.StringIO(u'id,value\na,1\n'), delimiter=','), [{'id': 'a', 'value': '1'}])
+
+    @mock.patch('conduce.util.get_key_map')
+    def test_stream_entities__lazy(self, mock_get_key_map):
+        key_map = {
+            'identity': {'key': 'id'},
+            'kind': {'key': None, 'override_value': 'fake kind'},
+            'timestamp_ms': {'key': 'time'},
+            'endtime_ms': {'key': None},
+            'x': {'key': 'x'},
+            'y': {'key': 'y'},
+            'z': {'key': None},
+        }
+        mock_get_key_map.return_value = key_map
+        consumed = []
+
+        def raw_entities():
+            for idx in range(3):
+                consumed.append(idx)
+                yield {'id': str(idx), 'time': '1000', 'x': '1', 'y': '2', 'value': 'fake'}
+
+        with mock.patch('conduce.util.FIELD_SAMPLE_WINDOW', 1):
+            entities = util.stream_entities(raw_entities(), answer_yes=True, sample_size=1)
+        mock_get_key_map.assert_called_once_with([{'id': '0', 'time': '1000', 'x': '1', 'y': '2', 'value': 'fake'}], answer_yes=True, sample_size=1)
+        self.assertEqual(consumed, [0])
+
+        entity = next(entities)
+        self.assertEqual(entity['identity'], '0')
+        self.assertEqual(entity['kind'], 'fake kind')
+        self.assertEqual(entity['timestamp_ms'], 1000)
+        self.assertEqual(entity['path'], [{'x': 1.0, 'y': 2.0, 'z': 0.0}])
+        self.assertEqual(entity['attrs'], [{'key': 'value', 'type': 'STRING', 'str_value': 'fake'}])
+        self.assertEqual(len(list(entities)), 2)
+
+    def test_stream_entities__empty(self):
+        self.assertEqual(list(util.stream_entities([])), [])
+
+    def test_infer_attribute_type(self):
+        self.assertEqual(util.infer_attribute_type(['1', '2', 'x']), 'INT64')
+        self.assertEqual(util.infer_attribute_type(['1.5', '2', '3.25']), 'DOUBLE')
+        self.assertEqual(util.infer_attribute_type(['a', 'nan', '3']), 'STRING')
+        self.assertEqual(util.infer_attribute_type([]), 'STRING')
+
+    def test_infer_attribute_types(self):
+        self.assertEqual(util.infer_attribute_types([{'a': '1', 'b': 'x'}, {'a': '2', 'c': '0.5'}]), {'a': 'INT64', 'b': 'STRING', 'c': 'DOUBLE'})
+
+    def test_attribute_builder__matches_build_attribute(self):
+        values = ['1', '-2', '+3', '007', ' 4', '1.0', '2.5', '1e3', '1234567890123456789', '9007199254740993', '1_000', 'inf', 'NaN', '', 'fake', '.5', '-',
+                  u'\u0661', 5, 2.5, True, None]
+        for attribute_type in ['INT64', 'DOUBLE', 'STRING']:
+            build = util.attribute_builder(attribute_type)
+            for value in values:
+                self.assertEqual(build('key', value), util.build_attribute('key', value))
+
+    @mock.patch('conduce.util.build_attribute', wraps=util.build_attribute)
+    def test_build_attributes(self, mock_build_attribute):
+        attributes = util.build_attributes('key', ['1', '2', '3', 'x'], attribute_type='INT64')
+
+        self.assertEqual([attribute['type'] for attribute in attributes], ['INT64', 'INT64', 'INT64', 'STRING'])
+        mock_build_attribute.assert_called_once_with('key', 'x')
+
+    def test_get_attributes__builders(self):
+        builders = {'a': util.attribute_builder('INT64')}
+        self.assertEqual(util.get_attributes(['a', 'b'], {'a': '1', 'b': 'x'}, builders),
+                         [{'key': 'a', 'type': 'INT64', 'int64_value': 1}, {'key': 'b', 'type': 'STRING', 'str_value': 'x'}])
+
+    def test_datetime_to_timestamp_ms(self):
+        self.assertEqual(util.datetime_to_timestamp_ms(datetime.datetime(1970, 1, 1, 0, 0, 1)), 1000)
+        self.assertEqual(util.datetime_to_timestamp_ms(datetime.datetime(1970, 1, 1, 1, tzinfo=pytz.timezone('Etc/GMT-1'))), 0)
+
+    def test_infer_timestamp_format(self):
+        self.assertEqual(util.infer_timestamp_format(['1500000000000', '1500000000001']), 'epoch_ms')
+        self.assertEqual(util.infer_timestamp_format(['1500000000.5']), 'epoch_s')
+        self.assertEqual(util.infer_timestamp_format(['2019-03-04T10:11:12.5Z', '2019-03-04 10:11']), 'iso_8601')
+        self.assertEqual(util.infer_timestamp_format(['03/04/2019 10:11:12']), '%m/%d/%Y %H:%M:%S')
+        self.assertIsNone(util.infer_timestamp_format([]))
+
+    def test_timestamp_parser__matches_string_to_timestamp_ms(self):
+        values = ['2019-03-04T10:11:12.123456Z', '2019-03-04T10:11:12-07:00', '2019-03-04T10:11:12+0530', '2019-03-04', 'March 4 2019', '1500000000']
+        for kwargs in [{}, {'ignoretz': False}, {'tz': 'US/Pacific'}]:
+            parse = util.timestamp_parser(values[:1], **kwargs)
+            for value in values:
+                self.assertEqual(parse(value), util.string_to_timestamp_ms(value, **kwargs))
+
+    def test_timestamp_parser__timestamp_format(self):
+        parse = util.timestamp_parser(timestamp_format='%d.%m.%Y %H:%M')
+        self.assertEqual(parse('02.01.1970 00:00'), 24 * 3600 * 1000)
+
+    @mock.patch('conduce.util.string_to_timestamp_ms', wraps=util.string_to_timestamp_ms)
+    def test_timestamp_parser__memoized(self, mock_string_to_timestamp_ms):
+        parse = util.timestamp_parser()
+        self.assertEqual([parse('March 4 2019') for _ in range(3)], [1551657600000] * 3)
+        mock_string_to_timestamp_ms.assert_called_once_with('March 4 2019', True, None)
+
+    def test_reservoir_sample(self):
+        self.assertEqual(util.reservoir_sample(range(3), 5), [0, 1, 2])
+        sample = util.reservoir_sample(iter(range(1000)), 10)
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(sample, sorted(sample))
+        self.assertEqual(util.reservoir_sample(iter(range(1000)), 10), sample)
+
+    def test_profile_fields(self):
+        profiles = util.profile_fields([{'a': '1', 'b': 'x'}, {'a': '3', 'b': 'x'}, {'a': 'nan', 'b': 'y'}], ['a', 'b'])
+        self.assertEqual(profiles['a'], {'count': 3, 'numeric_rate': 2.0 / 3, 'min': 1.0, 'max': 3.0, 'cardinality': 3})
+        self.assertEqual(profiles['b'], {'count': 3, 'numeric_rate': 0.0, 'min': None, 'max': None, 'cardinality': 2})
+
+    def test_score_fields__sampled(self):
+        raw_entities = [{'id': str(idx % 2), 'reading': str(1000 + idx), 'lat': str(idx), 'lon': str(idx * 10)} for idx in range(20)]
+        key_scores = util.score_fields(raw_entities, list(raw_entities[0].keys()))
+
+        # A sensor ID repeats across readings, which must not count against it.
+        self.assertTrue(key_scores['id']['identity_score'] > key_scores['reading']['identity_score'])
+        self.assertEqual(util.get_key_map(raw_entities, answer_yes=True)['identity']['key'], 'id')
+        self.assertEqual(key_scores['lon']['x_score'], 0)
+        self.assertEqual(key_scores['lat']['y_score'], 1000)
+
+    def test_map_keys__single_field_per_key(self):
+        key_scores = {
+            'a': {'identity_score': 500, 'x_score': 900},
+            'b': {'identity_score': 400, 'x_score': 0},
+        }
+        self.assertEqual(util.map_keys(key_scores, ['a', 'b']), {
+            'identity': {'key': 'b', 'score': 400},
+            'x': {'key': 'a', 'score': 900},
+        })
+
+    def test_map_keys__tie_breakers(self):
+        key_scores = {
+            'count': {'identity_score': 400},
+            'serial': {'identity_score': 400},
+        }
+        self.assertEqual(util.map_keys(key_scores, ['count', 'serial'])['identity']['key'], 'count')
+        tie_breakers = {'identity_score': util.identity_tie_breakers([{'count': '1', 'serial': '7'}, {'count': '1', 'serial': '8'}], ['count', 'serial'])}
+        self.assertEqual(util.map_keys(key_scores, ['count', 'serial'], tie_breakers)['identity']['key'], 'serial')
+
+    def test_sample_stream(self):
+        head, sample = util.sample_stream(iter(range(1000)), sample_size=10)
+        self.assertEqual(head, list(range(1000)))
+        self.assertEqual(len(sample), 10)
+        self.assertTrue(max(sample) >= 10)
+
+        with mock.patch('conduce.util.FIELD_SAMPLE_WINDOW', 100):
+            rows = iter(range(1000))
+            head, sample = util.sample_stream(rows, sample_size=10)
+            self.assertEqual(head, list(range(100)))
+            self.assertEqual(next(rows), 100)
+
+    def test_build_schema(self):
+        raw_entities = [{'id': 'a', 'time': '2019-03-04T10:11:12Z', 'x': '1', 'y': '2', 'count': '3'}]
+        key_map = util.get_key_map(raw_entities, answer_yes=True)
+        schema = util.build_schema(raw_entities, key_map)
+
+        self.assertEqual(schema['version'], util.SCHEMA_VERSION)
+        self.assertEqual(schema['fields'], ['id', 'time', 'x', 'y', 'count'])
+        self.assertEqual(schema['key_map'], key_map)
+        self.assertEqual(schema['attribute_types']['count'], 'INT64')
+        self.assertEqual(schema['timestamp_formats'], {'timestamp_ms': 'iso_8601', 'endtime_ms': 'epoch_ms'})
+
+    def test_row_converter(self):
+        raw_entities = [{'id': 'a', 'time': '2019-03-04T10:11:12Z', 'x': '1', 'y': '2', 'count': '3'}]
+        key_map = util.get_key_map(raw_entities, answer_yes=True)
+        convert = util.row_converter(util.build_schema(raw_entities, key_map))
+
+        self.assertEqual(convert({'id': 'b', 'time': '2019-03-04T10:11:13Z', 'x': '4', 'y': '5', 'count': 'many'}), {
+            'identity': 'b',
+            'kind': 'default',
+            'timestamp_ms': 1551694273000,
+            'endtime_ms': 1551694273000,
+            'path': [{'x': 4.0, 'y': 5.0, 'z': 0.0}],
+            'attrs': [{'key': 'count', 'type': 'STRING', 'str_value': 'many'}],
+        })
+
+    def test_get_schema__schema_file(self):
+        raw_entities = [{'id': 'a', 'time': '1000', 'x': '1', 'y': '2'}]
+        schema_path = os.path.join(tempfile.mkdtemp(), 'schema.json')
+
+        schema = util.get_schema(raw_entities, answer_yes=True, schema_file=schema_path, kind='first-kind')
+        self.assertEqual(schema['key_map']['kind']['override_value'], 'first-kind')
+        self.assertNotIn('override_value', util.load_schema(schema_path)['key_map']['kind'])
+
+        with mock.patch('conduce.util.get_key_map') as mock_get_key_map:
+            self.assertEqual(util.dict_to_entities([{'id': 'b', 'time': '2000', 'x': '3', 'y': '4'}], schema_file=schema_path, kind='fake-kind')['entities'], [{
+                'identity': 'b',
+                'kind': 'fake-kind',
+                'timestamp_ms': 2000,
+                'endtime_ms': 2000,
+                'path': [{'x': 3.0, 'y': 4.0, 'z': 0.0}],
+                'attrs': [],
+            }])
+            mock_get_key_map.assert_not_called()
+
+    def test_load_schema__invalid(self):
+        schema_path = os.path.join(tempfile.mkdtemp(), 'schema.json')
+        with open(schema_path, 'w') as schema_file:
+            json.dump({'version': 0}, schema_file)
+
+        with self.assertRaises(ValueError):
+            util.load_schema(schema_path)
+
+    def test_dumps_bytes(self):
+        self.assertEqual(json.loads(util.dumps_bytes({'key': [1, 'two']}).decode('utf-8')), {'key': [1, 'two']})
+
+    @mock.patch('conduce.util.orjson', None)
+    def test_dumps_bytes__stdlib(self):
+        self.assertEqual(util.dumps_bytes({'key': [1, 'two']}), b'{"key":[1,"two"]}')
+
+    def test_chunk_entities__serialized(self):
+        entities = list(util.serialize_entities([{'a': 'x' * 10}] * 4))
+        self.assertEqual(list(util.chunk_entities(entities, max_bytes=2 * len(entities[0]))), [entities[:2], entities[2:]])
+
 
 if __name__ == '__main__':
     unittest.main()